@@ -1,10 +1,28 @@
+from itertools import combinations
+
 import streamlit as st
-import json
-import networkx as nx
-from pyvis.network import Network
-import tempfile
-import os
-import re
+
+from sociometria.agrupamiento import formar_grupos
+from sociometria.analisis import CacheAnalisis
+from sociometria.carga import CacheRespuestas, RUTA_RESPUESTAS
+from sociometria.componente import grafo_persistente, resumen_envio
+from sociometria.componente.diagnostico import iniciar_medicion, panel_diagnostico
+from sociometria.componente.novedades import avisar_cambios, vigilar_version
+from sociometria.componente.selector import selector_alumnos
+from sociometria.detalle import (MAX_NODOS_VISTA, UMBRAL_AGREGAR, CacheAgrupamientos, nodos_vista, podar_aristas,
+                                 vista_agregada)
+from sociometria.estilo import OPCIONES_RED, elementos_agregados, elementos_red, superponer_cambios
+from sociometria.exportar import FORMATOS_IMAGEN, exportar
+from sociometria.grafo import ConstructorGrafos
+from sociometria.grupos import AlmacenGrupos
+from sociometria.layout import CacheLayout
+from sociometria.lote import exportar_zip, trabajos_de
+from sociometria.nombres import RUTA_ALIAS, ResolvedorNombres
+from sociometria.olas import RUTA_OLAS, AlmacenOlas, cambios_en
+from sociometria.render import clave_grafo
+from sociometria.seleccion import (camino_mas_corto, ids_curso, ids_ego, ids_nombres, ids_populares, ids_vecinos,
+                                   remapear_ids)
+from sociometria.vigilancia import Vigilante
 
 # =========================
 # Configuración de Página
@@ -27,140 +45,130 @@ st.markdown(
 # =========================
 # Constantes y Archivo de Persistencia
 # =========================
-FILE_GRUPOS = "grupos_guardados.json"
+FILE_GRUPOS = "grupos_guardados.json"  # formato anterior: se migra solo a la base
+DB_GRUPOS = "grupos_guardados.db"
+# Criterio de agrupamiento de cada nivel de detalle ("auto" decide según el tamaño de la selección)
+NIVELES_DETALLE = {"Automático": "auto", "Alumnos": None, "Por curso": "curso", "Por comunidad": "comunidad"}
 
 # =========================
 # Funciones de Utilidad (Carga y Persistencia)
 # =========================
-def normalizar_nombre(nombre):
-    if not nombre: return "DESCONOCIDO"
-    nombre = re.sub(r'\(.*?\)', '', nombre)
-    nombre = re.sub(r'\s+', ' ', nombre.strip()).upper()
-    return nombre
-
-def cargar_desde_carpeta(ruta_carpeta, nombre_curso):
-    data_parcial = {}
-    if not os.path.exists(ruta_carpeta): return data_parcial
-    archivos = [f for f in os.listdir(ruta_carpeta) if f.endswith('.json')]
-    
-    for archivo in archivos:
-        try:
-            with open(os.path.join(ruta_carpeta, archivo), 'r', encoding='utf-8') as f:
-                contenido = json.load(f)
-            nombre = contenido.get("Nombre")
-            ranking = contenido.get("Seleccion_Jerarquica", {})
-            if nombre:
-                origen = normalizar_nombre(nombre)
-                conexiones = {normalizar_nombre(k): int(v) if str(v).isdigit() else 99 for k, v in ranking.items()}
-                data_parcial[origen] = {"curso": nombre_curso, "conexiones": conexiones, "raw_ranking": ranking}
-        except: pass
-    return data_parcial
-
 # --- Funciones para Guardar/Cargar Grupos ---
+@st.cache_resource
+def obtener_almacen_grupos():
+    # SQLite en modo WAL compartido por todas las sesiones; cada escritura toca sólo su grupo
+    return AlmacenGrupos(DB_GRUPOS, FILE_GRUPOS)
+
 def leer_grupos_guardados():
-    if not os.path.exists(FILE_GRUPOS): return {}
-    try:
-        with open(FILE_GRUPOS, 'r', encoding='utf-8') as f: return json.load(f)
-    except: return {}
+    return obtener_almacen_grupos().leer()
 
 def guardar_nuevo_grupo(nombre_grupo, lista_alumnos):
-    grupos = leer_grupos_guardados()
-    grupos[nombre_grupo] = lista_alumnos
-    with open(FILE_GRUPOS, 'w', encoding='utf-8') as f: json.dump(grupos, f, ensure_ascii=False, indent=4)
+    obtener_almacen_grupos().guardar(nombre_grupo, lista_alumnos)
 
 def eliminar_grupo(nombre_grupo):
-    grupos = leer_grupos_guardados()
-    if nombre_grupo in grupos:
-        del grupos[nombre_grupo]
-        with open(FILE_GRUPOS, 'w', encoding='utf-8') as f: json.dump(grupos, f, ensure_ascii=False, indent=4)
-
-# --- Checkbox Modificado ---
-def crear_grilla_checkbox(nombres, key_prefix, lista_preseleccion=None):
-    seleccionados = []
-    todos = st.checkbox("Seleccionar Todos", value=False, key=f"all_{key_prefix}")
-    col1, col2 = st.columns(2)
-    for i, n in enumerate(nombres):
-        is_checked = todos or (lista_preseleccion is not None and n in lista_preseleccion)
-        with (col1 if i%2==0 else col2):
-            if st.checkbox(n, value=is_checked, key=f"{key_prefix}_{i}_{n}"):
-                seleccionados.append(n)
-    return seleccionados
+    obtener_almacen_grupos().eliminar(nombre_grupo)
 
-# =========================
-# INYECCIÓN DE JAVASCRIPT PARA IMAGEN HD (MÉTODO ESTABLE)
-# =========================
-def inyectar_botones_imagen_hd_estable(html_str):
-    script_botones = """
-    <script>
-    // 1. Función para Centrar
-    function centrarGrafo() { if (typeof network !== 'undefined') network.fit({ animation: { duration: 1000 } }); }
-
-    // 2. Función PRINCIPAL: Descargar Imagen HD usando un lienzo secundario
-    function descargarImagenHD() {
-        // Obtenemos el canvas original que el usuario está viendo
-        var originalCanvas = document.getElementsByTagName('canvas')[0];
-        if (!originalCanvas) { alert("No se encontró el grafo."); return; }
-
-        // Factor de escala (4x para muy alta definición)
-        var scaleFactor = 4;
-
-        // --- CREAMOS UN LIENZO FANTASMA (INVISIBLE) ---
-        var hiddenCanvas = document.createElement('canvas');
-        hiddenCanvas.width = originalCanvas.width * scaleFactor;
-        hiddenCanvas.height = originalCanvas.height * scaleFactor;
-        var hiddenCtx = hiddenCanvas.getContext('2d');
-
-        // Opcional: Rellenar el fondo de blanco si no queremos transparencia
-        hiddenCtx.fillStyle = '#ffffff';
-        hiddenCtx.fillRect(0, 0, hiddenCanvas.width, hiddenCanvas.height);
-
-        // --- COPIAMOS Y ESCALAMOS ---
-        // Dibujamos el contenido del canvas original en el canvas gigante.
-        // El navegador se encarga de escalar la imagen actual.
-        hiddenCtx.drawImage(originalCanvas, 0, 0, hiddenCanvas.width, hiddenCanvas.height);
-
-        // --- DESCARGAMOS ---
-        try {
-            // Creamos la imagen PNG a partir del lienzo fantasma
-            var imgData = hiddenCanvas.toDataURL("image/png");
-            
-            var link = document.createElement('a');
-            link.download = "sociograma_HD_vista_actual.png";
-            link.href = imgData;
-            document.body.appendChild(link); // Necesario en algunos navegadores
-            link.click();
-            document.body.removeChild(link);
-
-        } catch (error) { alert("Error generando imagen: " + error.message); }
-    }
-    </script>
-    
-    <style>
-    .btn-container { position: absolute; top: 10px; right: 10px; z-index: 1000; display: flex; gap: 10px; }
-    .btn-action { padding: 8px 16px; border: none; border-radius: 5px; cursor: pointer; font-family: sans-serif; font-weight: bold; font-size: 14px; box-shadow: 0 2px 4px rgba(0,0,0,0.2); color: white; }
-    .btn-center { background-color: #555; } .btn-center:hover { background-color: #333; }
-    /* Color violeta intenso para el botón de imagen HD */
-    .btn-img { background-color: #8E44AD; } .btn-img:hover { background-color: #732d91; }
-    </style>
-    
-    <div class="btn-container">
-        <button onclick="centrarGrafo()" class="btn-action btn-center">🔍 Centrar</button>
-        <button onclick="descargarImagenHD()" class="btn-action btn-img">📸 Descargar Imagen HD (Vista Actual)</button>
-    </div>
-    """
-    return html_str.replace('</body>', f'{script_botones}</body>')
+# --- Selección como conjunto de IDs ---
+def seleccion_de_sesion(matriz):
+    # Se guarda junto a la lista de nombres de su versión para poder remapearla si cambian los datos
+    estado = st.session_state.setdefault('seleccion', {'nombres': matriz.nombres, 'ids': set()})
+    if estado['nombres'] is not matriz.nombres:
+        estado['ids'] = remapear_ids(estado['ids'], estado['nombres'], matriz)
+        estado['nombres'] = matriz.nombres
+    return estado['ids']
+
+def reemplazar_seleccion(matriz, ids):
+    seleccion = seleccion_de_sesion(matriz)
+    seleccion.clear()
+    seleccion.update(ids)
+
+def cargar_grupo(matriz):
+    nombre = st.session_state['grupo_cargado']
+    if nombre != "-- Ninguno --":
+        reemplazar_seleccion(matriz, ids_nombres(matriz, leer_grupos_guardados().get(nombre, [])))
+
+def alternar_grupo(G, nodo, etiquetas, nombres_grupos):
+    # Clic en un supernodo lo expande (si entra en el tope); en un alumno expandido, contrae su grupo
+    expandidos = st.session_state.setdefault('_expandidos', set())
+    if nodo not in G: return False
+    atributos = G.nodes[nodo]
+    if atributos.get('agrupado'):
+        grupo = atributos['group']
+        if nodos_vista(etiquetas, nombres_grupos, expandidos | {grupo}) > MAX_NODOS_VISTA:
+            st.toast(f"Expandir {grupo} pasaría de {MAX_NODOS_VISTA} nodos: contrae otro grupo o achica la selección.")
+            return False
+        expandidos.add(grupo)
+        return True
+    if atributos.get('grupo_vista') in expandidos:
+        expandidos.discard(atributos['grupo_vista'])
+        return True
+    return False
 
 # =========================
 # Lógica Principal
 # =========================
-if 'datos_grafo' not in st.session_state:
-    st.session_state['datos_grafo'] = {}
-    for c in ["curso1", "curso2", "curso3"]:
-        ruta = os.path.join("respuestas", c)
-        st.session_state['datos_grafo'].update(cargar_desde_carpeta(ruta, c.replace("curso", "Curso ")))
+@st.cache_resource
+def obtener_cache_respuestas():
+    # Una sola caché por proceso: todas las sesiones comparten los datos parseados
+    # Los cursos se descubren solos: cada subcarpeta de respuestas/ es un curso
+    return CacheRespuestas(RUTA_RESPUESTAS)
+
+@st.cache_resource
+def obtener_resolvedor():
+    # Índice de nombres compartido; lo resuelto por parecido queda en alias_nombres.csv para revisarlo
+    return ResolvedorNombres(RUTA_ALIAS)
+
+@st.cache_resource(max_entries=2)
+def obtener_resolucion(version, revisadas, _datos):
+    # ({nombre elegido: alumno}, [sin resolver]) una vez por versión del dataset y de la tabla revisada
+    return obtener_resolvedor().resolver(_datos)
+
+@st.cache_resource(max_entries=2)
+def obtener_constructor(version, revisadas, _datos):
+    # Matriz una vez por versión del dataset; las vistas filtradas van a un LRU
+    alias, _ = obtener_resolucion(version, revisadas, _datos)
+    return ConstructorGrafos.desde_datos(_datos, alias=alias)
+
+@st.cache_resource
+def obtener_vigilante():
+    # Un hilo por proceso incorpora las respuestas que llegan durante la encuesta
+    return Vigilante(obtener_cache_respuestas()).iniciar()
+
+@st.cache_resource
+def obtener_cache_layout():
+    # Posiciones calculadas en el servidor por (subgrafo, preset de física)
+    return CacheLayout()
+
+@st.cache_resource
+def obtener_almacen_olas():
+    # Olas de la encuesta en Parquet; las comparaciones quedan cacheadas para todas las sesiones
+    return AlmacenOlas(RUTA_OLAS)
+
+@st.cache_resource
+def obtener_cache_agrupamientos():
+    # Cursos o comunidades de la selección para la vista agregada
+    return CacheAgrupamientos()
+
+@st.cache_resource
+def obtener_cache_analisis():
+    # Índices por (versión del dataset, selección, umbral), compartidos entre sesiones
+    return CacheAnalisis()
+
+medicion = iniciar_medicion("app")
+cache_respuestas = obtener_cache_respuestas()
+with medicion.etapa("carga"):
+    # Con el vigilante andando la caché ya está al día; si no, se recorre la carpeta
+    if not obtener_vigilante().activo:
+        cache_respuestas.refrescar()
 
 st.title("🕸️ Grafo de Sociometría")
-datos = st.session_state['datos_grafo']
+version_datos, datos = cache_respuestas.instantanea()
+with medicion.etapa("matriz"):
+    revisadas = obtener_resolvedor().revisadas()
+    constructor = obtener_constructor(version_datos, revisadas, datos)
+avisar_cambios(cache_respuestas, version_datos)
+matriz = constructor.matriz
+seleccion = seleccion_de_sesion(matriz)
 
 with st.sidebar:
     # --- SECCIÓN DE GESTIÓN DE GRUPOS ---
@@ -168,10 +176,9 @@ with st.sidebar:
     grupos_existentes = leer_grupos_guardados()
     nombres_grupos = ["-- Ninguno --"] + list(grupos_existentes.keys())
     
-    grupo_seleccionado_nombre = st.selectbox("Cargar un grupo guardado:", nombres_grupos)
-    lista_preseleccion = None
+    grupo_seleccionado_nombre = st.selectbox("Cargar un grupo guardado:", nombres_grupos, key="grupo_cargado",
+                                             on_change=cargar_grupo, args=(matriz,))
     if grupo_seleccionado_nombre != "-- Ninguno --":
-        lista_preseleccion = set(grupos_existentes[grupo_seleccionado_nombre])
         if st.button("🗑️ Eliminar este grupo"):
             eliminar_grupo(grupo_seleccionado_nombre)
             st.rerun()
@@ -180,14 +187,81 @@ with st.sidebar:
     
     # --- SECCIÓN DE FILTROS ---
     st.header("👥 Selección de Estudiantes")
-    seleccionados_totales = []
-    for c_nombre in ["Curso 1", "Curso 2", "Curso 3"]:
-        nombres = sorted([n for n, d in datos.items() if d['curso'] == c_nombre])
-        expandir = lista_preseleccion and any(n in lista_preseleccion for n in nombres) or c_nombre == "Curso 1"
-        with st.expander(f"{c_nombre} ({len(nombres)})", expanded=expandir):
-            if nombres: 
-                sel = crear_grilla_checkbox(nombres, c_nombre.lower().replace(" ", ""), lista_preseleccion)
-                seleccionados_totales.extend(sel)
+    max_ranking_actual = st.session_state.get("max_ranking", 10)
+    vecinos_de = selector_alumnos(matriz, version_datos, seleccion, key="selector")
+    if vecinos_de is not None:
+        seleccion.update(ids_vecinos(matriz, vecinos_de, max_ranking_actual))
+        st.rerun()
+
+    with st.expander("⚡ Selección rápida"):
+        cursos = cache_respuestas.cursos()
+        curso_rapido = st.selectbox("Curso:", cursos) if cursos else None
+        b1, b2 = st.columns(2)
+        if curso_rapido and b1.button("➕ Agregar curso"):
+            seleccion.update(ids_curso(matriz, curso_rapido))
+            st.rerun()
+        if curso_rapido and b2.button("➖ Quitar curso"):
+            seleccion.difference_update(ids_curso(matriz, curso_rapido))
+            st.rerun()
+        min_votos = st.number_input("Votos mínimos:", min_value=1, value=5)
+        if st.button("👑 Agregar populares"):
+            seleccion.update(ids_populares(matriz, min_votos, max_ranking_actual))
+            st.rerun()
+        if st.button("🧹 Limpiar selección"):
+            seleccion.clear()
+            st.rerun()
+
+    with st.expander("🔎 Consultas de red"):
+        # Las opciones salen de la selección actual: se marcan en el buscador y se consultan aquí
+        ids_marcados = sorted(seleccion)
+        if not ids_marcados:
+            st.caption("Marca alumnos en el buscador para consultar su red o la cadena entre dos de ellos.")
+        else:
+            etiqueta = lambda i: f"{matriz.nombres[i]} ({matriz.cursos[i]})"
+            direcciones = {"Elige a": "salientes", "Lo eligen": "entrantes", "Ambas": "ambas", "Mutuas": "mutuas"}
+            centro = st.selectbox("Alumno:", ids_marcados, format_func=etiqueta)
+            c1, c2 = st.columns(2)
+            saltos = c1.number_input("Saltos:", min_value=1, max_value=6, value=1)
+            direccion = c2.selectbox("Dirección:", list(direcciones), index=2)
+            if st.button("🎯 Mostrar su red"):
+                reemplazar_seleccion(matriz, ids_ego(matriz, centro, saltos, max_ranking_actual, direcciones[direccion]))
+                st.session_state.pop('_camino', None)
+                st.rerun()
+
+            st.caption("Cadena de elecciones más corta")
+            c1, c2 = st.columns(2)
+            desde = c1.selectbox("Desde:", ids_marcados, format_func=etiqueta)
+            hasta = c2.selectbox("Hasta:", ids_marcados, index=len(ids_marcados) - 1, format_func=etiqueta)
+            if st.button("🔗 Buscar cadena"):
+                camino = camino_mas_corto(matriz, desde, hasta, max_ranking_actual)
+                st.session_state['_camino'] = (matriz.nombres[desde], matriz.nombres[hasta],
+                                               [matriz.nombres[i] for i in camino] if camino else None)
+                if camino:
+                    reemplazar_seleccion(matriz, camino)
+                    st.rerun()
+        if '_camino' in st.session_state:
+            nombre_desde, nombre_hasta, nombres_camino = st.session_state['_camino']
+            if nombres_camino:
+                st.write(" → ".join(nombres_camino))
+            else:
+                st.warning(f"{nombre_desde} no llega a {nombre_hasta} con afinidad ≤ {max_ranking_actual}.")
+
+    seleccionados_totales = [matriz.nombres[i] for i in sorted(seleccion)]
+
+    if cache_respuestas.errores:
+        with st.expander(f"⚠️ Archivos con errores ({len(cache_respuestas.errores)})"):
+            for err in cache_respuestas.errores:
+                st.caption(f"`{err.ruta}`: {err.mensaje}")
+
+    alias_aplicados, sin_resolver = obtener_resolucion(version_datos, revisadas, datos)
+    if alias_aplicados or sin_resolver:
+        with st.expander(f"🔤 Nombres elegidos: {len(alias_aplicados)} corregidos, {len(sin_resolver)} sin resolver"):
+            st.caption(f"Para corregir, edita `{RUTA_ALIAS}` y pon `estado` en 'confirmado' o 'rechazado'.")
+            if alias_aplicados:
+                st.dataframe([{"Elegido como": a, "Alumno": n} for a, n in sorted(alias_aplicados.items())],
+                             hide_index=True)
+            if sin_resolver:
+                st.caption("Sin resolver: " + ", ".join(sin_resolver))
 
     # --- SECCIÓN PARA GUARDAR LO ACTUAL ---
     if seleccionados_totales:
@@ -210,65 +284,184 @@ with st.sidebar:
         "Compacto": {"grav": -1000, "spring": 100}
     }
     params = configuraciones_fisica[modo_fisica]
-    max_ranking = st.slider("Afinidad Máxima:", 1, 10, 10)
+    max_ranking = st.slider("Afinidad Máxima:", 1, 10, 10, key="max_ranking")
+    nivel_detalle = st.radio("Nivel de detalle:", list(NIVELES_DETALLE), horizontal=True, key="nivel_detalle",
+                             help=f"Automático agrupa por curso cuando hay más de {UMBRAL_AGREGAR} alumnos. "
+                                  "Clic en un grupo para expandirlo; clic en uno de sus alumnos para contraerlo.")
+    top_k = st.slider("Aristas por nodo (0 = todas):", 0, 20, 0, key="top_k",
+                      help="Deja sólo las aristas más fuertes que salen de cada nodo.")
+    if st.session_state.get('_expandidos') and st.button("Contraer todo"):
+        st.session_state['_expandidos'] = set()
+
+    with st.expander("📦 Exportar todos los cursos y grupos"):
+        formatos_zip = st.multiselect("Formatos:", FORMATOS_IMAGEN, default=["svg", "pdf"])
+        if formatos_zip and st.button("Generar .zip"):
+            with st.spinner("Dibujando en paralelo..."):
+                st.session_state['_zip_exportado'] = exportar_zip(
+                    matriz, trabajos_de(matriz, grupos_existentes), max_ranking, formatos_zip)
+        if '_zip_exportado' in st.session_state:
+            st.download_button("⬇️ Descargar .zip", st.session_state['_zip_exportado'],
+                               file_name="sociogramas.zip", mime="application/zip")
+
+    comparacion_olas = None
+    with st.expander("🕰️ Olas de la encuesta"):
+        almacen_olas = obtener_almacen_olas()
+        olas = [o.nombre for o in almacen_olas.olas()]
+        nombre_ola = st.text_input("Guardar las respuestas actuales como ola:", placeholder="2025-1", key="nombre_ola")
+        if st.button("Guardar ola", disabled=not nombre_ola.strip()):
+            try:
+                ola = almacen_olas.guardar(nombre_ola, datos, alias_aplicados)
+                st.success(f"Ola '{ola.nombre}' guardada: {ola.alumnos} alumnos, {ola.elecciones} elecciones.")
+                olas.append(ola.nombre)
+            except (ImportError, ValueError) as e:
+                st.error(str(e))
+        if len(olas) >= 2:
+            c1, c2 = st.columns(2)
+            ola_antes = c1.selectbox("Desde:", olas, index=len(olas) - 2, key="ola_antes")
+            ola_despues = c2.selectbox("Hasta:", olas, index=len(olas) - 1, key="ola_despues")
+            if ola_antes != ola_despues and st.toggle("Mostrar cambios en el grafo", key="superponer_olas"):
+                try:
+                    comparacion_olas = almacen_olas.comparar(ola_antes, ola_despues, max_ranking)
+                except (ImportError, KeyError, OSError) as e:
+                    st.error(str(e))
+            if comparacion_olas is not None:
+                r = comparacion_olas.resumen
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Mutuas nuevas", r["Mutuas nuevas"])
+                c2.metric("Mutuas perdidas", r["Mutuas perdidas"])
+                c3.metric("Hacia aislamiento", r["Hacia aislamiento"])
+                alumnos_olas = comparacion_olas.alumnos
+                st.dataframe(alumnos_olas[alumnos_olas["Hacia aislamiento"]], hide_index=True)
+                st.download_button("⬇️ Cambios por alumno (CSV)", alumnos_olas.to_csv(index=False).encode('utf-8'),
+                                   file_name=f"cambios_{ola_antes}_{ola_despues}.csv", mime="text/csv")
+        elif olas:
+            st.caption("Guarda otra ola para comparar.")
 
 # --- Renderizado ---
 if not datos or not seleccionados_totales:
     st.info("👈 Selecciona alumnos o carga un grupo guardado.")
 else:
     whitelist = set(seleccionados_totales)
-    G = nx.DiGraph()
-    mutuas = set()
-    for n, info in datos.items():
-        if n in whitelist:
-            G.add_node(n, group=info['curso'], title=f"{info['curso']}")
-            for dest, rank in info['conexiones'].items():
-                if rank <= max_ranking and dest in whitelist:
-                    if not G.has_node(dest): G.add_node(dest, group=datos.get(dest, {}).get('curso', 'Desconocido'))
-                    es_mutua = False
-                    if datos.get(dest, {}).get('conexiones', {}).get(n, 99) <= max_ranking:
-                        es_mutua = True
-                        mutuas.add(tuple(sorted((n, dest))))
-                    G.add_edge(n, dest, weight=rank, mutua=es_mutua)
+    criterio = NIVELES_DETALLE[nivel_detalle]
+    if criterio == "auto":
+        criterio = "curso" if len(whitelist) > UMBRAL_AGREGAR else None
+    with medicion.etapa("vista"):
+        if criterio is None:
+            G, sub = constructor.vista(whitelist, max_ranking)
+            # Votos ya vienen vectorizados desde la matriz
+            in_degrees = {matriz.nombres[i]: int(v) for i, v in zip(sub.ids, sub.votos)}
+        else:
+            # Supernodos por curso o comunidad: el tamaño de la vista no depende de la selección
+            sub = matriz.subgrafo(sorted(seleccion), max_ranking)
+            etiquetas, nombres_grupos = obtener_cache_agrupamientos().obtener(
+                version_datos, matriz, sub.ids, max_ranking, criterio)
+            G, in_degrees = vista_agregada(matriz, sub.ids, max_ranking, etiquetas, nombres_grupos,
+                                           st.session_state.setdefault('_expandidos', set()))
+    medicion.anotar(nodos=len(G.nodes()), aristas=len(G.edges()))
 
     if len(G.nodes()) == 0:
         st.warning("Sin conexiones visibles.")
     else:
-        # Fondo blanco explícito para evitar problemas con visualizadores de imágenes
-        net = Network(height="750px", width="100%", bgcolor="white", font_color="black", directed=True)
-        in_degrees = dict(G.in_degree())
-        colores = {"Curso 1": "#FFFF00", "Curso 2": "#90EE90", "Curso 3": "#ADD8E6"}
-        colores_pop = {"Curso 1": "#FFD700", "Curso 2": "#32CD32", "Curso 3": "#1E90FF"}
-        
-        for n in G.nodes():
-            c = G.nodes[n].get('group', 'Desconocido')
-            pop = in_degrees.get(n, 0)
-            size = 25 + (pop * 5)
-            color = colores_pop.get(c, "#ccc") if pop >= 3 else colores.get(c, "#eee")
-            label = f"{n} 👑" if pop > 4 else n
-            net.add_node(n, label=label, title=f"{n}\nVotos: {pop}", color=color, size=size, font={'size': 24, 'face': 'arial', 'strokeWidth': 4, 'strokeColor': 'white', 'color': 'black'})
-
-        dibujadas = set()
-        for u, v, d in G.edges(data=True):
-            if d['mutua']:
-                par = tuple(sorted((u, v)))
-                if par not in dibujadas:
-                    net.add_edge(u, v, color="red", width=5, arrows={'to': {'enabled': False}})
-                    dibujadas.add(par)
+        with medicion.etapa("layout"):
+            posiciones, _ = obtener_cache_layout().obtener(clave_grafo(G), G, params)
+        with medicion.etapa("elementos"):
+            if criterio is None:
+                nodos, aristas = elementos_red(G, in_degrees, posiciones)
             else:
-                color = "#666666" if d['weight'] == 1 else "#cccccc"
-                net.add_edge(u, v, color=color, width=2 if d['weight']==1 else 1, dashes=True, arrows={'to': {'enabled': True, 'type': 'vee', 'scaleFactor': 1.5}})
-
-        net.barnes_hut(gravity=params['grav'], central_gravity=0.1, spring_length=params['spring'], damping=0.09)
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp:
-            net.save_graph(tmp.name)
-            with open(tmp.name, 'r', encoding='utf-8') as f:
-                # Usamos la nueva función JavaScript estable
-                html = inyectar_botones_imagen_hd_estable(f.read())
-            
-        st.components.v1.html(html, height=800)
+                nodos, aristas = elementos_agregados(G, in_degrees, posiciones)
+            aristas = podar_aristas(aristas, top_k)
+            if comparacion_olas is not None:
+                cambios = cambios_en(comparacion_olas, [n['id'] for n in nodos])
+                nodos, aristas = superponer_cambios(nodos, aristas, cambios,
+                                                    f"{comparacion_olas.antes} → {comparacion_olas.despues}")
+        # Una sola red viva en el navegador: en cada rerun sólo viaja el diff
+        with medicion.etapa("envío"):
+            evento = grafo_persistente(nodos, aristas, OPCIONES_RED, key="grafo", height=800)
+        if criterio is not None and evento and evento.get('evento') == "click":
+            clic = (evento.get('nonce'), evento.get('nodo'))
+            if clic != st.session_state.get('_ultimo_click'):
+                st.session_state['_ultimo_click'] = clic
+                if alternar_grupo(G, evento['nodo'], etiquetas, nombres_grupos):
+                    st.rerun()
+        envio = resumen_envio("grafo")
+        medicion.anotar(payload_completo=envio['completo'], payload_elementos=envio['elementos'],
+                        payload_bytes=envio['bytes'])
         c1, c2, c3 = st.columns(3)
-        c1.metric("Alumnos", len(G.nodes()))
-        c2.metric("Conexiones", len(G.edges()))
-        c3.metric("Relaciones Mutuas", len(mutuas))
+        c1.metric("Alumnos", len(sub.ids))
+        c2.metric("Conexiones", len(sub.origen))
+        c3.metric("Relaciones Mutuas", sub.n_mutuas)
+
+        # Imágenes dibujadas en el servidor con las mismas posiciones; se generan recién al hacer clic
+        tipos_mime = {"svg": "image/svg+xml", "png": "image/png", "pdf": "application/pdf"}
+        for col, formato in zip(st.columns(len(FORMATOS_IMAGEN)), FORMATOS_IMAGEN):
+            col.download_button(f"⬇️ {formato.upper()}", lambda f=formato: exportar(nodos, aristas, f),
+                                file_name=f"sociograma.{formato}", mime=tipos_mime[formato])
+
+        if st.toggle("📊 Mostrar índices sociométricos"):
+            with medicion.etapa("análisis"):
+                analisis = obtener_cache_analisis().obtener(version_datos, matriz, sub.ids, max_ranking)
+            r = analisis.resumen
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Densidad", f"{r['Densidad']:.1%}")
+            c2.metric("Reciprocidad", f"{r['Reciprocidad']:.1%}")
+            c3.metric("Ignorados / Aislados", f"{r['Ignorados']} / {r['Aislados']}")
+            c4.metric("Comunidades", r['Comunidades'])
+            t1, t2, t3, t4 = st.tabs(["Alumnos", "Cursos", "Comunidades", "Cliques"])
+            with t1:
+                st.dataframe(analisis.alumnos, hide_index=True)
+                st.download_button("⬇️ Descargar CSV", analisis.alumnos.to_csv(index=False).encode('utf-8'),
+                                   file_name="indices_alumnos.csv", mime="text/csv")
+            with t2:
+                st.dataframe(analisis.cursos, hide_index=True)
+            with t3:
+                st.dataframe(analisis.comunidades, hide_index=True)
+            with t4:
+                if analisis.cliques:
+                    for c in analisis.cliques:
+                        st.write(f"**{len(c)}** · " + ", ".join(c))
+                else:
+                    st.caption("Sin cliques de 3 o más relaciones mutuas.")
+
+    # --- Formación automática de grupos de trabajo ---
+    with st.expander("🧩 Formar grupos de trabajo"):
+        c1, c2, c3 = st.columns(3)
+        tamano_grupo = c1.number_input("Alumnos por grupo:", 2, 12, 4)
+        prefijo = c2.text_input("Nombre de los grupos:", "Grupo")
+        balancear = c3.checkbox("Mezclar cursos parejo", help="Cada grupo recibe la misma proporción de cada curso.")
+        separados = st.multiselect("Mantener separados:", seleccionados_totales)
+        juntos = st.multiselect("Mantener juntos:", seleccionados_totales)
+        if st.button("Formar grupos"):
+            id_sep, id_jun = sorted(ids_nombres(matriz, separados)), sorted(ids_nombres(matriz, juntos))
+            with st.spinner("Buscando la mejor partición..."):
+                particiones = formar_grupos(matriz, seleccion, tamano_grupo, max_ranking,
+                                            separar=combinations(id_sep, 2), juntar=combinations(id_jun, 2),
+                                            balancear_cursos=balancear)
+            # Con nombres y no IDs: si entre reruns llega otra versión de la matriz, los IDs cambian
+            mejor = particiones[0] if particiones else None
+            st.session_state['_grupos_formados'] = mejor._replace(
+                grupos=[[matriz.nombres[i] for i in g] for g in mejor.grupos]) if mejor else None
+
+        formada = st.session_state.get('_grupos_formados')
+        if formada is not None:
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Elecciones dentro", formada.elecciones)
+            c2.metric("Mutuas dentro", formada.mutuas)
+            c3.metric("Aislados", formada.aislados)
+            c4.metric("Restricciones sin cumplir", formada.violaciones)
+            propuesta = {f"{prefijo} {k + 1}": list(g) for k, g in enumerate(formada.grupos)}
+            for nombre, alumnos in propuesta.items():
+                st.write(f"**{nombre}** · " + ", ".join(alumnos))
+            repetidos = [nombre for nombre in propuesta if nombre in grupos_existentes]
+            reemplazar = True
+            if repetidos:
+                st.warning("Ya hay grupos guardados con estos nombres: " + ", ".join(repetidos)
+                           + ". Cambia el nombre de los grupos o confirma que quieres reemplazarlos.")
+                reemplazar = st.checkbox("Reemplazar los grupos existentes", key="reemplazar_grupos")
+            if st.button("💾 Guardar grupos", disabled=not reemplazar):
+                obtener_almacen_grupos().guardar_varios(propuesta)
+                del st.session_state['_grupos_formados']
+                st.success(f"{len(propuesta)} grupos guardados.")
+                st.rerun()
+
+vigilar_version(cache_respuestas, version_datos)
+panel_diagnostico(medicion)
@@ -1,10 +1,16 @@
 import streamlit as st
-import json
-import networkx as nx
-from pyvis.network import Network
-import tempfile
-import os
-import re
+
+from sociometria.carga import CacheRespuestas, RUTA_RESPUESTAS
+from sociometria.componente.diagnostico import iniciar_medicion, panel_diagnostico
+from sociometria.componente.novedades import avisar_cambios, vigilar_version
+from sociometria.componente.selector import selector_alumnos
+from sociometria.estilo import COLORES_CURSO, COLORES_POPULAR
+from sociometria.grafo import ConstructorGrafos
+from sociometria.layout import CacheLayout
+from sociometria.nombres import RUTA_ALIAS, ResolvedorNombres
+from sociometria.render import CacheHTML, clave_grafo, html_en_memoria
+from sociometria.seleccion import ids_vecinos, remapear_ids
+from sociometria.vigilancia import Vigilante
 
 # =========================
 # Configuración de Página y Estilos CSS
@@ -25,154 +31,152 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# =========================
-# Constantes
-# =========================
-COLORES_CURSO = {
-    "Curso 1": "#FFFF00",  # Amarillo
-    "Curso 2": "#90EE90",  # Verde Claro
-    "Curso 3": "#ADD8E6"   # Azul Claro
-}
-
-COLORES_POPULAR = {
-    "Curso 1": "#FFD700",  # Dorado
-    "Curso 2": "#32CD32",  # Verde Lima
-    "Curso 3": "#1E90FF"   # Azul Rey
-}
-
 # =========================
 # Funciones de Utilidad
 # =========================
-def normalizar_nombre(nombre):
-    if not nombre: return "DESCONOCIDO"
-    nombre = re.sub(r'\(.*?\)', '', nombre)
-    nombre = re.sub(r'\s+', ' ', nombre.strip()).upper()
-    return nombre
+def seleccion_de_sesion(matriz):
+    """
+    Selección de la sesión como set de IDs de la matriz. Si los datos
+    cambiaron de versión, los IDs se remapean por nombre.
+    """
+    estado = st.session_state.setdefault('seleccion', {'nombres': matriz.nombres, 'ids': set()})
+    if estado['nombres'] is not matriz.nombres:
+        estado['ids'] = remapear_ids(estado['ids'], estado['nombres'], matriz)
+        estado['nombres'] = matriz.nombres
+    return estado['ids']
+
+# Cambiar si se modifica dibujar_red: forma parte de la clave de la caché de HTML
+VERSION_ESTILO = "app2-2"
+PARAMS_LAYOUT = {"grav": -2000, "spring": 120}
 
-def cargar_desde_carpeta(ruta_carpeta, nombre_curso):
-    data_parcial = {}
-    if not os.path.exists(ruta_carpeta):
-        return data_parcial
+def dibujar_red(G, in_degrees, posiciones, physics_enabled):
+    """
+    Arma la red de pyvis a partir del grafo filtrado. Las posiciones vienen
+    del servidor; con la física activa sólo sirven de punto de partida.
+    """
+    # pyvis sólo se carga cuando hay algo que dibujar
+    from pyvis.network import Network
 
-    archivos = [f for f in os.listdir(ruta_carpeta) if f.endswith('.json')]
+    net = Network(height="750px", width="100%", bgcolor="#ffffff", font_color="black", directed=True)
     
-    for archivo in archivos:
-        ruta_completa = os.path.join(ruta_carpeta, archivo)
-        try:
-            with open(ruta_completa, 'r', encoding='utf-8') as f:
-                contenido = json.load(f)
-                
-            nombre_completo = contenido.get("Nombre")
-            ranking = contenido.get("Seleccion_Jerarquica", {}) 
+    for node in G.nodes():
+        curso = G.nodes[node].get('group', 'Desconocido')
+        popularidad = in_degrees.get(node, 0)
+        size = 15 + (popularidad * 4)
+        color_fondo = COLORES_CURSO.get(curso, "#eeeeee")
+        if popularidad >= 3:
+            color_fondo = COLORES_POPULAR.get(curso, color_fondo)
+        
+        label = node
+        if popularidad > 4: label += " 👑"
+        title = f"<b>{node}</b><br>{curso}<br>Votos: {popularidad}"
+        
+        x, y = posiciones[node]
+        net.add_node(node, label=label, title=title, color=color_fondo, size=size, x=x, y=y)
 
-            if nombre_completo:
-                origen = normalizar_nombre(nombre_completo)
-                conexiones_con_ranking = {}
-                for k, v in ranking.items():
-                    nombre_dest = normalizar_nombre(k)
-                    try:
-                        valor_rank = int(v) 
-                    except:
-                        valor_rank = 99 
-                    conexiones_con_ranking[nombre_dest] = valor_rank
+    for u, v, data in G.edges(data=True):
+        es_mutua = data.get('mutua', False)
+        if es_mutua:
+            net.add_edge(u, v, color="red", width=3)
+        else:
+            rank = data.get('weight', '?')
+            color = "#666666" if rank == 1 else "#cccccc"
+            net.add_edge(u, v, color=color, width=1, dashes=True)
 
-                data_parcial[origen] = {
-                    "curso": nombre_curso,
-                    "conexiones": conexiones_con_ranking, 
-                    "raw_ranking": ranking
-                }
-        except Exception:
-            pass
-            
-    return data_parcial
+    if physics_enabled:
+        net.barnes_hut(gravity=-2000, central_gravity=0.3, spring_length=120)
+    else:
+        net.toggle_physics(False)
 
-def crear_grilla_checkbox(nombres, key_prefix, default_check=False):
-    """
-    Crea una lista de checkboxes en 2 columnas.
-    default_check controla si empiezan marcados o no.
-    """
-    seleccionados = []
-    
-    # Checkbox maestro
-    todos = st.checkbox("Seleccionar Todos", value=default_check, key=f"all_{key_prefix}")
-    
-    # Creamos 2 columnas para distribución horizontal
-    col1, col2 = st.columns(2)
-    
-    for i, nombre in enumerate(nombres):
-        columna_actual = col1 if i % 2 == 0 else col2
-        with columna_actual:
-            # Si el usuario marca "Todos", los hijos heredan ese estado
-            # Si no, heredan el estado individual (que por defecto aquí empieza igual al maestro)
-            if st.checkbox(nombre, value=todos, key=f"{key_prefix}_{i}_{nombre}"):
-                seleccionados.append(nombre)
-                
-    return seleccionados
+    return net
 
 # =========================
 # Lógica de Carga Automática
 # =========================
-if 'datos_grafo' not in st.session_state:
-    st.session_state['datos_grafo'] = {}
-    
-    path_c1 = os.path.join("respuestas", "curso1")
-    path_c2 = os.path.join("respuestas", "curso2")
-    path_c3 = os.path.join("respuestas", "curso3")
-    
-    d1 = cargar_desde_carpeta(path_c1, "Curso 1")
-    d2 = cargar_desde_carpeta(path_c2, "Curso 2")
-    d3 = cargar_desde_carpeta(path_c3, "Curso 3")
-    
-    st.session_state['datos_grafo'].update(d1)
-    st.session_state['datos_grafo'].update(d2)
-    st.session_state['datos_grafo'].update(d3)
+@st.cache_resource
+def obtener_cache_respuestas():
+    # Caché compartida por todas las sesiones del proceso
+    return CacheRespuestas(RUTA_RESPUESTAS)
+
+@st.cache_resource
+def obtener_resolvedor():
+    # Índice de nombres compartido; lo resuelto por parecido queda en alias_nombres.csv para revisarlo
+    return ResolvedorNombres(RUTA_ALIAS)
+
+@st.cache_resource(max_entries=2)
+def obtener_resolucion(version, revisadas, _datos):
+    # ({nombre elegido: alumno}, [sin resolver]) una vez por versión del dataset y de la tabla revisada
+    return obtener_resolvedor().resolver(_datos)
+
+@st.cache_resource(max_entries=2)
+def obtener_constructor(version, revisadas, _datos):
+    # Matriz una vez por versión del dataset; las vistas filtradas van a un LRU
+    alias, _ = obtener_resolucion(version, revisadas, _datos)
+    return ConstructorGrafos.desde_datos(_datos, alias=alias)
+
+@st.cache_resource
+def obtener_vigilante():
+    # Un hilo por proceso incorpora las respuestas que llegan durante la encuesta
+    return Vigilante(obtener_cache_respuestas()).iniciar()
+
+@st.cache_resource
+def obtener_cache_html():
+    return CacheHTML()
+
+@st.cache_resource
+def obtener_cache_layout():
+    return CacheLayout()
+
+medicion = iniciar_medicion("app2")
+cache_respuestas = obtener_cache_respuestas()
+with medicion.etapa("carga"):
+    # Con el vigilante andando la caché ya está al día; si no, se recorre la carpeta
+    if not obtener_vigilante().activo:
+        cache_respuestas.refrescar()
 
 # =========================
 # Interfaz Principal
 # =========================
 st.title("🕸️ Grafo de Sociometría")
 
-datos = st.session_state.get('datos_grafo', {})
+version_datos, datos = cache_respuestas.instantanea()
+with medicion.etapa("matriz"):
+    revisadas = obtener_resolvedor().revisadas()
+    constructor = obtener_constructor(version_datos, revisadas, datos)
+avisar_cambios(cache_respuestas, version_datos)
+matriz = constructor.matriz
+seleccion = seleccion_de_sesion(matriz)
 
 # --- Barra Lateral ---
 with st.sidebar:
     st.header("👥 Filtro de Alumnos")
-    st.caption("Marca las casillas para incluir alumnos en el grafo.")
-    
-    nombres_c1 = sorted([n for n, d in datos.items() if d['curso'] == "Curso 1"])
-    nombres_c2 = sorted([n for n, d in datos.items() if d['curso'] == "Curso 2"])
-    nombres_c3 = sorted([n for n, d in datos.items() if d['curso'] == "Curso 3"])
-
-    seleccionados_finales = []
-
-    # --- Curso 1 ---
-    with st.expander(f"Curso 1 ({len(nombres_c1)})", expanded=True):
-        if nombres_c1:
-            # default_check=False para que empiece vacío
-            sel_c1 = crear_grilla_checkbox(nombres_c1, "c1", default_check=False)
-            seleccionados_finales.extend(sel_c1)
-        else:
-            st.caption("Sin datos")
-
-    # --- Curso 2 ---
-    with st.expander(f"Curso 2 ({len(nombres_c2)})", expanded=False):
-        if nombres_c2:
-            sel_c2 = crear_grilla_checkbox(nombres_c2, "c2", default_check=False)
-            seleccionados_finales.extend(sel_c2)
-        else:
-            st.caption("Sin datos")
-
-    # --- Curso 3 ---
-    with st.expander(f"Curso 3 ({len(nombres_c3)})", expanded=False):
-        if nombres_c3:
-            sel_c3 = crear_grilla_checkbox(nombres_c3, "c3", default_check=False)
-            seleccionados_finales.extend(sel_c3)
-        else:
-            st.caption("Sin datos")
+    st.caption("Busca y marca alumnos para incluirlos en el grafo. ⊕ agrega a sus vecinos.")
+
+    vecinos_de = selector_alumnos(matriz, version_datos, seleccion, key="selector")
+    if vecinos_de is not None:
+        seleccion.update(ids_vecinos(matriz, vecinos_de, st.session_state.get("max_ranking", 10)))
+        st.rerun()
+
+    seleccionados_finales = [matriz.nombres[i] for i in sorted(seleccion)]
+
+    if cache_respuestas.errores:
+        with st.expander(f"⚠️ Archivos con errores ({len(cache_respuestas.errores)})"):
+            for err in cache_respuestas.errores:
+                st.caption(f"`{err.ruta}`: {err.mensaje}")
+
+    alias_aplicados, sin_resolver = obtener_resolucion(version_datos, revisadas, datos)
+    if alias_aplicados or sin_resolver:
+        with st.expander(f"🔤 Nombres elegidos: {len(alias_aplicados)} corregidos, {len(sin_resolver)} sin resolver"):
+            st.caption(f"Para corregir, edita `{RUTA_ALIAS}` y pon `estado` en 'confirmado' o 'rechazado'.")
+            if alias_aplicados:
+                st.dataframe([{"Elegido como": a, "Alumno": n} for a, n in sorted(alias_aplicados.items())],
+                             hide_index=True)
+            if sin_resolver:
+                st.caption("Sin resolver: " + ", ".join(sin_resolver))
 
     st.markdown("---")
     st.subheader("🎯 Opciones")
-    max_ranking = st.slider("Afinidad Máxima (1-10):", 1, 10, 10)
+    max_ranking = st.slider("Afinidad Máxima (1-10):", 1, 10, 10, key="max_ranking")
     physics_enabled = st.toggle("Física (Movimiento)", value=True)
 
 # --- Visualización ---
@@ -183,82 +187,29 @@ elif not seleccionados_finales:
     st.info("👈 **Grafo vacío.** Por favor selecciona alumnos en la barra lateral izquierda para comenzar el análisis.")
 else:
     whitelist_nombres = set(seleccionados_finales)
-    G = nx.DiGraph()
-    
-    # Nodos
-    for nombre, info in datos.items():
-        if nombre in whitelist_nombres:
-            G.add_node(nombre, group=info['curso'], title=f"Curso: {info['curso']}")
-
-    # Aristas
-    mutuas_procesadas = set()
-    for nombre, info in datos.items():
-        if nombre not in whitelist_nombres: continue
-            
-        for destino, ranking_val in info['conexiones'].items():
-            if ranking_val > max_ranking: continue 
-
-            if destino in whitelist_nombres:
-                curso_destino = datos[destino]['curso'] if destino in datos else "Desconocido"
-                
-                if not G.has_node(destino):
-                    G.add_node(destino, group=curso_destino, title=f"Curso: {curso_destino}")
-                
-                es_mutua = False
-                datos_destino = datos.get(destino, {})
-                ranking_retorno = datos_destino.get('conexiones', {}).get(nombre)
-                
-                if ranking_retorno and ranking_retorno <= max_ranking:
-                    es_mutua = True
-                
-                G.add_edge(nombre, destino, weight=ranking_val, mutua=es_mutua)
-                
-                if es_mutua:
-                    mutuas_procesadas.add(tuple(sorted((nombre, destino))))
+    with medicion.etapa("vista"):
+        G, sub = constructor.vista(whitelist_nombres, max_ranking)
+    medicion.anotar(nodos=len(G.nodes()), aristas=len(G.edges()))
 
     # Renderizado
     if len(G.nodes()) == 0:
         st.warning("Alumnos seleccionados sin conexiones visibles.")
     else:
-        in_degrees = dict(G.in_degree())
-        net = Network(height="750px", width="100%", bgcolor="#ffffff", font_color="black", directed=True)
-        
-        for node in G.nodes():
-            curso = G.nodes[node].get('group', 'Desconocido')
-            popularidad = in_degrees.get(node, 0)
-            size = 15 + (popularidad * 4)
-            color_fondo = COLORES_CURSO.get(curso, "#eeeeee")
-            if popularidad >= 3:
-                color_fondo = COLORES_POPULAR.get(curso, color_fondo)
-            
-            label = node
-            if popularidad > 4: label += " 👑"
-            title = f"<b>{node}</b><br>{curso}<br>Votos: {popularidad}"
-            
-            net.add_node(node, label=label, title=title, color=color_fondo, size=size)
-
-        for u, v, data in G.edges(data=True):
-            es_mutua = data.get('mutua', False)
-            if es_mutua:
-                net.add_edge(u, v, color="red", width=3)
-            else:
-                rank = data.get('weight', '?')
-                color = "#666666" if rank == 1 else "#cccccc"
-                net.add_edge(u, v, color=color, width=1, dashes=True)
-
-        if physics_enabled:
-            net.barnes_hut(gravity=-2000, central_gravity=0.3, spring_length=120)
-        else:
-            net.toggle_physics(False)
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp:
-            net.save_graph(tmp.name)
-            with open(tmp.name, 'r', encoding='utf-8') as f:
-                html_bytes = f.read()
-                
-        st.components.v1.html(html_bytes, height=770)
+        in_degrees = {matriz.nombres[i]: int(v) for i, v in zip(sub.ids, sub.votos)}
+        clave = clave_grafo(G)
+        with medicion.etapa("layout"):
+            posiciones, huella_layout = obtener_cache_layout().obtener(clave, G, PARAMS_LAYOUT)
+        with medicion.etapa("html"):
+            html = obtener_cache_html().obtener((clave, huella_layout, physics_enabled, VERSION_ESTILO),
+                                                lambda: html_en_memoria(dibujar_red(G, in_degrees, posiciones, physics_enabled)))
+        with medicion.etapa("envío"):
+            st.components.v1.html(html, height=770)
+        medicion.anotar(html_bytes=len(html.encode('utf-8')), fisica=physics_enabled)
         
         c1, c2, c3 = st.columns(3)
         c1.metric("Alumnos", len(G.nodes()))
         c2.metric("Conexiones", len(G.edges()))
-        c3.metric("Mutuas", len(mutuas_procesadas))
+        c3.metric("Mutuas", sub.n_mutuas)
+
+vigilar_version(cache_respuestas, version_datos)
+panel_diagnostico(medicion)
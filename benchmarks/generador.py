@@ -0,0 +1,123 @@
+"""
+Generador de encuestas sintéticas con el mismo formato que `respuestas/`.
+
+Escribe `<raiz>/curso<k>/<NOMBRE>__jerarquia.json` para N alumnos repartidos
+en K cursos. Cada alumno elige entre 3 y 10 compañeros con preferencia por
+los populares de su propio curso; una parte de las elecciones va a otros
+cursos y se escribe como en las respuestas reales, "NOMBRE (8°B)". También
+se cuelan rangos mal escritos ("primero", "", "3.5", null), nombres elegidos
+sin tildes o con una letra cambiada y algún archivo roto, para que la carga y
+la resolución de nombres pasen por sus caminos de error.
+
+    python -m benchmarks.generador --alumnos 5000 --cursos 40 --salida /tmp/encuesta
+"""
+import argparse
+import json
+import os
+import unicodedata
+
+import numpy as np
+
+NOMBRES = ["AGUSTIN", "ANTONIA", "BENJAMIN", "CAMILA", "CONSUELO", "DIEGO", "EMILIA", "FERNANDA", "GASPAR",
+           "ISIDORA", "JOSEFA", "JOSÉ", "MARTÍN", "MATEO", "RENATA", "SOFÍA", "TOMÁS", "VALENTINA", "VICENTE",
+           "FLORENCIA", "MAXIMILIANO", "AMANDA", "JOAQUÍN", "CATALINA"]
+APELLIDOS = ["GONZÁLEZ", "MUÑOZ", "ROJAS", "DÍAZ", "PÉREZ", "SOTO", "CONTRERAS", "SILVA", "MARTÍNEZ", "SEPÚLVEDA",
+             "MORALES", "RODRÍGUEZ", "LÓPEZ", "FUENTES", "HERNÁNDEZ", "TORRES", "ARAYA", "FLORES", "ESPINOZA",
+             "VALENZUELA", "CASTILLO", "TAPIA", "REYES", "GUTIÉRREZ", "CASTRO", "PIZARRO", "ÁLVAREZ", "VÁSQUEZ"]
+RANGOS_MALOS = ["primero", "", "3.5", None, "x"]
+
+
+def etiqueta_curso(k, separador=""):
+    """8A, 8B, ..., 8Z, 9A, ...; con separador "°" queda como en las elecciones: 8°B."""
+    return f"{8 + k // 26}{separador}{chr(ord('A') + k % 26)}"
+
+
+def nombres_unicos(n, rng):
+    """N nombres distintos "NOMBRE APELLIDO [APELLIDO] [n]"."""
+    vistos = set()
+    nombres = []
+    while len(nombres) < n:
+        base = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}"
+        if rng.random() < 0.5:
+            base += f" {rng.choice(APELLIDOS)}"
+        nombre = base
+        sufijo = 2
+        while nombre in vistos:
+            nombre = f"{base} {sufijo}"
+            sufijo += 1
+        vistos.add(nombre)
+        nombres.append(nombre)
+    return nombres
+
+
+def variante(nombre, rng):
+    """El nombre como lo escribiría otro alumno: sin tildes o con una letra cambiada."""
+    sin_tildes = "".join(c for c in unicodedata.normalize("NFKD", nombre) if not unicodedata.combining(c))
+    if sin_tildes != nombre and rng.random() < 0.5:
+        return sin_tildes
+    posiciones = [k for k, c in enumerate(nombre) if c.isalpha()]
+    k = posiciones[int(rng.integers(len(posiciones)))]
+    return nombre[:k] + chr(ord("A") + int(rng.integers(26))) + nombre[k + 1:]
+
+
+def generar_encuesta(raiz, n_alumnos, n_cursos, semilla=0, prob_otro_curso=0.25, prob_rango_malo=0.02,
+                     prob_archivo_roto=0.002, prob_variante_nombre=0.02):
+    """Escribe la encuesta y devuelve la lista de carpetas creadas."""
+    rng = np.random.default_rng(semilla)
+    nombres = nombres_unicos(n_alumnos, rng)
+    curso = np.sort(rng.integers(0, n_cursos, size=n_alumnos))
+    # Popularidad tipo Zipf: pocos alumnos concentran muchas elecciones
+    popularidad = 1.0 / (1.0 + rng.permutation(n_alumnos)) ** 0.8
+    miembros = [np.flatnonzero(curso == k) for k in range(n_cursos)]
+
+    carpetas = []
+    for k in range(n_cursos):
+        carpeta = os.path.join(raiz, f"curso{k + 1}")
+        os.makedirs(carpeta, exist_ok=True)
+        carpetas.append(carpeta)
+
+    for i in range(n_alumnos):
+        propios = miembros[curso[i]]
+        n_elecciones = int(rng.integers(3, 11))
+        elegidos = []
+        for _ in range(n_elecciones):
+            if rng.random() < prob_otro_curso or len(propios) < 2:
+                candidatos = rng.integers(0, n_alumnos, size=8)
+            else:
+                candidatos = propios[rng.integers(0, len(propios), size=8)]
+            candidatos = [c for c in candidatos if c != i and c not in elegidos]
+            if candidatos:
+                pesos = popularidad[candidatos]
+                elegidos.append(candidatos[int(rng.choice(len(candidatos), p=pesos / pesos.sum()))])
+
+        seleccion = {}
+        for rango, j in enumerate(elegidos, start=1):
+            nombre = variante(nombres[j], rng) if rng.random() < prob_variante_nombre else nombres[j]
+            clave = nombre if curso[j] == curso[i] else f"{nombre} ({etiqueta_curso(curso[j], '°')})"
+            seleccion[clave] = RANGOS_MALOS[int(rng.integers(len(RANGOS_MALOS)))] if rng.random() < prob_rango_malo else rango
+
+        ruta = os.path.join(carpetas[curso[i]], f"{nombres[i].replace(' ', '_')}__jerarquia.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            if rng.random() < prob_archivo_roto:
+                f.write('{"Nombre": "' + nombres[i])  # JSON cortado a la mitad
+                continue
+            json.dump({"RUT": str(rng.integers(10**8, 3 * 10**8)), "Nombre": nombres[i] + " ",
+                       "Curso": etiqueta_curso(curso[i]), "Seleccion_Jerarquica": seleccion},
+                      f, ensure_ascii=False, indent=4)
+    return carpetas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generador", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--alumnos", type=int, default=1000)
+    parser.add_argument("--cursos", type=int, default=None, help="por defecto, uno cada ~30 alumnos")
+    parser.add_argument("--salida", required=True)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+    cursos = args.cursos or max(1, args.alumnos // 30)
+    generar_encuesta(args.salida, args.alumnos, cursos, args.semilla)
+    print(f"{args.alumnos} alumnos en {cursos} cursos -> {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Suite de rendimiento sobre encuestas sintéticas.
+
+Para cada tamaño N genera una encuesta (`benchmarks.generador`) y mide:
+
+- ingesta: parseo en frío de todos los archivos (`CacheRespuestas.refrescar`)
+- nombres: resolución de los nombres elegidos (`ResolvedorNombres`, sin tabla)
+- matriz: `MatrizRanking.desde_datos`
+- mutuas: `A ∘ Aᵀ` sobre la adyacencia umbralizada
+- grafo: vista de networkx con todos los alumnos
+- consultas: red ego a 2 saltos y cadena más corta entre dos alumnos, sobre
+  todo el dataset
+- olas: comparación entre dos olas de todo el dataset (`comparar_tablas`; la
+  segunda es la misma encuesta con un 10 % de las elecciones cambiadas)
+- agregada: vista por cursos de todo el dataset (`sociometria.detalle`) con
+  sus elementos; `agregada_bytes` es su payload con `TOP_K_AGREGADA` aristas
+  por nodo
+- layout, html y payload sobre una vista de como mucho `TAM_VISTA` alumnos
+  (lo que muestra la app); el layout de decenas de miles de nodos no es un
+  caso de uso y tardaría minutos.
+
+Los tiempos son el mejor de `--repeticiones` corridas. Se comparan contra
+`linea_base.json`: una etapa falla si tarda más que `tolerancia × base +
+HOLGURA_S` (o si el payload crece más de un 5 %).
+
+    python -m benchmarks.suite                      # compara
+    python -m benchmarks.suite --tamanos 100 1000   # sólo algunos tamaños
+    python -m benchmarks.suite --actualizar          # reescribe la línea base
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.generador import generar_encuesta
+
+TAMANOS = (100, 1000, 10000, 50000)
+ALUMNOS_POR_CURSO = 30
+TAM_VISTA = 1000
+MAX_RANKING = 10
+PARAMS_LAYOUT = {"grav": -4000, "spring": 350}
+TOP_K_AGREGADA = 5
+TOLERANCIA = 1.5
+HOLGURA_S = 0.05
+TOLERANCIA_BYTES = 1.05
+RUTA_LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linea_base.json")
+
+
+def _cronometrar(resultado, etapa, funcion):
+    inicio = time.perf_counter()
+    valor = funcion()
+    resultado[etapa] = min(resultado.get(etapa, float("inf")), time.perf_counter() - inicio)
+    return valor
+
+
+def medir_tamano(n, repeticiones=3, semilla=0):
+    """{etapa: segundos, 'payload_bytes': ..., 'html_bytes': ...} para una encuesta de N alumnos."""
+    from sociometria.carga import CacheRespuestas
+    from sociometria.detalle import agrupar, podar_aristas, vista_agregada
+    from sociometria.estilo import elementos_agregados, elementos_red, red_pyvis
+    from sociometria.grafo import ConstructorGrafos
+    from sociometria.layout import CacheLayout
+    from sociometria.matriz import MatrizRanking
+    from sociometria.nombres import ResolvedorNombres
+    from sociometria.olas import comparar_tablas, tabla_ola
+    from sociometria.render import clave_grafo, html_en_memoria
+    from sociometria.seleccion import camino_mas_corto, ids_ego
+    import networkx, pyvis.network  # noqa: F401,E401  (que el costo de importarlos no cuente como etapa)
+
+    raiz = tempfile.mkdtemp(prefix=f"encuesta_{n}_")
+    try:
+        generar_encuesta(raiz, n, max(1, n // ALUMNOS_POR_CURSO), semilla)
+        r = {}
+        for _ in range(repeticiones):
+            cache = CacheRespuestas(raiz, ruta_snapshot=None)
+            _cronometrar(r, "ingesta", cache.refrescar)
+            alias = _cronometrar(r, "nombres", lambda: ResolvedorNombres(None).alias(cache.datos))
+            matriz = _cronometrar(r, "matriz", lambda: MatrizRanking.desde_datos(cache.datos, alias))
+            A = matriz.adyacencia(MAX_RANKING)
+            _cronometrar(r, "mutuas", lambda: A.multiply(A.T).tocsr())
+            constructor = ConstructorGrafos(matriz)
+            _cronometrar(r, "grafo", lambda: constructor.vista(set(matriz.nombres), MAX_RANKING))
+            ultimo = len(cache.datos) - 1
+            _cronometrar(r, "consultas", lambda: (ids_ego(matriz, 0, 2, MAX_RANKING, "ambas"),
+                                                  camino_mas_corto(matriz, 0, ultimo, MAX_RANKING)))
+            ola_antes = tabla_ola(cache.datos, alias)
+            ola_despues = ola_antes.copy()
+            cambiadas = np.random.default_rng(semilla).random(len(ola_despues)) < 0.1
+            mezclados = ola_antes["elegido"].sample(frac=1, random_state=semilla).to_numpy()
+            ola_despues.loc[cambiadas, "elegido"] = mezclados[cambiadas]
+            _cronometrar(r, "olas", lambda: comparar_tablas(ola_antes, ola_despues, MAX_RANKING))
+            todos = range(matriz.n)
+
+            def agregada():
+                etiquetas, nombres_grupos = agrupar(matriz, todos, MAX_RANKING, "curso")
+                G_agr, votos = vista_agregada(matriz, todos, MAX_RANKING, etiquetas, nombres_grupos)
+                # Sin layout: el de la vista agregada se mide aparte como cualquier otro grafo chico
+                return elementos_agregados(G_agr, votos, dict.fromkeys(G_agr, (0.0, 0.0)))
+            nodos_agr, aristas_agr = _cronometrar(r, "agregada", agregada)
+
+            # Vista acotada: los primeros cursos completos hasta TAM_VISTA alumnos
+            vista = set(list(cache.datos)[:TAM_VISTA])
+            G, sub = constructor.vista(vista, MAX_RANKING)
+            in_degrees = {matriz.nombres[i]: int(v) for i, v in zip(sub.ids, sub.votos)}
+            posiciones, _ = _cronometrar(r, "layout",
+                                         lambda: CacheLayout().obtener(clave_grafo(G), G, PARAMS_LAYOUT))
+            nodos, aristas = elementos_red(G, in_degrees, posiciones)
+            html = _cronometrar(r, "html", lambda: html_en_memoria(red_pyvis(nodos, aristas)))
+        r["payload_bytes"] = len(json.dumps({"nodos": nodos, "aristas": aristas}, ensure_ascii=False).encode("utf-8"))
+        r["html_bytes"] = len(html.encode("utf-8"))
+        r["agregada_bytes"] = len(json.dumps({"nodos": nodos_agr, "aristas": podar_aristas(aristas_agr, TOP_K_AGREGADA)},
+                                             ensure_ascii=False).encode("utf-8"))
+        return r
+    finally:
+        shutil.rmtree(raiz, ignore_errors=True)
+
+
+def comparar(actual, base, tolerancia=TOLERANCIA):
+    """Lista de regresiones (texto) de `actual` contra `base`, ambos {N: {etapa: valor}}."""
+    regresiones = []
+    for n, etapas in actual.items():
+        previas = base.get(n)
+        if not previas:
+            continue
+        for etapa, valor in etapas.items():
+            if etapa not in previas:
+                continue
+            if etapa.endswith("_bytes"):
+                limite = previas[etapa] * TOLERANCIA_BYTES
+            else:
+                limite = previas[etapa] * tolerancia + HOLGURA_S
+            if valor > limite:
+                regresiones.append(f"N={n} {etapa}: {valor:.4g} > {limite:.4g} (base {previas[etapa]:.4g})")
+    return regresiones
+
+
+def _formatear(n, r):
+    tiempos = "  ".join(f"{k} {v * 1000:8.1f} ms" for k, v in r.items() if not k.endswith("_bytes"))
+    return (f"N={n:>6}  {tiempos}  payload {r['payload_bytes'] / 1024:.0f} KiB  html {r['html_bytes'] / 1024:.0f} KiB  "
+            f"agregada {r['agregada_bytes'] / 1024:.0f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description="Suite de rendimiento sobre encuestas sintéticas.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--linea-base", default=RUTA_LINEA_BASE)
+    parser.add_argument("--actualizar", action="store_true", help="guardar los resultados como nueva línea base")
+    args = parser.parse_args(argv)
+
+    actual = {}
+    for n in args.tamanos:
+        actual[str(n)] = medir_tamano(n, args.repeticiones)
+        print(_formatear(n, actual[str(n)]), flush=True)
+
+    base = {}
+    if os.path.exists(args.linea_base):
+        with open(args.linea_base, encoding="utf-8") as f:
+            base = json.load(f)
+    if args.actualizar:
+        base.update(actual)
+        with open(args.linea_base, "w", encoding="utf-8") as f:
+            json.dump(base, f, indent=2, sort_keys=True)
+        print(f"Línea base actualizada: {args.linea_base}")
+        return 0
+
+    regresiones = comparar(actual, base, args.tolerancia)
+    for linea in regresiones:
+        print(f"✖ {linea}", file=sys.stderr)
+    if not base:
+        print("Sin línea base: correr con --actualizar para guardarla.", file=sys.stderr)
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Núcleo compartido de las apps de sociometría (carga, grafo y análisis).
+
+Los nombres principales se pueden importar desde el paquete
+(`from sociometria import MatrizRanking`), pero cada submódulo se carga
+recién cuando se usa uno de sus nombres: `import sociometria` no arrastra
+numpy, pandas, networkx ni pyvis.
+"""
+import importlib
+
+_EXPORTADOS = {
+    "CacheRespuestas": "carga",
+    "cargar_respuestas": "carga",
+    "MatrizRanking": "matriz",
+    "analizar": "analisis",
+    "CacheAnalisis": "analisis",
+    "AlmacenGrupos": "grupos",
+    "ResolvedorNombres": "nombres",
+    "ConstructorGrafos": "grafo",
+    "CacheLayout": "layout",
+    "calcular_layout": "layout",
+    "elementos_red": "estilo",
+    "elementos_agregados": "estilo",
+    "vista_agregada": "detalle",
+    "red_pyvis": "estilo",
+    "html_en_memoria": "render",
+    "ejecutar_lote": "lote",
+    "formar_grupos": "agrupamiento",
+    "AlmacenOlas": "olas",
+}
+
+__all__ = sorted(_EXPORTADOS)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTADOS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module 'sociometria' has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f"sociometria.{modulo}"), nombre)
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,69 @@
+"""
+Línea de comandos: `python -m sociometria --salida reportes/`
+
+Genera índices (CSV/Parquet) y sociogramas (HTML, SVG, PNG, PDF) de todos
+los cursos y grupos guardados sin levantar Streamlit.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+from sociometria.carga import RUTA_RESPUESTAS
+from sociometria.exportar import FORMATOS_IMAGEN
+from sociometria.grupos import RUTA_DB, RUTA_JSON_LEGADO, AlmacenGrupos, leer_json_legado
+from sociometria.lote import FORMATOS, ejecutar_lote
+from sociometria.nombres import RUTA_ALIAS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sociometria",
+                                     description="Exporta índices y sociogramas de todos los cursos y grupos guardados.")
+    parser.add_argument("--respuestas", default=RUTA_RESPUESTAS, help="carpeta con una subcarpeta por curso")
+    parser.add_argument("--salida", default="reportes", help="carpeta donde se escriben los resultados")
+    parser.add_argument("--grupos", default=RUTA_DB, help="base de grupos guardados")
+    parser.add_argument("--alias", default=RUTA_ALIAS, help="tabla de alias de nombres (CSV)")
+    parser.add_argument("--sin-grupos", action="store_true", help="procesar sólo los cursos")
+    parser.add_argument("--max-ranking", type=int, default=10, help="afinidad máxima (1-10)")
+    parser.add_argument("--formato", choices=FORMATOS, action="append",
+                        help="formato de las tablas (repetible; por defecto csv)")
+    parser.add_argument("--sin-html", action="store_true", help="no generar los sociogramas HTML")
+    parser.add_argument("--imagen", choices=FORMATOS_IMAGEN, action="append", default=[],
+                        help="exportar también el sociograma como imagen (repetible)")
+    parser.add_argument("--zip", metavar="RUTA", help="empaquetar además toda la salida en RUTA.zip")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos del pool (1 = en serie)")
+    args = parser.parse_args(argv)
+
+    formatos = args.formato or ["csv"]
+    if "parquet" in formatos:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--formato parquet necesita pyarrow instalado")
+
+    grupos = {} if args.sin_grupos else leer_grupos(args.grupos)
+    inicio = time.perf_counter()
+    resumen, errores = ejecutar_lote(args.salida, args.respuestas, grupos, args.max_ranking, formatos,
+                                     con_html=not args.sin_html, max_workers=args.procesos, imagenes=args.imagen,
+                                     ruta_alias=args.alias)
+    for err in errores:
+        print(f"⚠️  {err.ruta}: {err.mensaje}", file=sys.stderr)
+    print(f"{len(resumen)} sociogramas en '{args.salida}' ({time.perf_counter() - inicio:.1f} s)")
+    if args.zip:
+        print(f"Archivo: {shutil.make_archive(args.zip, 'zip', args.salida)}")
+    return 0 if len(resumen) else 1
+
+
+def leer_grupos(ruta_db):
+    """
+    Grupos guardados sin crear nada en disco: la base sólo se abre si existe
+    (si no, se lee el JSON antiguo tal cual, sin migrarlo).
+    """
+    if os.path.exists(ruta_db):
+        return AlmacenGrupos(ruta_db, RUTA_JSON_LEGADO).leer()
+    return leer_json_legado(RUTA_JSON_LEGADO)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Formación de grupos de trabajo a partir de las preferencias.
+
+Se reparte a los alumnos en grupos de tamaño parejo maximizando las
+elecciones que quedan dentro del grupo (más peso a las primeras
+preferencias y a las mutuas) y castigando a quien queda aislado (nadie de
+su grupo lo eligió ni fue elegido por él). Las restricciones "mantener
+separados" / "mantener juntos" entran como pesos muy negativos / positivos
+entre los pares afectados; el balance por curso se logra repartiendo cada
+curso en ronda al inicio y permitiendo sólo intercambios dentro del curso.
+
+Búsqueda: recocido simulado sobre intercambios de dos alumnos. El puntaje
+es una suma por pares, así que con `C[i, g]` (afinidad de i con el grupo g)
+el cambio de intercambiar i (grupo a) con j (grupo b) es
+
+    Δ = C[i,b] − C[i,a] + C[j,a] − C[j,b] − 2·S[i,j]
+
+y se evalúa para todos los j a la vez con numpy. El cambio en aislados se
+calcula exacto con los contadores `K[i, g]` (vínculos de i en g), sólo
+mirando a los miembros de los dos grupos tocados.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+PESO_MUTUA = 1.0
+PENALIDAD_AISLADO = 3.0
+PESO_RESTRICCION = 1000.0
+
+Particion = namedtuple("Particion", ["grupos", "puntaje", "elecciones", "mutuas", "aislados", "violaciones"])
+
+
+def _matrices(matriz, ids, max_ranking):
+    """S (afinidad simétrica por par), U (hay vínculo en algún sentido) y A (elecciones) densas sobre `ids`."""
+    R = matriz.rangos[ids][:, ids].toarray().astype(np.float64)
+    # La misma regla que el grafo y los índices: cuenta toda elección guardada con rango <= max_ranking,
+    # también los rangos 0 o negativos (en la densa no se distinguirían de "no eligió")
+    A = matriz.adyacencia(max_ranking)[ids][:, ids].toarray()
+    np.fill_diagonal(A, False)
+    W = np.where(A, (max_ranking + 1 - R) / max_ranking, 0.0)
+    M = A & A.T
+    S = W + W.T + PESO_MUTUA * M
+    U = (A | A.T).astype(np.float64)
+    return S, U, A
+
+
+def _reparto_inicial(n, n_grupos, cursos, rng, balancear):
+    """Grupo de cada alumno: tamaños parejos y, si se pide, cada curso repartido en ronda."""
+    if balancear:
+        orden = np.lexsort((rng.random(n), cursos))
+    else:
+        orden = rng.permutation(n)
+    grupo = np.empty(n, dtype=np.int64)
+    grupo[orden] = np.arange(n) % n_grupos
+    return grupo
+
+
+def _miembros(grupo, n_grupos, capacidad):
+    """Matriz (n_grupos x capacidad) con los miembros de cada grupo (-1 = vacío) y la posición de cada uno."""
+    miembros = np.full((n_grupos, capacidad), -1, dtype=np.int64)
+    posicion = np.empty(len(grupo), dtype=np.int64)
+    llenos = np.zeros(n_grupos, dtype=np.int64)
+    for i, g in enumerate(grupo):
+        miembros[g, llenos[g]] = i
+        posicion[i] = llenos[g]
+        llenos[g] += 1
+    return miembros, posicion
+
+
+def _delta_aislados(i, js, a, bs, K, U, miembros):
+    """
+    Cambio en la cantidad de aislados al intercambiar i (grupo a) con cada
+    j de `js` (grupos `bs`). Vectorizado sobre los candidatos.
+    """
+    n_cand = len(js)
+    # i y j antes y después
+    # (los booleanos se pasan a enteros: en numpy True + True es True)
+    antes = int(K[i, a] == 0) + (K[js, bs] == 0).astype(np.int64)
+    despues = ((K[i, bs] - U[i, js]) == 0).astype(np.int64) + ((K[js, a] - U[js, i]) == 0).astype(np.int64)
+
+    # Resto del grupo a: pierde a i y gana a j
+    mA = miembros[a]
+    mA = mA[(mA >= 0) & (mA != i)]
+    if len(mA):
+        kA = K[mA, a][None, :]
+        nuevoA = kA - U[mA, i][None, :] + U[js[:, None], mA[None, :]]
+        antes = antes + (kA == 0).sum(axis=1)
+        despues = despues + (nuevoA == 0).sum(axis=1)
+
+    # Resto de cada grupo b: pierde a j y gana a i
+    mB = miembros[bs]                                   # (n_cand, capacidad)
+    validos = (mB >= 0) & (mB != js[:, None])
+    mB_seguro = np.where(validos, mB, 0)
+    kB = K[mB_seguro, bs[:, None]]
+    nuevoB = kB - U[mB_seguro, js[:, None]] + U[mB_seguro, i]
+    antes = antes + ((kB == 0) & validos).sum(axis=1)
+    despues = despues + ((nuevoB == 0) & validos).sum(axis=1)
+    return (despues - antes).reshape(n_cand)
+
+
+def _recocer(S, U, grupo, n_grupos, permitido, iteraciones, rng):
+    """Recocido simulado con intercambios evaluados en lote. Modifica y devuelve `grupo`."""
+    n = len(grupo)
+    capacidad = int(np.bincount(grupo, minlength=n_grupos).max())
+    miembros, posicion = _miembros(grupo, n_grupos, capacidad)
+    uno_hot = np.zeros((n, n_grupos))
+    uno_hot[np.arange(n), grupo] = 1.0
+    C = S @ uno_hot
+    K = U @ uno_hot
+
+    def puntaje():
+        return 0.5 * C[np.arange(n), grupo].sum() - PENALIDAD_AISLADO * np.count_nonzero(K[np.arange(n), grupo] == 0)
+
+    actual = puntaje()
+    mejor, mejor_grupo = actual, grupo.copy()
+    # Temperatura inicial del orden de una afinidad típica; baja geométricamente hasta ~0
+    t0 = max(float(np.percentile(S[S > 0], 75)) if (S > 0).any() else 1.0, 1e-3)
+    enfriamiento = (1e-3) ** (1.0 / max(iteraciones, 1))
+    temperatura = t0
+    for _ in range(iteraciones):
+        i = int(rng.integers(n))
+        a = grupo[i]
+        candidatos = np.flatnonzero((grupo != a) & permitido[i])
+        if len(candidatos) == 0:
+            temperatura *= enfriamiento
+            continue
+        bs = grupo[candidatos]
+        delta = C[i, bs] - C[i, a] + C[candidatos, a] - C[candidatos, bs] - 2 * S[i, candidatos]
+        delta = delta - PENALIDAD_AISLADO * _delta_aislados(i, candidatos, a, bs, K, U, miembros)
+        # Muestreo proporcional a exp(Δ/T) (truco de Gumbel) y aceptación de Metropolis
+        elegido = int(np.argmax(delta / temperatura + rng.gumbel(size=len(delta))))
+        d = delta[elegido]
+        if d > 0 or rng.random() < np.exp(d / temperatura):
+            j, b = int(candidatos[elegido]), int(bs[elegido])
+            grupo[i], grupo[j] = b, a
+            miembros[a, posicion[i]], miembros[b, posicion[j]] = j, i
+            posicion[i], posicion[j] = posicion[j], posicion[i]
+            C[:, a] += S[:, j] - S[:, i]
+            C[:, b] += S[:, i] - S[:, j]
+            K[:, a] += U[:, j] - U[:, i]
+            K[:, b] += U[:, i] - U[:, j]
+            actual += d
+            if actual > mejor + 1e-9:
+                mejor, mejor_grupo = actual, grupo.copy()
+        temperatura *= enfriamiento
+    return mejor_grupo
+
+
+def _evaluar(grupo, S, U, A, separar, juntar):
+    n = len(grupo)
+    mismo = grupo[:, None] == grupo[None, :]
+    elecciones = int((A & mismo).sum())
+    mutuas = int((A & A.T & mismo).sum()) // 2
+    K = (U * mismo).sum(axis=1)
+    aislados = int(np.count_nonzero(K == 0))
+    violaciones = sum(grupo[i] == grupo[j] for i, j in separar) + sum(grupo[i] != grupo[j] for i, j in juntar)
+    puntaje = float(0.5 * (S * mismo).sum() - PENALIDAD_AISLADO * aislados) if n else 0.0
+    return elecciones, mutuas, aislados, int(violaciones), puntaje
+
+
+def formar_grupos(matriz, ids, tamano, max_ranking=10, separar=(), juntar=(), balancear_cursos=False,
+                  iteraciones=None, reinicios=2, semilla=0):
+    """
+    Reparte los alumnos `ids` (IDs de la matriz) en grupos de ~`tamano`.
+
+    `separar` y `juntar` son pares de IDs. Devuelve las particiones de cada
+    reinicio, de mejor a peor; `grupos` es una lista de listas de IDs.
+    """
+    ids = np.asarray(sorted(set(int(i) for i in ids)), dtype=np.int64)
+    n = len(ids)
+    if n == 0:
+        return []
+    n_grupos = max(1, int(np.ceil(n / max(1, tamano))))
+    local = {int(g): k for k, g in enumerate(ids)}
+    S, U, A = _matrices(matriz, ids, max_ranking)
+    separar = [(local[a], local[b]) for a, b in separar if a in local and b in local and a != b]
+    juntar = [(local[a], local[b]) for a, b in juntar if a in local and b in local and a != b]
+    S_busqueda = S.copy()
+    for a, b in separar:
+        S_busqueda[a, b] = S_busqueda[b, a] = S[a, b] - PESO_RESTRICCION
+    for a, b in juntar:
+        S_busqueda[a, b] = S_busqueda[b, a] = S[a, b] + PESO_RESTRICCION
+
+    cursos_texto = [matriz.cursos[i] for i in ids]
+    _, cursos = np.unique(np.array(cursos_texto, dtype=object), return_inverse=True)
+    permitido = (cursos[:, None] == cursos[None, :]) if balancear_cursos else np.ones((n, n), dtype=bool)
+    iteraciones = iteraciones or max(2000, 40 * n)
+
+    rng = np.random.default_rng(semilla)
+    particiones = []
+    for _ in range(max(1, reinicios)):
+        grupo = _reparto_inicial(n, n_grupos, cursos, rng, balancear_cursos)
+        if n_grupos > 1:
+            grupo = _recocer(S_busqueda, U, grupo, n_grupos, permitido, iteraciones, rng)
+        elecciones, mutuas, aislados, violaciones, puntaje = _evaluar(grupo, S, U, A, separar, juntar)
+        grupos = [sorted(ids[grupo == g].tolist()) for g in range(n_grupos)]
+        particiones.append(Particion(grupos, puntaje, elecciones, mutuas, aislados, violaciones))
+    return sorted(particiones, key=lambda p: (p.violaciones, -p.puntaje))
@@ -0,0 +1,254 @@
+"""
+Índices sociométricos calculados en bloque con álgebra dispersa.
+
+Por alumno: votos (elecciones recibidas), elecciones hechas, popularidad
+ponderada por rango (una 1ª preferencia pesa `max_ranking`, la última 1),
+mutuas, reciprocidad, aislados e ignorados, PageRank y centralidad de
+vector propio. Por grupo (curso o comunidad): tamaño, densidad,
+reciprocidad y cohesión. Además comunidades por propagación de etiquetas y
+cliques de relaciones mutuas.
+
+La encuesta sólo recoge elecciones positivas, así que no hay "rechazados"
+en sentido estricto: el índice más cercano es `ignorado` (nadie lo elige).
+
+Todo se calcula sobre la submatriz de la selección, sin bucles de Python
+por nodo, y se cachea por (versión del dataset, selección, umbral).
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+CAPACIDAD_ANALISIS = 32
+AMORTIGUACION_PAGERANK = 0.85
+TOLERANCIA = 1e-9
+MAX_ITERACIONES = 200
+
+ResultadoAnalisis = namedtuple("ResultadoAnalisis", ["alumnos", "cursos", "comunidades", "cliques", "resumen"])
+
+
+def _submatrices(matriz, ids, max_ranking):
+    """Rangos, adyacencia y pesos (max_ranking + 1 - rango) restringidos a `ids`."""
+    R = matriz.rangos[ids][:, ids].tocsr()
+    dentro = R.data <= max_ranking
+    A = sparse.csr_matrix((dentro.astype(np.float64), R.indices.copy(), R.indptr.copy()), shape=R.shape)
+    A.eliminate_zeros()
+    W = sparse.csr_matrix((np.where(dentro, max_ranking + 1 - R.data.astype(np.float64), 0.0),
+                           R.indices.copy(), R.indptr.copy()), shape=R.shape)
+    W.eliminate_zeros()
+    return A, W
+
+
+def pagerank(W, alfa=AMORTIGUACION_PAGERANK, tol=TOLERANCIA, max_iter=MAX_ITERACIONES):
+    """PageRank por iteración de potencias sobre la matriz de pesos (fila = quien elige)."""
+    n = W.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    salida = np.asarray(W.sum(axis=1)).ravel()
+    colgantes = salida == 0
+    inv = np.divide(1.0, salida, out=np.zeros(n), where=~colgantes)
+    P = sparse.diags(inv) @ W  # estocástica por filas
+    PT = P.T.tocsr()
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        nuevo = alfa * (PT @ x + x[colgantes].sum() / n) + (1 - alfa) / n
+        if np.abs(nuevo - x).sum() < n * tol:
+            return nuevo
+        x = nuevo
+    return x
+
+
+def centralidad_vector_propio(W, tol=TOLERANCIA, max_iter=MAX_ITERACIONES):
+    """
+    Centralidad de vector propio de entrada (como networkx para dirigidos):
+    iteración de potencias sobre (I + W^T), normalizada a norma 1.
+    """
+    n = W.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    WT = W.T.tocsr()
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        nuevo = x + WT @ x
+        norma = np.linalg.norm(nuevo)
+        if norma == 0:
+            return np.zeros(n)
+        nuevo /= norma
+        if np.abs(nuevo - x).sum() < n * tol:
+            return nuevo
+        x = nuevo
+    return x
+
+
+def propagar_etiquetas(S, max_iter=50, semilla=0):
+    """
+    Comunidades por propagación de etiquetas sobre la matriz simétrica `S`.
+
+    Cada iteración es vectorizada: la suma de pesos por etiqueta es `S @ L`
+    (L = one-hot de etiquetas) y cada nodo toma la de mayor peso; sólo la
+    mitad de los nodos (al azar) se actualiza por vuelta para evitar
+    oscilaciones. Devuelve etiquetas compactadas 0..k-1.
+    """
+    n = S.shape[0]
+    etiquetas = np.arange(n)
+    if n == 0:
+        return etiquetas
+    rng = np.random.default_rng(semilla)
+    # Un poco de peso propio para que los nodos sin vecinos conserven su etiqueta
+    S = (S + sparse.identity(n, format='csr') * 1e-3).tocsr()
+    filas = np.arange(n)
+    for _ in range(max_iter):
+        L = sparse.csr_matrix((np.ones(n), (filas, etiquetas)), shape=(n, n))
+        puntajes = (S @ L).tocsr()
+        # argmax por fila de una matriz dispersa: se ordena por (fila, -peso)
+        puntajes.sum_duplicates()
+        coo = puntajes.tocoo()
+        orden = np.lexsort((-coo.data, coo.row))
+        primera = np.ones(len(orden), dtype=bool)
+        primera[1:] = coo.row[orden][1:] != coo.row[orden][:-1]
+        mejor = etiquetas.copy()
+        mejor[coo.row[orden][primera]] = coo.col[orden][primera]
+        if np.array_equal(mejor, etiquetas):
+            break
+        etiquetas = np.where(rng.random(n) < 0.5, mejor, etiquetas)
+    _, compactas = np.unique(etiquetas, return_inverse=True)
+    return compactas
+
+
+def _bron_kerbosch(vecinos, R, P, X, salida):
+    """Bron–Kerbosch con pivote: agrega a `salida` las cliques maximales que extienden R."""
+    if not P and not X:
+        salida.append(R)
+        return
+    pivote = max(P | X, key=lambda u: len(P & vecinos[u]))
+    for v in list(P - vecinos[pivote]):
+        _bron_kerbosch(vecinos, R + [v], P & vecinos[v], X & vecinos[v], salida)
+        P.discard(v)
+        X.add(v)
+
+
+def cliques_mutuas(M, nombres, minimo=3):
+    """
+    Cliques maximales (de al menos `minimo` alumnos) del grafo de relaciones
+    mutuas. Se enumeran acá mismo (Bron–Kerbosch) para que el análisis no
+    dependa de networkx.
+    """
+    coo = sparse.triu(M, k=1).tocoo()
+    vecinos = {}
+    for u, v in zip(coo.row.tolist(), coo.col.tolist()):
+        vecinos.setdefault(u, set()).add(v)
+        vecinos.setdefault(v, set()).add(u)
+    encontradas = []
+    _bron_kerbosch(vecinos, [], set(vecinos), set(), encontradas)
+    cliques = [sorted(nombres[i] for i in c) for c in encontradas if len(c) >= minimo]
+    return sorted(cliques, key=lambda c: (-len(c), c))
+
+
+def indices_por_grupo(A, M, etiquetas, nombres_grupo):
+    """
+    Índices por grupo usando la matriz indicadora P (n x g):
+    elecciones internas = diag(P^T A P), mutuas internas = diag(P^T M P) / 2.
+    """
+    n = A.shape[0]
+    g = len(nombres_grupo)
+    P = sparse.csr_matrix((np.ones(n), (np.arange(n), etiquetas)), shape=(n, g))
+    tam = np.asarray(P.sum(axis=0)).ravel()
+    internas = (P.T @ A @ P).diagonal()
+    emitidas = np.asarray((P.T @ A).sum(axis=1)).ravel()
+    mutuas_int = (P.T @ M @ P).diagonal() / 2
+    posibles = tam * (tam - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            "Grupo": nombres_grupo,
+            "Alumnos": tam.astype(int),
+            "Elecciones internas": internas.astype(int),
+            "Mutuas internas": mutuas_int.astype(int),
+            "Densidad": np.where(posibles > 0, internas / posibles, 0.0),
+            "Cohesión": np.where(posibles > 0, 2 * mutuas_int / posibles, 0.0),
+            "Elecciones que quedan dentro": np.where(emitidas > 0, internas / emitidas, 0.0),
+        })
+
+
+def analizar(matriz, ids, max_ranking):
+    """Calcula todos los índices para los alumnos `ids` con el umbral dado."""
+    ids = np.asarray(ids, dtype=np.int64)
+    nombres = [matriz.nombres[i] for i in ids]
+    cursos = [matriz.cursos[i] for i in ids]
+    A, W = _submatrices(matriz, ids, max_ranking)
+    M = A.multiply(A.T).tocsr()
+
+    votos = np.asarray(A.sum(axis=0)).ravel()
+    elecciones = np.asarray(A.sum(axis=1)).ravel()
+    mutuas = np.asarray(M.sum(axis=1)).ravel()
+    ponderada = np.asarray(W.sum(axis=0)).ravel()
+    n = len(ids)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reciprocidad = np.where(elecciones > 0, mutuas / elecciones, 0.0)
+        ponderada_norm = ponderada / (max_ranking * max(n - 1, 1))
+
+    # Comunidades sobre la versión simétrica (las mutuas pesan el doble)
+    S = (W + W.T).tocsr()
+    comunidad = propagar_etiquetas(S)
+
+    alumnos = pd.DataFrame({
+        "Alumno": nombres,
+        "Curso": cursos,
+        "Votos": votos.astype(int),
+        "Elecciones": elecciones.astype(int),
+        "Popularidad ponderada": ponderada.astype(int),
+        "Popularidad normalizada": ponderada_norm,
+        "Mutuas": mutuas.astype(int),
+        "Reciprocidad": reciprocidad,
+        "PageRank": pagerank(W),
+        "Centralidad": centralidad_vector_propio(W),
+        "Ignorado": votos == 0,
+        "Aislado": (votos == 0) & (elecciones == 0),
+        "Comunidad": comunidad + 1,
+    }).sort_values(["Popularidad ponderada", "Alumno"], ascending=[False, True], ignore_index=True)
+
+    cursos_unicos, etiqueta_curso = np.unique(np.array(cursos, dtype=object), return_inverse=True)
+    n_com = int(comunidad.max()) + 1 if n else 0
+    n_aristas = int(A.nnz)
+    diagonal = int(M.diagonal().sum())
+    n_mutuas = (int(M.nnz) - diagonal) // 2 + diagonal
+    resumen = {
+        "Alumnos": n,
+        "Conexiones": n_aristas,
+        "Relaciones Mutuas": n_mutuas,
+        "Densidad": n_aristas / (n * (n - 1)) if n > 1 else 0.0,
+        "Reciprocidad": 2 * n_mutuas / n_aristas if n_aristas else 0.0,
+        "Aislados": int(alumnos["Aislado"].sum()),
+        "Ignorados": int(alumnos["Ignorado"].sum()),
+        "Comunidades": n_com,
+    }
+    return ResultadoAnalisis(
+        alumnos=alumnos,
+        cursos=indices_por_grupo(A, M, etiqueta_curso, list(cursos_unicos)),
+        comunidades=indices_por_grupo(A, M, comunidad, [f"Comunidad {i + 1}" for i in range(n_com)]),
+        cliques=cliques_mutuas(M, nombres),
+        resumen=resumen,
+    )
+
+
+class CacheAnalisis:
+    """LRU de resultados por (versión del dataset, matriz, selección, max_ranking)."""
+
+    def __init__(self, capacidad=CAPACIDAD_ANALISIS):
+        self.capacidad = capacidad
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, version, matriz, ids, max_ranking):
+        clave = (version, matriz.firma, frozenset(int(i) for i in ids), max_ranking)
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                return self._resultados[clave]
+        resultado = analizar(matriz, sorted(clave[2]), max_ranking)
+        with self._lock:
+            self._resultados[clave] = resultado
+            while len(self._resultados) > self.capacidad:
+                self._resultados.popitem(last=False)
+        return resultado
@@ -0,0 +1,76 @@
+"""
+Presupuesto de arranque del núcleo: `python -m sociometria.arranque`.
+
+Mide, en un intérprete nuevo (sin nada importado de antemano), cuánto
+cuesta importar el núcleo, cargar `respuestas/`, resolver los nombres
+elegidos y calcular los índices de todos los cursos. Falla si se pasa del
+presupuesto o si en el camino se cargó alguna biblioteca de interfaz o de
+dibujo.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from sociometria.carga import RUTA_RESPUESTAS
+
+PRESUPUESTO_IMPORTS_S = 1.5
+PRESUPUESTO_TOTAL_S = 3.0
+PROHIBIDOS = ("streamlit", "networkx", "pyvis", "matplotlib")
+
+_MEDICION = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from sociometria.analisis import analizar
+from sociometria.carga import CacheRespuestas
+from sociometria.matriz import CURSO_DESCONOCIDO, MatrizRanking
+from sociometria.nombres import ResolvedorNombres
+t1 = time.perf_counter()
+cache = CacheRespuestas(sys.argv[1], ruta_snapshot=None)
+cache.refrescar()
+matriz = MatrizRanking.desde_datos(cache.datos, ResolvedorNombres(None).alias(cache.datos))
+for curso in dict.fromkeys(matriz.cursos):
+    if curso != CURSO_DESCONOCIDO:
+        analizar(matriz, [i for i, c in enumerate(matriz.cursos) if c == curso], 10)
+t2 = time.perf_counter()
+print(json.dumps({"imports": t1 - t0, "total": t2 - t0, "alumnos": matriz.n,
+                  "cargados": sorted(m for m in sys.modules if "." not in m)}))
+"""
+
+
+def medir(raiz=RUTA_RESPUESTAS):
+    """Una medición en un proceso nuevo: {'imports', 'total', 'alumnos', 'cargados'}."""
+    raiz_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [raiz_repo, os.environ.get("PYTHONPATH")])))
+    salida = subprocess.run([sys.executable, "-c", _MEDICION, os.path.abspath(raiz)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(salida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sociometria.arranque", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--respuestas", default=RUTA_RESPUESTAS)
+    parser.add_argument("--repeticiones", type=int, default=3, help="se toma la mejor medición")
+    args = parser.parse_args(argv)
+
+    mediciones = [medir(args.respuestas) for _ in range(max(1, args.repeticiones))]
+    mejor = min(mediciones, key=lambda m: m["total"])
+    cargados = sorted(set(PROHIBIDOS).intersection(mejor["cargados"]))
+    print(f"imports: {mejor['imports']:.3f} s (presupuesto {PRESUPUESTO_IMPORTS_S} s)")
+    print(f"carga + índices de {mejor['alumnos']} alumnos: {mejor['total']:.3f} s (presupuesto {PRESUPUESTO_TOTAL_S} s)")
+
+    fallas = []
+    if mejor["imports"] > PRESUPUESTO_IMPORTS_S:
+        fallas.append("los imports se pasan del presupuesto")
+    if mejor["total"] > PRESUPUESTO_TOTAL_S:
+        fallas.append("la carga completa se pasa del presupuesto")
+    if cargados:
+        fallas.append(f"se cargaron bibliotecas de interfaz/dibujo: {', '.join(cargados)}")
+    for falla in fallas:
+        print(f"✖ {falla}", file=sys.stderr)
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Carga de las respuestas `respuestas/<curso>/*.json` con una caché compartida
+por todo el proceso.
+
+La caché recuerda el mtime y el tamaño de cada archivo: al refrescar sólo se
+vuelven a leer los archivos nuevos o modificados y se descartan los borrados.
+El estado se guarda en un snapshot en disco para sobrevivir a un reinicio
+del servidor; se escribe en segundo plano y agrupando las ráfagas de
+cambios, así publicar una versión nueva no espera al pickle del dataset.
+
+Las carpetas de cursos se descubren solas (toda subcarpeta de `respuestas/`)
+y los archivos se parsean en paralelo; los que fallan quedan en un reporte
+de errores en vez de descartarse en silencio.
+
+Durante la encuesta, `sociometria.vigilancia` avisa qué archivos cambiaron y
+`refrescar_rutas` parsea sólo esos, sin recorrer las carpetas. Cada versión
+recuerda qué alumnos tocó (`cambios_desde`).
+"""
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import stat
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+RUTA_RESPUESTAS = "respuestas"
+RUTA_SNAPSHOT = os.path.join(".cache", "respuestas.pkl")
+FORMATO_SNAPSHOT = 2
+RANK_INVALIDO = 99
+
+# Con pocos archivos no compensa levantar procesos: se usan hilos
+UMBRAL_PROCESOS = 256
+# Versiones de las que se recuerda qué alumnos cambiaron
+HISTORIAL_CAMBIOS = 64
+# El snapshot se escribe en segundo plano esta cantidad de segundos después del
+# primer cambio sin guardar: los cambios de una ráfaga salen en una sola escritura
+DEMORA_SNAPSHOT_S = 2.0
+
+ErrorCarga = namedtuple("ErrorCarga", ["ruta", "mensaje"])
+
+
+def normalizar_nombre(nombre):
+    if not nombre: return "DESCONOCIDO"
+    nombre = re.sub(r'\(.*?\)', '', nombre)
+    nombre = re.sub(r'\s+', ' ', nombre.strip()).upper()
+    return nombre
+
+
+def convertir_rank(valor):
+    """Convierte el ranking a entero; lo que no sea un número queda como 99."""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return RANK_INVALIDO
+
+
+def parsear_archivo(ruta_archivo, nombre_curso):
+    """
+    Lee un archivo de respuestas. Devuelve (nombre_normalizado, info).
+    Lanza ValueError si el archivo no tiene el formato esperado.
+    """
+    with open(ruta_archivo, 'r', encoding='utf-8') as f:
+        contenido = json.load(f)
+    if not isinstance(contenido, dict):
+        raise ValueError("el archivo no contiene un objeto JSON")
+    nombre = contenido.get("Nombre")
+    ranking = contenido.get("Seleccion_Jerarquica", {})
+    if not nombre:
+        raise ValueError("falta el campo 'Nombre'")
+    if not isinstance(ranking, dict):
+        raise ValueError("'Seleccion_Jerarquica' no es un diccionario")
+    conexiones = {normalizar_nombre(k): convertir_rank(v) for k, v in ranking.items()}
+    return normalizar_nombre(nombre), {"curso": nombre_curso, "conexiones": conexiones, "raw_ranking": ranking}
+
+
+def _parsear_seguro(tarea):
+    """Versión de parsear_archivo para el pool: devuelve (resultado, error)."""
+    ruta, nombre_curso = tarea
+    try:
+        return parsear_archivo(ruta, nombre_curso), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def parsear_archivos(tareas, max_workers=None):
+    """
+    Parsea en paralelo una lista de (ruta, nombre_curso).
+
+    Devuelve una lista alineada con `tareas` de (resultado, error), donde
+    exactamente uno de los dos es None. Con muchos archivos se usa un pool de
+    procesos (el parseo JSON no libera el GIL); con pocos, un pool de hilos.
+    Los procesos se crean con "spawn": esto corre dentro del servidor, que
+    tiene hilos, y un fork podría heredar un lock tomado.
+    """
+    tareas = list(tareas)
+    if len(tareas) <= 1:
+        return [_parsear_seguro(t) for t in tareas]
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(tareas) >= UMBRAL_PROCESOS and max_workers > 1:
+        chunksize = max(1, len(tareas) // (max_workers * 4))
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                return list(pool.map(_parsear_seguro, tareas, chunksize=chunksize))
+        except (OSError, RuntimeError):
+            pass  # Sin procesos disponibles (p. ej. sandbox): caemos a hilos
+    with ThreadPoolExecutor(max_workers=min(32, max_workers * 2)) as pool:
+        return list(pool.map(_parsear_seguro, tareas))
+
+
+def _clave_natural(texto):
+    # "curso2" antes que "curso10"
+    return [int(t) if t.isdigit() else t.lower() for t in re.split(r'(\d+)', texto)]
+
+
+def descubrir_carpetas(raiz=RUTA_RESPUESTAS):
+    """Lista (en orden natural) las subcarpetas de `raiz`; cada una es un curso."""
+    if not os.path.isdir(raiz): return []
+    with os.scandir(raiz) as it:
+        carpetas = [e.name for e in it if e.is_dir() and not e.name.startswith('.')]
+    return sorted(carpetas, key=_clave_natural)
+
+
+def nombre_curso_desde_carpeta(carpeta):
+    m = re.fullmatch(r'curso\s*(\d+)', carpeta, flags=re.IGNORECASE)
+    return f"Curso {m.group(1)}" if m else carpeta
+
+
+class CacheRespuestas:
+    """
+    Datos parseados de todas las carpetas de cursos, compartidos entre sesiones.
+
+    `datos` tiene la misma forma que devolvía `cargar_desde_carpeta`
+    ({nombre: {"curso", "conexiones", "raw_ranking"}}) y se reemplaza por un
+    diccionario nuevo cada vez que cambia algo, así una sesión que está
+    dibujando nunca ve un estado a medias. `version` aumenta con cada cambio.
+
+    Si `carpetas` es None, los cursos se descubren en cada refresco.
+    """
+
+    def __init__(self, raiz=RUTA_RESPUESTAS, carpetas=None, ruta_snapshot=RUTA_SNAPSHOT, max_workers=None):
+        self.raiz = raiz
+        self.carpetas_fijas = list(carpetas) if carpetas is not None else None
+        self.carpetas = list(self.carpetas_fijas or [])
+        self.ruta_snapshot = ruta_snapshot
+        self.max_workers = max_workers
+        self.datos = {}
+        self.errores = []
+        self.version = 0
+        # time.monotonic() del último cambio publicado
+        self.ultimo_cambio = time.monotonic()
+        self._instantanea = (0, self.datos)
+        # (versión, nombres afectados o None si cambió todo)
+        self._cambios = deque(maxlen=HISTORIAL_CAMBIOS)
+        # ruta -> (mtime_ns, tamaño, carpeta, resultado, error)
+        self._archivos = {}
+        self._lock = threading.Lock()
+        self._temporizador_snapshot = None
+        self._lock_snapshot = threading.Lock()
+        self._cargar_snapshot()
+
+    # --- Snapshot en disco ---
+    def _cargar_snapshot(self):
+        if not self.ruta_snapshot or not os.path.exists(self.ruta_snapshot): return
+        try:
+            with open(self.ruta_snapshot, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return
+        if snapshot.get("formato") != FORMATO_SNAPSHOT or snapshot.get("raiz") != os.path.abspath(self.raiz):
+            return
+        self._archivos = snapshot["archivos"]
+        if self.carpetas_fijas is None:
+            self.carpetas = sorted({a[2] for a in self._archivos.values()}, key=_clave_natural)
+        self._reconstruir_datos()
+
+    def _guardar_snapshot(self, archivos):
+        if not self.ruta_snapshot: return
+        carpeta = os.path.dirname(self.ruta_snapshot)
+        if carpeta: os.makedirs(carpeta, exist_ok=True)
+        snapshot = {"formato": FORMATO_SNAPSHOT, "raiz": os.path.abspath(self.raiz), "archivos": archivos}
+        tmp = f"{self.ruta_snapshot}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.ruta_snapshot)
+
+    def _programar_snapshot(self):
+        """Agenda una escritura si no hay una pendiente; se llama con `_lock` tomado."""
+        if not self.ruta_snapshot or self._temporizador_snapshot is not None: return
+        self._temporizador_snapshot = threading.Timer(DEMORA_SNAPSHOT_S, self.escribir_snapshot)
+        self._temporizador_snapshot.daemon = True
+        self._temporizador_snapshot.start()
+
+    def escribir_snapshot(self):
+        """
+        Escribe el snapshot ya. Copia el índice de archivos con el lock tomado
+        (las entradas son tuplas que nunca se modifican) y lo serializa fuera.
+        """
+        with self._lock:
+            self._temporizador_snapshot = None
+            archivos = dict(self._archivos)
+        # Escrituras en serie: la última en terminar es la de la copia más nueva
+        with self._lock_snapshot:
+            try:
+                self._guardar_snapshot(archivos)
+            except OSError:
+                pass
+
+    # --- Refresco incremental ---
+    def _escanear(self):
+        """Devuelve {ruta: (mtime_ns, tamaño, carpeta)} de los .json presentes."""
+        encontrados = {}
+        for carpeta in self.carpetas:
+            ruta_carpeta = os.path.join(self.raiz, carpeta)
+            try:
+                it = os.scandir(ruta_carpeta)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with it:
+                for entrada in it:
+                    if not entrada.name.endswith('.json') or not entrada.is_file(): continue
+                    try:
+                        st_info = entrada.stat()
+                    except FileNotFoundError:
+                        continue  # se borró entre el listado y el stat
+                    encontrados[entrada.path] = (st_info.st_mtime_ns, st_info.st_size, carpeta)
+        return encontrados
+
+    def _reconstruir_datos(self, afectados=None):
+        datos = {}
+        errores = []
+        # Mismo orden que la carga original: curso por curso; dentro del curso, por archivo
+        orden = {c: i for i, c in enumerate(self.carpetas)}
+        for ruta in sorted(self._archivos, key=lambda r: (orden.get(self._archivos[r][2], len(orden)), r)):
+            _, _, _, resultado, error = self._archivos[ruta]
+            if resultado is not None:
+                origen, info = resultado
+                datos[origen] = info
+            else:
+                errores.append(ErrorCarga(ruta, error))
+        self.datos = datos
+        self.errores = errores
+        self.version += 1
+        self.ultimo_cambio = time.monotonic()
+        self._cambios.append((self.version, frozenset(afectados) if afectados is not None else None))
+        self._instantanea = (self.version, datos)
+
+    def instantanea(self):
+        """(version, datos) leídos juntos, para cachear derivados por versión."""
+        return self._instantanea
+
+    def cambios_desde(self, version):
+        """
+        Nombres de los alumnos cuyas respuestas cambiaron después de `version`.
+        None si el historial no llega tan atrás o hubo un cambio general.
+        """
+        historial = list(self._cambios)
+        if version >= self.version:
+            return set()
+        if not historial or historial[0][0] > version + 1:
+            return None
+        nombres = set()
+        for v, afectados in historial:
+            if v <= version: continue
+            if afectados is None: return None
+            nombres |= afectados
+        return nombres
+
+    def cursos(self):
+        """Nombres de curso en el orden de sus carpetas."""
+        return [nombre_curso_desde_carpeta(c) for c in self.carpetas]
+
+    def refrescar(self):
+        """Relee sólo lo que cambió en disco. Devuelve True si hubo cambios."""
+        with self._lock:
+            carpetas_previas = self.carpetas
+            if self.carpetas_fijas is None:
+                self.carpetas = descubrir_carpetas(self.raiz)
+            encontrados = self._escanear()
+            borrados = [r for r in self._archivos if r not in encontrados]
+            if self._aplicar(encontrados, borrados):
+                return True
+            if self.carpetas != carpetas_previas:
+                self._reconstruir_datos()
+                return True
+            return False
+
+    def refrescar_rutas(self, rutas):
+        """
+        Como `refrescar`, pero mirando sólo `rutas` (las que avisó el
+        vigilante): no recorre las carpetas. Devuelve True si hubo cambios.
+        """
+        with self._lock:
+            encontrados, borrados = {}, []
+            for ruta in rutas:
+                ubicacion = self._ubicar(ruta)
+                if ubicacion is None: continue
+                ruta, carpeta = ubicacion
+                try:
+                    st_info = os.stat(ruta)
+                except OSError:
+                    st_info = None
+                if st_info is not None and stat.S_ISREG(st_info.st_mode):
+                    encontrados[ruta] = (st_info.st_mtime_ns, st_info.st_size, carpeta)
+                    if carpeta not in self.carpetas:
+                        self.carpetas = sorted(self.carpetas + [carpeta], key=_clave_natural)
+                elif ruta in self._archivos:
+                    borrados.append(ruta)
+            return self._aplicar(encontrados, borrados)
+
+    def _ubicar(self, ruta):
+        """(ruta como la arma `_escanear`, carpeta) si `ruta` es un .json de un curso; si no, None."""
+        relativa = os.path.relpath(os.path.abspath(ruta), os.path.abspath(self.raiz))
+        partes = relativa.split(os.sep)
+        if len(partes) != 2 or not partes[1].endswith('.json'): return None
+        carpeta = partes[0]
+        if carpeta.startswith('.') or carpeta == os.pardir: return None
+        if self.carpetas_fijas is not None and carpeta not in self.carpetas_fijas: return None
+        return os.path.join(self.raiz, carpeta, partes[1]), carpeta
+
+    def _aplicar(self, encontrados, borrados):
+        """Parsea lo nuevo o modificado de `encontrados`, descarta `borrados` y publica una versión."""
+        pendientes = [r for r, (mtime, tam, _) in encontrados.items()
+                      if r not in self._archivos or self._archivos[r][:2] != (mtime, tam)]
+        if not borrados and not pendientes:
+            return False
+
+        afectados = set()
+        for ruta in borrados + [r for r in pendientes if r in self._archivos]:
+            resultado = self._archivos.pop(ruta)[3]
+            if resultado is not None: afectados.add(resultado[0])
+        tareas = [(r, nombre_curso_desde_carpeta(encontrados[r][2])) for r in pendientes]
+        for ruta, (resultado, error) in zip(pendientes, parsear_archivos(tareas, self.max_workers)):
+            mtime, tam, carpeta = encontrados[ruta]
+            self._archivos[ruta] = (mtime, tam, carpeta, resultado, error)
+            if resultado is not None: afectados.add(resultado[0])
+
+        self._reconstruir_datos(afectados)
+        self._programar_snapshot()
+        return True
+
+
+def cargar_respuestas(raiz=RUTA_RESPUESTAS, max_workers=None):
+    """
+    Carga completa sin caché (para scripts): descubre los cursos, parsea todo
+    en paralelo y devuelve (datos, errores).
+    """
+    cache = CacheRespuestas(raiz, ruta_snapshot=None, max_workers=max_workers)
+    cache.refrescar()
+    return cache.datos, cache.errores
@@ -0,0 +1,82 @@
+"""
+Componente de Streamlit que mantiene viva una sola red de vis.js.
+
+`st.components.v1.html` reemplaza el iframe completo en cada rerun (vuelve a
+bajar vis.js y a mandar todos los nodos y aristas). Este componente se
+monta una vez y en cada rerun sólo recibe un diff compacto: los elementos
+nuevos o modificados (`upsert`) y los IDs que hay que quitar.
+
+Cada sesión recuerda qué le mandó al navegador y con qué número de
+secuencia. Si el frontend pierde el hilo (por ejemplo, si el iframe se
+recargó), avisa con `resync` y el siguiente rerun manda el estado completo.
+Los botones "Centrar" y "Descargar Imagen HD" vienen incluidos.
+"""
+import json
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+_RUTA_FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+_componente = components.declare_component("grafo_sociometria", path=_RUTA_FRONTEND)
+
+
+def calcular_diff(previo, nuevo):
+    """
+    Diff entre dos {id: elemento}: (upsert, quitar). `upsert` trae los
+    elementos nuevos o que cambiaron; `quitar` los IDs que ya no están.
+    """
+    upsert = [e for k, e in nuevo.items() if previo.get(k) != e]
+    quitar = [k for k in previo if k not in nuevo]
+    return upsert, quitar
+
+
+def grafo_persistente(nodos, aristas, opciones, key="grafo", height=800):
+    """
+    Dibuja (o actualiza) la red. `nodos` y `aristas` son listas de
+    diccionarios con 'id' (ver `sociometria.estilo.elementos_red`).
+
+    Devuelve el último evento enviado por el frontend (o None).
+    """
+    clave_estado = f"_{key}_enviado"
+    enviado = st.session_state.get(clave_estado)
+    evento = st.session_state.get(key)
+
+    nuevos_nodos = {n['id']: n for n in nodos}
+    nuevas_aristas = {a['id']: a for a in aristas}
+
+    pide_resync = bool(evento and evento.get('resync') and evento.get('nonce') != (enviado or {}).get('nonce_resync'))
+    if enviado is None or pide_resync or enviado['opciones'] != opciones:
+        seq = (enviado['seq'] + 1) if enviado else 1
+        payload = {
+            'seq': seq, 'base': 0, 'completo': True,
+            'nodos': {'upsert': list(nuevos_nodos.values()), 'quitar': []},
+            'aristas': {'upsert': list(nuevas_aristas.values()), 'quitar': []},
+        }
+    else:
+        upsert_n, quitar_n = calcular_diff(enviado['nodos'], nuevos_nodos)
+        upsert_a, quitar_a = calcular_diff(enviado['aristas'], nuevas_aristas)
+        cambio = upsert_n or quitar_n or upsert_a or quitar_a
+        seq = enviado['seq'] + 1 if cambio else enviado['seq']
+        # Sin cambios va un diff vacío con base == seq: el frontend al día no hace nada
+        payload = {
+            'seq': seq, 'base': enviado['seq'] if cambio else seq, 'completo': False,
+            'nodos': {'upsert': upsert_n, 'quitar': quitar_n},
+            'aristas': {'upsert': upsert_a, 'quitar': quitar_a},
+        }
+
+    st.session_state[clave_estado] = {
+        'seq': seq, 'nodos': nuevos_nodos, 'aristas': nuevas_aristas, 'opciones': opciones,
+        'nonce_resync': evento.get('nonce') if pide_resync else (enviado or {}).get('nonce_resync'),
+        'ultimo_envio': {
+            'completo': payload['completo'],
+            'elementos': sum(len(payload[t][c]) for t in ('nodos', 'aristas') for c in ('upsert', 'quitar')),
+            'bytes': len(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')),
+        },
+    }
+    return _componente(payload=payload, opciones=opciones, altura=height, key=key, default=None)
+
+
+def resumen_envio(key="grafo"):
+    """{'completo', 'elementos', 'bytes'} del último payload mandado al navegador (o None)."""
+    return (st.session_state.get(f"_{key}_enviado") or {}).get('ultimo_envio')
@@ -0,0 +1,60 @@
+"""
+Panel de diagnóstico de rendimiento para las apps.
+
+Sólo aparece con `?debug=1` en la URL (o `SOCIOMETRIA_DEBUG=1`): muestra los
+tiempos por etapa del rerun actual, los tamaños anotados y, si se pidió, el
+perfil por muestreo de ese rerun. La línea de log se emite siempre.
+
+Un rerun que termina antes de `panel_diagnostico` (`st.rerun()`,
+`st.stop()` o una excepción) no cierra su medición: la cierra el siguiente
+`iniciar_medicion` de la sesión, marcada como interrumpida, y con ella se
+detiene su perfilador.
+"""
+import os
+
+import streamlit as st
+
+from sociometria.instrumentacion import Medicion
+
+
+def modo_diagnostico():
+    return st.query_params.get("debug") == "1" or os.environ.get("SOCIOMETRIA_DEBUG") == "1"
+
+
+def iniciar_medicion(app):
+    """Medición del rerun; con el perfilador encendido si se pidió en el rerun anterior."""
+    previa = st.session_state.get("_medicion")
+    if previa is not None and previa.total_ms is None:
+        previa.anotar(interrumpido=True)
+        _cerrar(previa)
+    perfilar = st.session_state.pop("_perfilar_rerun", False) and modo_diagnostico()
+    medicion = st.session_state["_medicion"] = Medicion(app, perfilar=perfilar)
+    return medicion
+
+
+def _cerrar(medicion):
+    medicion.terminar()
+    if medicion.perfilador is not None:
+        st.session_state["_perfil"] = (medicion.perfilador.muestras, medicion.perfilador.top())
+
+
+def panel_diagnostico(medicion):
+    """Cierra la medición y, en modo diagnóstico, la muestra en un expander."""
+    _cerrar(medicion)
+    if not modo_diagnostico():
+        return
+
+    with st.expander("🛠️ Diagnóstico de rendimiento", expanded=True):
+        c1, c2 = st.columns([2, 1])
+        with c1:
+            st.caption(f"Rerun: {medicion.total_ms:.1f} ms en total")
+            st.dataframe([{"Etapa": k, "ms": round(v, 2)} for k, v in medicion.etapas.items()], hide_index=True)
+        with c2:
+            st.json(medicion.datos)
+        if st.button("🔬 Perfilar el próximo rerun"):
+            st.session_state["_perfilar_rerun"] = True
+            st.rerun()
+        if "_perfil" in st.session_state:
+            muestras, top = st.session_state["_perfil"]
+            st.caption(f"Perfil por muestreo del último rerun perfilado ({muestras} muestras)")
+            st.dataframe(top, hide_index=True)
@@ -0,0 +1,47 @@
+"""
+Aviso a las sesiones abiertas cuando llegan respuestas nuevas.
+
+`vigilar_version` es un fragmento que corre solo cada pocos segundos y sólo
+compara la versión dibujada con la de la caché compartida; si cambió, pide un
+rerun completo. Durante una ráfaga de respuestas espera a que la caché quede
+quieta `CALMA_S` segundos (o, como mucho, `ESPERA_MAX_S`), así la ráfaga
+entera cuesta un solo rerun y no uno por versión. Ese rerun arma la matriz
+nueva (una vez por versión, para todas las sesiones), el layout parte del
+anterior y el componente del grafo manda al navegador sólo los nodos y
+aristas que cambiaron.
+"""
+import time
+
+import streamlit as st
+
+INTERVALO_AVISO_S = 3
+CALMA_S = 2.0
+ESPERA_MAX_S = 15.0
+
+
+@st.fragment(run_every=INTERVALO_AVISO_S)
+def vigilar_version(cache, version_vista):
+    if cache.version == version_vista:
+        return
+    ahora = time.monotonic()
+    visto, desde = st.session_state.get("_cambio_pendiente", (None, ahora))
+    if visto != version_vista:
+        desde = ahora
+        st.session_state["_cambio_pendiente"] = (version_vista, desde)
+    if ahora - cache.ultimo_cambio < CALMA_S and ahora - desde < ESPERA_MAX_S:
+        return
+    st.rerun()
+
+
+def avisar_cambios(cache, version):
+    """Toast con los alumnos que cambiaron desde el rerun anterior de esta sesión."""
+    previa = st.session_state.get("_version_vista")
+    st.session_state["_version_vista"] = version
+    if previa is None or previa == version:
+        return
+    nombres = cache.cambios_desde(previa)
+    if nombres is None:
+        st.toast("🔄 Respuestas actualizadas")
+    elif nombres:
+        lista = ", ".join(sorted(nombres)[:5]) + ("…" if len(nombres) > 5 else "")
+        st.toast(f"🔄 {len(nombres)} respuestas nuevas o modificadas: {lista}")
@@ -0,0 +1,63 @@
+"""
+Selector de alumnos escalable: una lista virtualizada (sólo se dibujan las
+filas visibles) con búsqueda y filtro por curso, en vez de un `st.checkbox`
+por alumno.
+
+La lista de alumnos viaja al navegador sólo cuando cambia la matriz (otra
+versión del dataset u otra tabla de alias); en cada rerun lo único que se
+manda es la selección como lista de IDs. El frontend junta los clics y
+devuelve los cambios en un solo evento ({'agregar': [...], 'quitar': [...]}
+o {'vecinos': id}, con la versión de la lista sobre la que se hicieron). Si
+entretanto llegó otra versión, los IDs se traducen por nombre a la matriz
+nueva en vez de descartar los clics.
+"""
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from sociometria.seleccion import filas_selector, remapear_ids
+
+# Listas (versiones) de las que se aceptan eventos: la actual y la anterior
+LISTAS_RECORDADAS = 2
+
+_RUTA_FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend_selector")
+_componente = components.declare_component("selector_alumnos", path=_RUTA_FRONTEND)
+
+
+def selector_alumnos(matriz, version, seleccion, key="selector", altura=420):
+    """
+    Muestra el selector y aplica sobre `seleccion` (set de IDs, se modifica en
+    el lugar) lo que el usuario cambió desde el rerun anterior.
+
+    Devuelve el ID del alumno cuyos vecinos se pidieron agregar, o None.
+    """
+    # Los IDs dependen de la matriz, no sólo de los datos (una corrección de alias la rearma)
+    version = f"{version}.{matriz.firma}"
+    clave_estado = f"_{key}_estado"
+    # 'listas': {versión: nombres} de las últimas listas mandadas, para traducir IDs de eventos atrasados
+    estado = st.session_state.setdefault(clave_estado, {'version': None, 'nonce': None, 'listas': {}})
+    evento = st.session_state.get(key)
+
+    vecinos_de = None
+    if evento and evento.get('nonce') != estado['nonce']:
+        estado['nonce'] = evento.get('nonce')
+        nombres_evento = estado['listas'].get(evento.get('version', estado['version']))
+        if evento.get('resync'):
+            estado['version'] = None
+        elif nombres_evento is not None:
+            traducir = lambda ids: remapear_ids(ids, nombres_evento, matriz)
+            seleccion.difference_update(traducir(evento.get('quitar', [])))
+            seleccion.update(traducir(evento.get('agregar', [])))
+            if evento.get('vecinos') is not None:
+                vecinos_de = next(iter(traducir([evento['vecinos']])), None)
+
+    filas = None
+    if estado['version'] != version:
+        filas = filas_selector(matriz)
+        estado['version'] = version
+        previas = [(v, n) for v, n in estado['listas'].items() if v != version][-(LISTAS_RECORDADAS - 1):]
+        estado['listas'] = dict(previas + [(version, matriz.nombres)])
+
+    _componente(filas=filas, version=version, seleccion=sorted(seleccion), altura=altura, key=key, default=None)
+    return vecinos_de
@@ -0,0 +1,196 @@
+"""
+Vista por niveles de detalle para selecciones grandes.
+
+Con cientos de alumnos el sociograma alumno por alumno deja de leerse (y de
+viajar rápido al navegador). La vista agregada junta a cada curso o
+comunidad en un supernodo y dibuja una sola arista por par de grupos, con
+grosor según cuántas elecciones van de uno a otro. Los grupos que el usuario
+expande (clic en el supernodo) se muestran alumno por alumno dentro de la
+misma vista.
+
+Todo sale de la adyacencia umbralizada de la selección: con `P` la matriz
+alumno → nodo de la vista (one-hot), las elecciones entre nodos son
+`Pᵀ A P` y las mutuas `Pᵀ (A ∘ Aᵀ) P`; la diagonal son las elecciones
+internas de cada grupo. La vista tiene como mucho `MAX_GRUPOS` supernodos
+(los grupos más chicos se juntan en "Otros") y `MAX_NODOS_VISTA` nodos con
+lo expandido, y `podar_aristas` deja como mucho k aristas por nodo: el
+payload queda acotado sin importar cuántos alumnos haya seleccionados.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from sociometria.analisis import propagar_etiquetas
+
+PREFIJO_GRUPO = "grupo:"
+CRITERIOS = ("curso", "comunidad")
+# Con más alumnos que esto, la vista automática arranca agregada por curso
+UMBRAL_AGREGAR = 300
+# Tope de nodos de la vista al expandir grupos
+MAX_NODOS_VISTA = 400
+# Supernodos como mucho: los grupos más chicos se juntan en uno solo
+MAX_GRUPOS = 60
+CAPACIDAD_AGRUPAMIENTOS = 16
+
+# Peso de cada tipo de arista al podar (las agregadas usan su cantidad de elecciones)
+_FUERZA_TIPO = {"mutua": 3, "primera": 2, "otra": 1}
+
+
+def agrupar(matriz, ids, max_ranking, criterio="curso", max_grupos=MAX_GRUPOS):
+    """
+    (etiquetas, nombres_grupos): el grupo de cada alumno de `ids` (índice en
+    `nombres_grupos`), por curso o por comunidad detectada en la selección.
+    Si salen más de `max_grupos`, los más chicos se juntan en "Otros".
+    """
+    etiquetas, nombres_grupos = _agrupar(matriz, np.asarray(ids, dtype=np.int64), max_ranking, criterio)
+    if len(nombres_grupos) <= max_grupos:
+        return etiquetas, nombres_grupos
+    tamanos = np.bincount(etiquetas, minlength=len(nombres_grupos))
+    quedan = np.zeros(len(nombres_grupos), dtype=bool)
+    quedan[np.argsort(-tamanos, kind="stable")[:max_grupos - 1]] = True
+    nuevo = np.full(len(nombres_grupos), max_grupos - 1, dtype=np.int64)
+    nuevo[quedan] = np.arange(max_grupos - 1)
+    otros = f"Otros ({len(nombres_grupos) - max_grupos + 1} grupos)"
+    return nuevo[etiquetas], [g for g, q in zip(nombres_grupos, quedan) if q] + [otros]
+
+
+def _agrupar(matriz, ids, max_ranking, criterio):
+    if criterio == "curso":
+        cursos = [matriz.cursos[i] for i in ids]
+        nombres_grupos = list(dict.fromkeys(cursos))
+        posicion = {c: k for k, c in enumerate(nombres_grupos)}
+        return np.array([posicion[c] for c in cursos], dtype=np.int64), nombres_grupos
+    if criterio == "comunidad":
+        R = matriz.rangos[ids][:, ids].tocsr()
+        dentro = R.data <= max_ranking
+        W = sparse.csr_matrix((np.where(dentro, max_ranking + 1 - R.data.astype(np.float64), 0.0),
+                               R.indices.copy(), R.indptr.copy()), shape=R.shape)
+        W.eliminate_zeros()
+        etiquetas = propagar_etiquetas((W + W.T).tocsr())
+        # Numeradas de la más grande a la más chica
+        tamanos = np.bincount(etiquetas)
+        orden = np.argsort(-tamanos, kind="stable")
+        nuevo = np.empty_like(orden)
+        nuevo[orden] = np.arange(len(orden))
+        return nuevo[etiquetas], [f"Comunidad {k + 1}" for k in range(len(orden))]
+    raise ValueError(f"criterio desconocido: {criterio!r} (opciones: {', '.join(CRITERIOS)})")
+
+
+def nodos_vista(etiquetas, nombres_grupos, expandidos):
+    """Cantidad de nodos que tendría la vista con esos grupos expandidos."""
+    tamanos = np.bincount(etiquetas, minlength=len(nombres_grupos))
+    abiertos = np.array([g in expandidos for g in nombres_grupos], dtype=bool)
+    return int(np.count_nonzero(~abiertos) + tamanos[abiertos].sum())
+
+
+def vista_agregada(matriz, ids, max_ranking, etiquetas, nombres_grupos, expandidos=()):
+    """
+    (G, votos): grafo de la vista, con un supernodo `grupo:<nombre>` por
+    grupo cerrado y los alumnos de los grupos `expandidos`, y {alumno: votos}
+    recibidos dentro de la selección.
+
+    Supernodos: atributos 'group', 'tamano', 'internas', 'mutuas_internas' y
+    'agrupado'; los alumnos llevan en 'grupo_vista' el grupo expandido al que
+    pertenecen. Aristas entre alumnos: 'weight' (rango) y 'mutua', como en
+    `ConstructorGrafos.vista`; las que tocan un supernodo llevan 'agregada',
+    'weight' (elecciones) y 'mutuas'.
+    """
+    import networkx as nx
+
+    ids = np.asarray(ids, dtype=np.int64)
+    n, k = len(ids), len(nombres_grupos)
+    A = matriz.adyacencia(max_ranking)[ids][:, ids].tocsr().astype(np.float64)
+    M = A.multiply(A.T).tocsr()
+
+    abiertos = np.array([g in expandidos for g in nombres_grupos], dtype=bool)
+    cerrados = np.flatnonzero(~abiertos)
+    individual = abiertos[etiquetas]
+    # Nodos de la vista: primero los grupos cerrados, después los alumnos de los abiertos
+    pos_grupo = np.full(k, -1, dtype=np.int64)
+    pos_grupo[cerrados] = np.arange(len(cerrados))
+    nodo = np.where(individual, len(cerrados) + np.cumsum(individual) - 1, pos_grupo[etiquetas])
+    m = len(cerrados) + int(individual.sum())
+    P = sparse.csr_matrix((np.ones(n), (np.arange(n), nodo)), shape=(n, m))
+    C = (P.T @ A @ P).tocoo()
+    MU = (P.T @ M @ P).tocsr()
+
+    alumno_de_nodo = np.full(m, -1, dtype=np.int64)
+    alumno_de_nodo[nodo[individual]] = np.flatnonzero(individual)
+    votos_locales = np.asarray(A.sum(axis=0)).ravel().astype(int)
+    tamanos = np.bincount(etiquetas, minlength=k)
+
+    ids_vista = [f"{PREFIJO_GRUPO}{nombres_grupos[g]}" for g in cerrados]
+    ids_vista += [matriz.nombres[ids[a]] for a in alumno_de_nodo[len(cerrados):]]
+
+    G = nx.DiGraph()
+    diagonal_c = np.zeros(m)
+    diagonal_c[C.row[C.row == C.col]] = C.data[C.row == C.col]
+    diagonal_mu = MU.diagonal()
+    for v, g in enumerate(cerrados):
+        G.add_node(ids_vista[v], group=nombres_grupos[g], tamano=int(tamanos[g]), internas=int(diagonal_c[v]),
+                   mutuas_internas=int(diagonal_mu[v]) // 2, agrupado=True, indice_grupo=int(g))
+    for v in range(len(cerrados), m):
+        a = alumno_de_nodo[v]
+        G.add_node(ids_vista[v], group=matriz.cursos[ids[a]], title=f"Curso: {matriz.cursos[ids[a]]}",
+                   grupo_vista=nombres_grupos[etiquetas[a]])
+
+    fuera = C.row != C.col
+    origen, destino, elecciones = C.row[fuera], C.col[fuera], C.data[fuera].astype(int)
+    mutuas = np.asarray(MU[origen, destino]).ravel().astype(int)
+    entre_alumnos = (alumno_de_nodo[origen] >= 0) & (alumno_de_nodo[destino] >= 0)
+    rangos = np.zeros(len(origen), dtype=np.int64)
+    if entre_alumnos.any():
+        a, b = ids[alumno_de_nodo[origen[entre_alumnos]]], ids[alumno_de_nodo[destino[entre_alumnos]]]
+        rangos[entre_alumnos] = np.asarray(matriz.rangos[a, b]).ravel()
+    for u, v, e, mu, alumnos, r in zip(origen, destino, elecciones, mutuas, entre_alumnos, rangos):
+        if alumnos:
+            G.add_edge(ids_vista[u], ids_vista[v], weight=int(r), mutua=bool(mu))
+        else:
+            G.add_edge(ids_vista[u], ids_vista[v], weight=int(e), mutua=False, agregada=True, mutuas=int(mu))
+
+    votos = {ids_vista[v]: int(votos_locales[alumno_de_nodo[v]]) for v in range(len(cerrados), m)}
+    return nx.freeze(G), votos
+
+
+def podar_aristas(aristas, top_k):
+    """
+    Deja las `top_k` aristas más fuertes que salen de cada nodo (0 = todas).
+    Las agregadas pesan según sus elecciones; las de alumnos, mutua >
+    primera preferencia > otra.
+    """
+    if not top_k:
+        return aristas
+    fuerza = lambda a: a.get('elecciones', _FUERZA_TIPO.get(a['tipo'], 0))
+    por_origen = {}
+    for a in aristas:
+        por_origen.setdefault(a['from'], []).append(a)
+    conservar = set()
+    for salientes in por_origen.values():
+        salientes.sort(key=lambda a: (-fuerza(a), a['id']))
+        conservar.update(a['id'] for a in salientes[:top_k])
+    return [a for a in aristas if a['id'] in conservar]
+
+
+class CacheAgrupamientos:
+    """LRU de `agrupar` por (versión del dataset, matriz, selección, max_ranking, criterio)."""
+
+    def __init__(self, capacidad=CAPACIDAD_AGRUPAMIENTOS):
+        self.capacidad = capacidad
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, version, matriz, ids, max_ranking, criterio):
+        # Las etiquetas se alinean con los IDs de esta matriz: otra tabla de alias, otra entrada
+        clave = (version, matriz.firma, frozenset(int(i) for i in ids), max_ranking, criterio)
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                return self._resultados[clave]
+        resultado = agrupar(matriz, sorted(clave[2]), max_ranking, criterio)
+        with self._lock:
+            self._resultados[clave] = resultado
+            while len(self._resultados) > self.capacidad:
+                self._resultados.popitem(last=False)
+        return resultado
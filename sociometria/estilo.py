@@ -0,0 +1,180 @@
+"""
+Estilo del sociograma en un formato compacto y común a todos los renders.
+
+`elementos_red` convierte un subgrafo en listas de nodos y aristas con sólo
+lo que cambia de un elemento a otro (etiqueta, color, tamaño, posición,
+tipo de arista). Lo que es igual para todos (fuente de los nodos, aspecto de
+cada tipo de arista) va una sola vez en `OPCIONES_RED`. Lo usan el
+componente persistente y `red_pyvis`, que arma la `Network` de pyvis
+equivalente para exportar HTML.
+
+`elementos_agregados` hace lo mismo para la vista por niveles de detalle
+(`sociometria.detalle`): los supernodos crecen con la raíz del tamaño del
+grupo y las aristas entre grupos llevan su propio grosor ('ancho').
+"""
+import math
+
+COLORES_CURSO = {"Curso 1": "#FFFF00", "Curso 2": "#90EE90", "Curso 3": "#ADD8E6"}
+COLORES_POPULAR = {"Curso 1": "#FFD700", "Curso 2": "#32CD32", "Curso 3": "#1E90FF"}
+
+FUENTE_NODOS = {'size': 24, 'face': 'arial', 'strokeWidth': 4, 'strokeColor': 'white', 'color': 'black'}
+FLECHA = {'to': {'enabled': True, 'type': 'vee', 'scaleFactor': 1.5}}
+# Para cursos sin color propio y para las comunidades detectadas
+PALETA_GRUPOS = ["#F4A261", "#8ECAE6", "#B5E48C", "#CDB4DB", "#FFD6A5", "#A8DADC", "#FFADAD", "#BDB2FF",
+                 "#CAFFBF", "#9BF6FF", "#FDFFB6", "#E9C46A"]
+
+# Aspecto de cada tipo de arista; las aristas sólo llevan su tipo
+ESTILOS_ARISTA = {
+    "mutua": {'color': "red", 'width': 5, 'arrows': {'to': {'enabled': False}}},
+    "primera": {'color': "#666666", 'width': 2, 'dashes': True, 'arrows': FLECHA},
+    "otra": {'color': "#cccccc", 'width': 1, 'dashes': True, 'arrows': FLECHA},
+    # Entre grupos (o grupo y alumno); el grosor va en cada arista como 'ancho'
+    "agregada": {'color': "#8d99ae", 'width': 2, 'arrows': FLECHA},
+    # Cambios entre dos olas de la encuesta (`superponer_cambios`)
+    "ganada": {'color': "#2a9d8f", 'width': 6, 'arrows': {'to': {'enabled': False}}},
+    "perdida": {'color': "#e76f51", 'width': 3, 'dashes': True, 'arrows': {'to': {'enabled': False}}},
+}
+COLOR_HACIA_AISLAMIENTO = "#d62828"
+
+ANCHO_MAX_AGREGADA = 16
+
+OPCIONES_RED = {
+    "nodos": {"font": FUENTE_NODOS, "shape": "dot"},
+    "aristas": ESTILOS_ARISTA,
+}
+
+
+def elementos_red(G, in_degrees, posiciones):
+    """
+    Devuelve (nodos, aristas) como listas de diccionarios listos para vis.js.
+    Las mutuas se dibujan una sola vez por par, sin flecha.
+    """
+    nodos = [_nodo_alumno(n, G.nodes[n].get('group', 'Desconocido'), in_degrees.get(n, 0), posiciones[n])
+             for n in G.nodes()]
+    return nodos, _aristas_alumnos(G.edges(data=True))
+
+
+def _nodo_alumno(n, curso, pop, posicion):
+    x, y = posicion
+    return {
+        'id': n,
+        'label': f"{n} 👑" if pop > 4 else n,
+        'title': f"{n}\nVotos: {pop}",
+        'color': COLORES_POPULAR.get(curso, "#ccc") if pop >= 3 else COLORES_CURSO.get(curso, "#eee"),
+        'size': 25 + (pop * 5),
+        'x': round(x, 1),
+        'y': round(y, 1),
+    }
+
+
+def _aristas_alumnos(aristas_grafo):
+    aristas = []
+    dibujadas = set()
+    for u, v, d in aristas_grafo:
+        if d['mutua']:
+            par = tuple(sorted((u, v)))
+            if par not in dibujadas:
+                aristas.append({'id': f"{par[0]}<->{par[1]}", 'from': u, 'to': v, 'tipo': "mutua"})
+                dibujadas.add(par)
+        else:
+            tipo = "primera" if d['weight'] == 1 else "otra"
+            aristas.append({'id': f"{u}->{v}", 'from': u, 'to': v, 'tipo': tipo})
+    return aristas
+
+
+def color_grupo(nombre, indice):
+    return COLORES_CURSO.get(nombre) or PALETA_GRUPOS[indice % len(PALETA_GRUPOS)]
+
+
+def elementos_agregados(G, votos, posiciones):
+    """
+    (nodos, aristas) de una vista de `sociometria.detalle.vista_agregada`.
+    Los alumnos de grupos expandidos se dibujan como en `elementos_red`.
+    """
+    nodos = []
+    for n, d in G.nodes(data=True):
+        if not d.get('agrupado'):
+            nodos.append(_nodo_alumno(n, d.get('group', 'Desconocido'), votos.get(n, 0), posiciones[n]))
+            continue
+        x, y = posiciones[n]
+        nodos.append({
+            'id': n,
+            'label': f"{d['group']} ({d['tamano']})",
+            'title': (f"{d['group']}\n{d['tamano']} alumnos\nElecciones internas: {d['internas']} "
+                      f"({d['mutuas_internas']} mutuas)\nClic para expandir"),
+            'color': color_grupo(d['group'], d['indice_grupo']),
+            'size': round(30 + 6 * math.sqrt(d['tamano']), 1),
+            'x': round(x, 1),
+            'y': round(y, 1),
+        })
+
+    aristas = _aristas_alumnos((u, v, d) for u, v, d in G.edges(data=True) if not d.get('agregada'))
+    for u, v, d in G.edges(data=True):
+        if not d.get('agregada'): continue
+        elecciones = d['weight']
+        titulo = f"{elecciones} elecciones" + (f" ({d['mutuas']} en pares mutuos)" if d['mutuas'] else "")
+        aristas.append({'id': f"{u}=>{v}", 'from': u, 'to': v, 'tipo': "agregada", 'elecciones': elecciones,
+                        'ancho': round(min(1 + 2 * math.log2(1 + elecciones), ANCHO_MAX_AGREGADA), 1), 'title': titulo})
+    return nodos, aristas
+
+
+def superponer_cambios(nodos, aristas, cambios, etiqueta_olas=""):
+    """
+    Copia de (nodos, aristas) con los cambios entre dos olas encima
+    (`sociometria.olas.cambios_en`): las mutuas nuevas en verde, las perdidas
+    punteadas, el cambio de votos en el tooltip y un borde rojo en quienes
+    se acercan al aislamiento.
+    """
+    presentes = {n['id'] for n in nodos}
+    nuevos_nodos = []
+    for nodo in nodos:
+        cambio = cambios.alumnos.get(nodo['id'])
+        if cambio is None:
+            nuevos_nodos.append(nodo)
+            continue
+        delta, hacia_aislamiento = cambio
+        nodo = dict(nodo)
+        if delta:
+            nodo['title'] += f"\nCambio de votos{f' ({etiqueta_olas})' if etiqueta_olas else ''}: {delta:+d}"
+        if hacia_aislamiento:
+            nodo['title'] += "\n⚠️ Se acerca al aislamiento"
+            nodo['color'] = {'background': nodo['color'], 'border': COLOR_HACIA_AISLAMIENTO}
+            nodo['borderWidth'] = 6
+        nuevos_nodos.append(nodo)
+
+    posicion_mutua = {a['id']: k for k, a in enumerate(aristas) if a['tipo'] == "mutua"}
+    nuevas_aristas = list(aristas)
+    for u, v in cambios.mutuas_nuevas:
+        if u not in presentes or v not in presentes: continue
+        par = tuple(sorted((u, v)))
+        k = posicion_mutua.get(f"{par[0]}<->{par[1]}")
+        if k is not None:
+            nuevas_aristas[k] = dict(aristas[k], tipo="ganada")
+        else:
+            nuevas_aristas.append({'id': f"{par[0]}<+>{par[1]}", 'from': u, 'to': v, 'tipo': "ganada"})
+    for u, v in cambios.mutuas_perdidas:
+        if u in presentes and v in presentes:
+            par = tuple(sorted((u, v)))
+            nuevas_aristas.append({'id': f"{par[0]}<x>{par[1]}", 'from': u, 'to': v, 'tipo': "perdida"})
+    return nuevos_nodos, nuevas_aristas
+
+
+def red_pyvis(nodos, aristas, height="750px"):
+    """`pyvis.network.Network` equivalente a los elementos, con la física apagada."""
+    from pyvis.network import Network
+
+    # Fondo blanco explícito para evitar problemas con visualizadores de imágenes
+    net = Network(height=height, width="100%", bgcolor="white", font_color="black", directed=True)
+    for nodo in nodos:
+        props = {k: v for k, v in nodo.items() if k != 'id'}
+        net.add_node(nodo['id'], font=FUENTE_NODOS, **props)
+    for arista in aristas:
+        estilo = dict(ESTILOS_ARISTA[arista['tipo']])
+        if 'ancho' in arista:
+            estilo['width'] = arista['ancho']
+        if 'title' in arista:
+            estilo['title'] = arista['title']
+        net.add_edge(arista['from'], arista['to'], **estilo)
+    # Las posiciones ya vienen calculadas en el servidor: sin física el primer dibujo es inmediato y estable
+    net.toggle_physics(False)
+    return net
@@ -0,0 +1,324 @@
+"""
+Exportación del sociograma a SVG, PNG y PDF en el servidor.
+
+Se dibuja a partir de los mismos elementos que recibe el navegador
+(`estilo.elementos_red`, con las posiciones ya calculadas), así los
+colores, el tamaño de los nodos, las coronas de los populares y el estilo
+de cada tipo de arista coinciden con la vista interactiva. La escena se
+arma una vez en coordenadas del layout y cada formato sólo la escala:
+
+- SVG: vectorial, sin dependencias.
+- PDF: vectorial, escrito a mano (una página, Helvetica).
+- PNG: Pillow, a cualquier ancho en píxeles.
+
+La corona se dibuja como un polígono en los tres formatos: el emoji 👑 no
+está en las fuentes base del PDF ni, en general, en las del servidor.
+"""
+import io
+import unicodedata
+import zlib
+from collections import namedtuple
+
+from sociometria.estilo import ESTILOS_ARISTA, FUENTE_NODOS
+
+FORMATOS_IMAGEN = ("svg", "png", "pdf")
+ANCHO_POR_DEFECTO = {"svg": 1600, "png": 4000, "pdf": 1190}
+MAX_PIXELES_PNG = 120_000_000
+# Por encima de esto no se dibuja al doble: el suavizado no compensa el tiempo
+MAX_PIXELES_SOBREMUESTREO = 40_000_000
+CORONA = " 👑"
+MARGEN = 40
+GUION = (6, 6)
+
+Nodo = namedtuple("Nodo", ["x", "y", "r", "color", "texto", "corona"])
+Linea = namedtuple("Linea", ["x1", "y1", "x2", "y2", "color", "ancho", "discontinua", "punta"])
+Escena = namedtuple("Escena", ["lineas", "nodos", "x0", "y0", "ancho", "alto"])
+
+# Anchos de Helvetica/Arial (en milésimas del tamaño de fuente) para centrar los nombres
+_ANCHOS_HELVETICA = dict(zip(
+    " ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-()",
+    [278, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611,
+     722, 667, 944, 667, 667, 611] + [556] * 10 + [278, 333, 333, 333],
+))
+_COLORES_NOMBRADOS = {"red": "#ff0000", "white": "#ffffff", "black": "#000000"}
+
+
+# =========================
+# Escena común
+# =========================
+def ancho_texto(texto, tam):
+    base = unicodedata.normalize("NFD", texto)
+    return sum(_ANCHOS_HELVETICA.get(c, 556) for c in base if not unicodedata.combining(c)) * tam / 1000
+
+
+def _rgb(color):
+    color = _COLORES_NOMBRADOS.get(color, color).lstrip("#")
+    if len(color) == 3:
+        color = "".join(c * 2 for c in color)
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _punta_vee(x1, y1, x2, y2, largo):
+    """Polígono de una flecha 'vee' con la punta en (x2, y2)."""
+    dx, dy = x2 - x1, y2 - y1
+    d = (dx * dx + dy * dy) ** 0.5 or 1.0
+    ux, uy = dx / d, dy / d
+    px, py = -uy, ux
+    bx, by = x2 - ux * largo, y2 - uy * largo
+    return [(x2, y2), (bx + px * largo * 0.45, by + py * largo * 0.45),
+            (x2 - ux * largo * 0.6, y2 - uy * largo * 0.6), (bx - px * largo * 0.45, by - py * largo * 0.45)]
+
+
+def armar_escena(nodos, aristas):
+    """Escena en coordenadas del layout, con la caja que la contiene (más margen)."""
+    tam_fuente = FUENTE_NODOS['size']
+    por_id = {}
+    lista_nodos = []
+    for n in nodos:
+        texto = str(n['label'])
+        corona = texto.endswith(CORONA)
+        if corona:
+            texto = texto[:-len(CORONA)]
+        # Con cambios entre olas encima el color puede venir como {background, border}
+        color = n['color']['background'] if isinstance(n['color'], dict) else n['color']
+        nodo = Nodo(float(n['x']), float(n['y']), float(n['size']), color, texto, corona)
+        por_id[n['id']] = nodo
+        lista_nodos.append(nodo)
+
+    lineas = []
+    # Primero las aristas tenues, al final las mutuas (quedan arriba)
+    orden = {"agregada": -1, "otra": 0, "perdida": 0, "primera": 1, "mutua": 2, "ganada": 2}
+    for a in sorted(aristas, key=lambda a: orden.get(a['tipo'], 0)):
+        origen, destino = por_id.get(a['from']), por_id.get(a['to'])
+        if origen is None or destino is None or origen is destino:
+            continue
+        estilo = ESTILOS_ARISTA[a['tipo']]
+        ancho = a.get('ancho', estilo['width'])
+        dx, dy = destino.x - origen.x, destino.y - origen.y
+        d = (dx * dx + dy * dy) ** 0.5 or 1.0
+        ux, uy = dx / d, dy / d
+        x1, y1 = origen.x + ux * origen.r, origen.y + uy * origen.r
+        x2, y2 = destino.x - ux * destino.r, destino.y - uy * destino.r
+        punta = None
+        if estilo['arrows']['to']['enabled']:
+            largo = (10 + 5 * ancho) * estilo['arrows']['to'].get('scaleFactor', 1)
+            punta = _punta_vee(x1, y1, x2, y2, largo)
+        lineas.append(Linea(x1, y1, x2, y2, estilo['color'], ancho, bool(estilo.get('dashes')), punta))
+
+    if lista_nodos:
+        x0 = min(n.x - max(n.r, ancho_texto(n.texto, tam_fuente) / 2) for n in lista_nodos) - MARGEN
+        x1 = max(n.x + max(n.r, ancho_texto(n.texto, tam_fuente) / 2 + (tam_fuente * 1.4 if n.corona else 0))
+                 for n in lista_nodos) + MARGEN
+        y0 = min(n.y - n.r for n in lista_nodos) - MARGEN
+        y1 = max(n.y + n.r + tam_fuente * 1.4 for n in lista_nodos) + MARGEN
+    else:
+        x0, y0, x1, y1 = 0, 0, 100, 100
+    return Escena(lineas, lista_nodos, x0, y0, x1 - x0, y1 - y0)
+
+
+def _corona(x, y, tam):
+    """Polígono de corona con su esquina inferior izquierda en (x, y)."""
+    forma = [(0, 0.8), (0, 0.15), (0.25, 0.5), (0.5, 0.0), (0.75, 0.5), (1, 0.15), (1, 0.8)]
+    return [(x + px * tam, y - tam * 0.8 + py * tam) for px, py in forma]
+
+
+def _posicion_texto(n, tam):
+    """(x centro, y línea base) del nombre, debajo del nodo como en vis.js."""
+    return n.x, n.y + n.r + 4 + tam * 0.9
+
+
+# =========================
+# SVG
+# =========================
+def _escapar_xml(texto):
+    return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def a_svg(nodos, aristas, ancho=ANCHO_POR_DEFECTO["svg"]):
+    """SVG (texto) escalado a `ancho` unidades; el viewBox mantiene las coordenadas del layout."""
+    e = armar_escena(nodos, aristas)
+    tam = FUENTE_NODOS['size']
+    alto = ancho * e.alto / e.ancho
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho:.0f}" height="{alto:.0f}" '
+        f'viewBox="{e.x0:.1f} {e.y0:.1f} {e.ancho:.1f} {e.alto:.1f}">',
+        f'<rect x="{e.x0:.1f}" y="{e.y0:.1f}" width="{e.ancho:.1f}" height="{e.alto:.1f}" fill="#ffffff"/>',
+    ]
+    for l in e.lineas:
+        guion = f' stroke-dasharray="{GUION[0]} {GUION[1]}"' if l.discontinua else ""
+        partes.append(f'<line x1="{l.x1:.1f}" y1="{l.y1:.1f}" x2="{l.x2:.1f}" y2="{l.y2:.1f}" '
+                      f'stroke="{l.color}" stroke-width="{l.ancho}"{guion}/>')
+        if l.punta:
+            puntos = " ".join(f"{x:.1f},{y:.1f}" for x, y in l.punta)
+            partes.append(f'<polygon points="{puntos}" fill="{l.color}"/>')
+    for n in e.nodos:
+        partes.append(f'<circle cx="{n.x:.1f}" cy="{n.y:.1f}" r="{n.r:.1f}" fill="{n.color}" stroke="{n.color}"/>')
+    for n in e.nodos:
+        x, y = _posicion_texto(n, tam)
+        partes.append(f'<text x="{x:.1f}" y="{y:.1f}" font-family="Arial, Helvetica, sans-serif" font-size="{tam}" '
+                      f'text-anchor="middle" fill="{FUENTE_NODOS["color"]}" stroke="{FUENTE_NODOS["strokeColor"]}" '
+                      f'stroke-width="{FUENTE_NODOS["strokeWidth"]}" paint-order="stroke">{_escapar_xml(n.texto)}</text>')
+        if n.corona:
+            puntos = " ".join(f"{px:.1f},{py:.1f}" for px, py in _corona(x + ancho_texto(n.texto, tam) / 2 + tam * 0.25, y, tam))
+            partes.append(f'<polygon points="{puntos}" fill="#FFC107" stroke="#B8860B" stroke-width="1.5"/>')
+    partes.append("</svg>")
+    return "\n".join(partes)
+
+
+# =========================
+# PDF (vectorial, sin dependencias)
+# =========================
+def _pdf_texto(texto):
+    crudo = texto.encode("cp1252", errors="replace")
+    return crudo.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _pdf_color(color, trazo):
+    r, g, b = _rgb(color)
+    return f"{r / 255:.3f} {g / 255:.3f} {b / 255:.3f} {'RG' if trazo else 'rg'}"
+
+
+def a_pdf(nodos, aristas, ancho=ANCHO_POR_DEFECTO["pdf"]):
+    """PDF de una página de `ancho` puntos de ancho."""
+    e = armar_escena(nodos, aristas)
+    tam = FUENTE_NODOS['size']
+    s = ancho / e.ancho
+    alto = e.alto * s
+    # Se dibuja en coordenadas del layout: escala, traslación y eje y hacia abajo
+    c = [f"{s:.6f} 0 0 {-s:.6f} {-e.x0 * s:.3f} {alto + e.y0 * s:.3f} cm", "1 J 1 j"]
+    for l in e.lineas:
+        c.append(f"{_pdf_color(l.color, True)} {l.ancho} w {'[%d %d] 0 d' % GUION if l.discontinua else '[] 0 d'}")
+        c.append(f"{l.x1:.2f} {l.y1:.2f} m {l.x2:.2f} {l.y2:.2f} l S")
+        if l.punta:
+            (px, py), *resto = l.punta
+            c.append(f"{_pdf_color(l.color, False)} {px:.2f} {py:.2f} m "
+                     + " ".join(f"{x:.2f} {y:.2f} l" for x, y in resto) + " h f")
+    k = 0.5523
+    c.append("[] 0 d 1 w")
+    for n in e.nodos:
+        x, y, r = n.x, n.y, n.r
+        c.append(f"{_pdf_color(n.color, False)} {x + r:.2f} {y:.2f} m "
+                 f"{x + r:.2f} {y + k * r:.2f} {x + k * r:.2f} {y + r:.2f} {x:.2f} {y + r:.2f} c "
+                 f"{x - k * r:.2f} {y + r:.2f} {x - r:.2f} {y + k * r:.2f} {x - r:.2f} {y:.2f} c "
+                 f"{x - r:.2f} {y - k * r:.2f} {x - k * r:.2f} {y - r:.2f} {x:.2f} {y - r:.2f} c "
+                 f"{x + k * r:.2f} {y - r:.2f} {x + r:.2f} {y - k * r:.2f} {x + r:.2f} {y:.2f} c f")
+    for n in e.nodos:
+        cx, y = _posicion_texto(n, tam)
+        x = cx - ancho_texto(n.texto, tam) / 2
+        texto = _pdf_texto(n.texto).decode("latin-1")
+        # Contorno blanco y después el relleno, como el strokeWidth de vis.js
+        c.append(f"BT /F1 {tam} Tf 1 0 0 -1 {x:.2f} {y:.2f} Tm {_pdf_color(FUENTE_NODOS['strokeColor'], True)} "
+                 f"{FUENTE_NODOS['strokeWidth']} w 1 Tr ({texto}) Tj ET")
+        c.append(f"BT /F1 {tam} Tf 1 0 0 -1 {x:.2f} {y:.2f} Tm {_pdf_color(FUENTE_NODOS['color'], False)} "
+                 f"0 Tr ({texto}) Tj ET")
+        if n.corona:
+            (px, py), *resto = _corona(cx + ancho_texto(n.texto, tam) / 2 + tam * 0.25, y, tam)
+            c.append(f"{_pdf_color('#FFC107', False)} {_pdf_color('#B8860B', True)} 1.5 w {px:.2f} {py:.2f} m "
+                     + " ".join(f"{qx:.2f} {qy:.2f} l" for qx, qy in resto) + " h B")
+    contenido = zlib.compress("\n".join(c).encode("latin-1"))
+
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {ancho:.2f} {alto:.2f}] "
+         f"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>").encode(),
+        f"<< /Length {len(contenido)} /Filter /FlateDecode >>\nstream\n".encode() + contenido + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    salida = io.BytesIO()
+    salida.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posiciones = []
+    for i, obj in enumerate(objetos, start=1):
+        posiciones.append(salida.tell())
+        salida.write(f"{i} 0 obj\n".encode() + obj + b"\nendobj\n")
+    inicio_xref = salida.tell()
+    salida.write(f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode())
+    for p in posiciones:
+        salida.write(f"{p:010d} 00000 n \n".encode())
+    salida.write(f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode())
+    return salida.getvalue()
+
+
+# =========================
+# PNG (Pillow)
+# =========================
+def _fuente(tam):
+    from PIL import ImageFont
+
+    for nombre in ("arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"):
+        try:
+            return ImageFont.truetype(nombre, tam)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=tam)
+
+
+def _linea_discontinua(dibujo, x1, y1, x2, y2, color, ancho, guion):
+    dx, dy = x2 - x1, y2 - y1
+    d = (dx * dx + dy * dy) ** 0.5
+    if d == 0:
+        return
+    paso = guion[0] + guion[1]
+    t = 0.0
+    while t < d:
+        fin = min(t + guion[0], d)
+        dibujo.line([(x1 + dx * t / d, y1 + dy * t / d), (x1 + dx * fin / d, y1 + dy * fin / d)], fill=color, width=ancho)
+        t += paso
+
+
+def a_png(nodos, aristas, ancho=ANCHO_POR_DEFECTO["png"]):
+    """PNG de `ancho` píxeles, dibujado al doble y reducido para suavizar los bordes."""
+    from PIL import Image, ImageDraw
+
+    e = armar_escena(nodos, aristas)
+    alto = max(1, round(ancho * e.alto / e.ancho))
+    if ancho * alto > MAX_PIXELES_PNG:
+        raise ValueError(f"la imagen de {ancho}x{alto} px supera el máximo de {MAX_PIXELES_PNG} píxeles")
+    sobremuestreo = 2 if ancho * alto * 4 <= MAX_PIXELES_SOBREMUESTREO else 1
+    s = ancho * sobremuestreo / e.ancho
+
+    def p(x, y):
+        return ((x - e.x0) * s, (y - e.y0) * s)
+
+    imagen = Image.new("RGB", (ancho * sobremuestreo, alto * sobremuestreo), "white")
+    dibujo = ImageDraw.Draw(imagen)
+    for l in e.lineas:
+        grosor = max(1, round(l.ancho * s))
+        (x1, y1), (x2, y2) = p(l.x1, l.y1), p(l.x2, l.y2)
+        if l.discontinua:
+            _linea_discontinua(dibujo, x1, y1, x2, y2, _rgb(l.color), grosor, (GUION[0] * s, GUION[1] * s))
+        else:
+            dibujo.line([(x1, y1), (x2, y2)], fill=_rgb(l.color), width=grosor)
+        if l.punta:
+            dibujo.polygon([p(x, y) for x, y in l.punta], fill=_rgb(l.color))
+    for n in e.nodos:
+        (x, y), r = p(n.x, n.y), n.r * s
+        dibujo.ellipse([x - r, y - r, x + r, y + r], fill=_rgb(n.color))
+    tam = FUENTE_NODOS['size']
+    fuente = _fuente(max(1, round(tam * s)))
+    for n in e.nodos:
+        cx, y = _posicion_texto(n, tam)
+        px, py = p(cx, y)
+        dibujo.text((px, py), n.texto, font=fuente, fill=FUENTE_NODOS['color'], anchor="ms",
+                    stroke_width=max(1, round(FUENTE_NODOS['strokeWidth'] / 2 * s)), stroke_fill=FUENTE_NODOS['strokeColor'])
+        if n.corona:
+            fin = px + fuente.getlength(n.texto) / 2
+            puntos = _corona((fin / s + e.x0) + tam * 0.25, y, tam)
+            dibujo.polygon([p(x, y) for x, y in puntos], fill=_rgb("#FFC107"), outline=_rgb("#B8860B"))
+    if sobremuestreo > 1:
+        imagen = imagen.resize((ancho, alto), Image.LANCZOS)
+    salida = io.BytesIO()
+    imagen.save(salida, format="PNG")
+    return salida.getvalue()
+
+
+def exportar(nodos, aristas, formato, ancho=None):
+    """Bytes del sociograma en `formato` ('svg', 'png' o 'pdf')."""
+    ancho = ancho or ANCHO_POR_DEFECTO[formato]
+    if formato == "svg":
+        return a_svg(nodos, aristas, ancho).encode("utf-8")
+    if formato == "png":
+        return a_png(nodos, aristas, ancho)
+    if formato == "pdf":
+        return a_pdf(nodos, aristas, ancho)
+    raise ValueError(f"formato desconocido: {formato}")
@@ -0,0 +1,93 @@
+"""
+Construcción memoizada de grafos.
+
+Las vistas filtradas (selección de alumnos + `max_ranking`) se derivan
+enmascarando la matriz de rankings y se guardan en un LRU, así re-marcar un
+grupo guardado o volver a un valor anterior del slider no reconstruye nada.
+El `nx.DiGraph` completo sólo se arma si alguien lo pide.
+
+networkx se importa recién al construir el primer grafo: cargar datos y
+calcular índices no lo necesitan.
+"""
+import threading
+from collections import OrderedDict
+
+from sociometria.matriz import MatrizRanking
+
+CAPACIDAD_VISTAS = 64
+
+
+def construir_grafo_completo(matriz):
+    """DiGraph con todos los alumnos y todas las elecciones (atributo `weight` = rango)."""
+    import networkx as nx
+
+    G = nx.DiGraph()
+    G.add_nodes_from((n, {'group': c, 'title': f"Curso: {c}"}) for n, c in zip(matriz.nombres, matriz.cursos))
+    R = matriz.rangos.tocoo()
+    G.add_edges_from(
+        (matriz.nombres[u], matriz.nombres[v], {'weight': int(r)})
+        for u, v, r in zip(R.row, R.col, R.data)
+    )
+    return nx.freeze(G)
+
+
+class ConstructorGrafos:
+    """
+    Matriz de una versión del dataset más un LRU de vistas filtradas
+    indexado por (frozenset de alumnos seleccionados, max_ranking).
+
+    Las vistas devueltas están congeladas (`nx.freeze`) porque se comparten
+    entre reruns y sesiones.
+    """
+
+    def __init__(self, matriz, capacidad=CAPACIDAD_VISTAS):
+        self.matriz = matriz
+        self._completo = None
+        self.capacidad = capacidad
+        self._vistas = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_datos(cls, datos, capacidad=CAPACIDAD_VISTAS, alias=None):
+        return cls(MatrizRanking.desde_datos(datos, alias), capacidad)
+
+    @property
+    def completo(self):
+        """Grafo con todo el dataset, construido la primera vez que se pide."""
+        with self._lock:
+            if self._completo is None:
+                self._completo = construir_grafo_completo(self.matriz)
+            return self._completo
+
+    def vista(self, seleccion, max_ranking):
+        """
+        Devuelve (G, sub): el subgrafo filtrado y su `SubgrafoRanking` (votos,
+        mutuas, etc.), reutilizando el resultado si ya se calculó.
+        """
+        clave = (frozenset(seleccion), max_ranking)
+        with self._lock:
+            if clave in self._vistas:
+                self._vistas.move_to_end(clave)
+                return self._vistas[clave]
+
+        resultado = self._derivar(clave[0], max_ranking)
+        with self._lock:
+            self._vistas[clave] = resultado
+            self._vistas.move_to_end(clave)
+            while len(self._vistas) > self.capacidad:
+                self._vistas.popitem(last=False)
+        return resultado
+
+    def _derivar(self, seleccion, max_ranking):
+        import networkx as nx
+
+        matriz = self.matriz
+        sub = matriz.subgrafo(matriz.ids_de(seleccion), max_ranking)
+        nombres, cursos = matriz.nombres, matriz.cursos
+        G = nx.DiGraph()
+        G.add_nodes_from((nombres[i], {'group': cursos[i], 'title': f"Curso: {cursos[i]}"}) for i in sub.ids)
+        G.add_edges_from(
+            (nombres[u], nombres[v], {'weight': int(r), 'mutua': bool(m)})
+            for u, v, r, m in zip(sub.origen, sub.destino, sub.rango, sub.mutua)
+        )
+        return nx.freeze(G), sub
@@ -0,0 +1,176 @@
+"""
+Almacén transaccional de grupos guardados (SQLite en modo WAL).
+
+Reemplaza el leer-modificar-escribir completo de `grupos_guardados.json`:
+cada escritura es una transacción que sólo toca las filas del grupo
+afectado, así que varias sesiones (o varios procesos) pueden guardar a la
+vez sin pisarse. Las lecturas pasan por una caché en memoria que se
+invalida con un contador de versión guardado en la misma base; cuando hay
+que releer, versión, grupos y miembros salen de una misma transacción.
+
+Si existe el `grupos_guardados.json` antiguo, se importa una sola vez.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RUTA_DB = "grupos_guardados.db"
+RUTA_JSON_LEGADO = "grupos_guardados.json"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS grupos (
+    nombre TEXT PRIMARY KEY,
+    actualizado REAL NOT NULL,
+    creado REAL
+);
+CREATE TABLE IF NOT EXISTS miembros (
+    grupo TEXT NOT NULL REFERENCES grupos(nombre) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    alumno TEXT NOT NULL,
+    PRIMARY KEY (grupo, posicion)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('version', 0);
+"""
+
+
+class AlmacenGrupos:
+    """
+    Grupos guardados {nombre: [alumnos]} sobre SQLite.
+
+    Cada hilo usa su propia conexión. `leer()` devuelve un diccionario
+    compartido que no debe modificarse.
+    """
+
+    def __init__(self, ruta=RUTA_DB, ruta_json_legado=RUTA_JSON_LEGADO):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = (None, {})
+        self._crear_esquema()
+        self._migrar_json(ruta_json_legado)
+
+    # --- Conexiones y transacciones ---
+    def _conexion(self):
+        """La conexión del hilo actual; el esquema ya quedó listo en `__init__`."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA foreign_keys=ON")
+            self._local.con = con
+        return con
+
+    def _crear_esquema(self):
+        con = self._conexion()
+        con.executescript(_ESQUEMA)
+        # Bases creadas antes de guardar la fecha de creación (se revisa con el lock de escritura tomado)
+        with _Transaccion(con):
+            if "creado" not in {fila[1] for fila in con.execute("PRAGMA table_info(grupos)")}:
+                con.execute("ALTER TABLE grupos ADD COLUMN creado REAL")
+                con.execute("UPDATE grupos SET creado = actualizado")
+
+    def _transaccion(self, modo="IMMEDIATE"):
+        return _Transaccion(self._conexion(), modo)
+
+    def version(self):
+        return self._conexion().execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+
+    # --- API ---
+    def leer(self):
+        """
+        {nombre: [alumnos]} en el orden en que se crearon los grupos; sólo
+        consulta la base completa si cambió la versión.
+        """
+        version = self.version()
+        with self._lock:
+            if self._cache[0] == version:
+                return self._cache[1]
+        # Versión, grupos y miembros de una misma instantánea (en WAL la lectura no bloquea a nadie)
+        with self._transaccion("DEFERRED") as con:
+            version = con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+            grupos = {nombre: [] for (nombre,) in con.execute("SELECT nombre FROM grupos ORDER BY creado, nombre")}
+            for grupo, alumno in con.execute("SELECT grupo, alumno FROM miembros ORDER BY grupo, posicion"):
+                grupos[grupo].append(alumno)
+        with self._lock:
+            self._cache = (version, grupos)
+        return grupos
+
+    def guardar(self, nombre, alumnos):
+        """Crea o reemplaza un grupo (sólo se tocan sus filas)."""
+        with self._transaccion() as con:
+            ahora = time.time()
+            con.execute("INSERT INTO grupos (nombre, actualizado, creado) VALUES (?, ?, ?) "
+                        "ON CONFLICT(nombre) DO UPDATE SET actualizado = excluded.actualizado", (nombre, ahora, ahora))
+            con.execute("DELETE FROM miembros WHERE grupo = ?", (nombre,))
+            con.executemany("INSERT INTO miembros (grupo, posicion, alumno) VALUES (?, ?, ?)",
+                            [(nombre, i, a) for i, a in enumerate(alumnos)])
+            con.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+
+    def guardar_varios(self, grupos):
+        """
+        Crea o reemplaza varios grupos {nombre: alumnos} en una sola
+        transacción; los nuevos quedan en el orden del diccionario.
+        """
+        if not grupos: return
+        ahora = time.time()
+        with self._transaccion() as con:
+            # Un microsegundo entre cada uno: con el mismo `creado` se ordenarían por nombre ("Grupo 10" antes que "Grupo 2")
+            con.executemany("INSERT INTO grupos (nombre, actualizado, creado) VALUES (?, ?, ?) "
+                            "ON CONFLICT(nombre) DO UPDATE SET actualizado = excluded.actualizado",
+                            [(nombre, ahora, ahora + k * 1e-6) for k, nombre in enumerate(grupos)])
+            con.executemany("DELETE FROM miembros WHERE grupo = ?", [(nombre,) for nombre in grupos])
+            con.executemany("INSERT INTO miembros (grupo, posicion, alumno) VALUES (?, ?, ?)",
+                            [(nombre, i, a) for nombre, alumnos in grupos.items() for i, a in enumerate(alumnos)])
+            con.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+
+    def eliminar(self, nombre):
+        with self._transaccion() as con:
+            if con.execute("DELETE FROM grupos WHERE nombre = ?", (nombre,)).rowcount:
+                con.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+
+    def _migrar_json(self, ruta_json):
+        if not ruta_json or not os.path.exists(ruta_json): return
+        with self._transaccion() as con:
+            if con.execute("SELECT valor FROM meta WHERE clave = 'migrado_json'").fetchone():
+                return
+            grupos = leer_json_legado(ruta_json)
+            ahora = time.time()
+            for k, (nombre, alumnos) in enumerate(grupos.items()):
+                con.execute("INSERT OR IGNORE INTO grupos (nombre, actualizado, creado) VALUES (?, ?, ?)",
+                            (nombre, ahora, ahora + k * 1e-6))
+                con.executemany("INSERT OR IGNORE INTO miembros (grupo, posicion, alumno) VALUES (?, ?, ?)",
+                                [(nombre, i, a) for i, a in enumerate(alumnos)])
+            con.execute("INSERT INTO meta (clave, valor) VALUES ('migrado_json', 1)")
+            con.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+
+
+def leer_json_legado(ruta_json=RUTA_JSON_LEGADO):
+    """{nombre: [alumnos]} del `grupos_guardados.json` antiguo ({} si no está o no se puede leer)."""
+    try:
+        with open(ruta_json, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class _Transaccion:
+    """`BEGIN IMMEDIATE` (o el modo pedido) ... `COMMIT` (o `ROLLBACK` si hay excepción)."""
+
+    def __init__(self, con, modo="IMMEDIATE"):
+        self.con = con
+        self.modo = modo
+
+    def __enter__(self):
+        self.con.execute(f"BEGIN {self.modo}")
+        return self.con
+
+    def __exit__(self, tipo, valor, traza):
+        self.con.execute("ROLLBACK" if tipo else "COMMIT")
+        return False
@@ -0,0 +1,133 @@
+"""
+Instrumentación por rerun: tiempo de cada etapa, tamaños y un perfilador
+por muestreo opcional.
+
+Uso desde una app:
+
+    medicion = Medicion("app", perfilar=...)
+    with medicion.etapa("carga"):
+        ...
+    medicion.anotar(nodos=len(G), html_bytes=len(html))
+    medicion.terminar()   # emite una línea de log JSON
+
+Las líneas van al logger `sociometria.rendimiento` con nivel INFO, una por
+rerun, para poder filtrarlas y agregarlas después.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+INTERVALO_MUESTREO_S = 0.005
+# Si nadie lo detiene (p. ej. la sesión se cerró a mitad de un rerun), el muestreo se corta solo
+DURACION_MAX_MUESTREO_S = 60.0
+
+_logger = logging.getLogger("sociometria.rendimiento")
+
+
+def logger_rendimiento():
+    """Logger de rendimiento con un handler a stderr si nadie configuró uno."""
+    if not _logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+    return _logger
+
+
+class PerfiladorMuestreo:
+    """
+    Perfilador por muestreo de un hilo: cada `intervalo` segundos toma su
+    pila con `sys._current_frames()` y cuenta cuántas veces aparece cada
+    función (inclusivo) y cuántas está arriba de todo (propio).
+    """
+
+    def __init__(self, hilo=None, intervalo=INTERVALO_MUESTREO_S, duracion_max=DURACION_MAX_MUESTREO_S):
+        self.hilo = hilo if hilo is not None else threading.get_ident()
+        self.intervalo = intervalo
+        self.duracion_max = duracion_max
+        self.muestras = 0
+        self.inclusivo = Counter()
+        self.propio = Counter()
+        self._parar = threading.Event()
+        self._muestreador = None
+
+    def iniciar(self):
+        self._muestreador = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+        self._muestreador.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        if self._muestreador is not None:
+            self._muestreador.join()
+
+    def _muestrear(self):
+        limite = time.monotonic() + self.duracion_max
+        while not self._parar.wait(self.intervalo) and time.monotonic() < limite:
+            frame = sys._current_frames().get(self.hilo)
+            if frame is None:
+                continue
+            self.muestras += 1
+            self.propio[self._etiqueta(frame)] += 1
+            vistas = set()
+            while frame is not None:
+                etiqueta = self._etiqueta(frame)
+                if etiqueta not in vistas:  # la recursión cuenta una sola vez
+                    self.inclusivo[etiqueta] += 1
+                    vistas.add(etiqueta)
+                frame = frame.f_back
+
+    @staticmethod
+    def _etiqueta(frame):
+        codigo = frame.f_code
+        return f"{codigo.co_name} ({codigo.co_filename.rsplit('/', 1)[-1]}:{codigo.co_firstlineno})"
+
+    def top(self, n=25):
+        """[{función, inclusivo %, propio %}] ordenado por tiempo inclusivo."""
+        total = max(self.muestras, 1)
+        return [{"Función": f, "Inclusivo %": round(100 * c / total, 1),
+                 "Propio %": round(100 * self.propio.get(f, 0) / total, 1)}
+                for f, c in self.inclusivo.most_common(n)]
+
+
+class Medicion:
+    """Tiempos (ms) por etapa y anotaciones de un rerun."""
+
+    def __init__(self, app, perfilar=False):
+        self.app = app
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.datos = {}
+        self.total_ms = None
+        self.perfilador = PerfiladorMuestreo().iniciar() if perfilar else None
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Una etapa que se repite en el mismo rerun se acumula
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + (time.perf_counter() - inicio) * 1000
+
+    def anotar(self, **valores):
+        self.datos.update(valores)
+
+    def terminar(self):
+        """Cierra la medición (y el perfilador) y emite la línea de log; las siguientes llamadas no hacen nada."""
+        if self.total_ms is not None:
+            return self
+        self.total_ms = (time.perf_counter() - self.inicio) * 1000
+        if self.perfilador is not None:
+            self.perfilador.detener()
+        logger_rendimiento().info(json.dumps(self.como_dict(), ensure_ascii=False))
+        return self
+
+    def como_dict(self):
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.inicio) * 1000
+        return {"app": self.app, "total_ms": round(total, 2),
+                "etapas_ms": {k: round(v, 2) for k, v in self.etapas.items()}, **self.datos}
@@ -0,0 +1,269 @@
+"""
+Layout calculado en el servidor.
+
+En vez de dejar que el navegador corra la física de vis.js desde posiciones
+aleatorias en cada render, las coordenadas se calculan aquí con un modelo de
+fuerzas vectorizado en numpy (repulsión ~ G/d², resortes hacia
+`spring_length` y gravedad central, los mismos parámetros que
+`configuraciones_fisica`) y se mandan a pyvis con la física apagada.
+
+Para grafos grandes la repulsión se aproxima estilo Barnes-Hut con un
+quadtree: cada nodo interactúa exactamente con los de las celdas vecinas y,
+nivel por nivel, con el centro de masa de las celdas bien separadas, así que
+el costo por iteración es O(n log n) y no O(n²).
+
+`CacheLayout` guarda las posiciones por (subgrafo, preset) y, cuando la
+selección cambia en pocos nodos, parte de un layout anterior: los nodos que
+ya estaban conservan su lugar y sólo se asientan los nuevos.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+ITERACIONES = 300
+ITERACIONES_INCREMENTAL = 60
+UMBRAL_BARNES_HUT = 600
+# Nodos por hoja del quadtree (en promedio) y profundidad máxima
+NODOS_POR_CELDA = 4
+NIVELES_MAX_QUADTREE = 30
+# Con más nodos que esto en una hoja se sigue subdividiendo (hasta NIVELES_MAX_QUADTREE)
+MAX_NODOS_POR_HOJA = 64
+CAPACIDAD_LAYOUTS = 128
+
+
+def _repulsion_exacta(pos, G_rep):
+    delta = pos[:, None, :] - pos[None, :, :]
+    d2 = np.einsum('ijk,ijk->ij', delta, delta) + 1.0
+    np.fill_diagonal(d2, np.inf)
+    return np.einsum('ij,ijk->ik', G_rep / (d2 * np.sqrt(d2)), delta)
+
+
+def _repulsion_barnes_hut(pos, G_rep):
+    """
+    Repulsión aproximada con un quadtree implícito: en el nivel L el cuadrado
+    que contiene a todos los nodos se parte en 2^L x 2^L celdas, de las que
+    sólo se guardan las ocupadas.
+
+    En cada nivel, un nodo interactúa con el centro de masa de las celdas
+    que son hijas de las vecinas de su celda madre pero no vecinas de la
+    suya (la "lista de interacción" de los métodos multipolares: como mucho
+    27 celdas, todas a más de un lado de celda de distancia). En la hoja se
+    suman exactos los pares con las 3 x 3 celdas vecinas. Todo el espacio
+    queda cubierto una sola vez y el costo es O(n log n).
+    """
+    n = len(pos)
+    minimo = pos.min(axis=0)
+    extension = float((pos.max(axis=0) - minimo).max()) + 1e-9
+    # Profundidad según n, y más si hay nodos amontonados (p. ej. uno muy lejos del resto)
+    niveles = int(np.clip(np.ceil(np.log2(max(n / NODOS_POR_CELDA, 1.0)) / 2), 2, NIVELES_MAX_QUADTREE))
+    while True:
+        hoja_xy = np.minimum(((pos - minimo) * ((1 << niveles) / extension)).astype(np.int64), (1 << niveles) - 1)
+        _, tam_hoja = np.unique(_clave_celda(hoja_xy[:, 0], hoja_xy[:, 1]), return_counts=True)
+        if tam_hoja.max() <= MAX_NODOS_POR_HOJA or niveles >= NIVELES_MAX_QUADTREE:
+            break
+        niveles += 1
+
+    fuerza = np.zeros_like(pos)
+    vx, vy = np.repeat([-1, 0, 1], 3), np.tile([-1, 0, 1], 3)
+    # Relativas a 2 * celda madre: las 4 hijas de cada una de las 9 vecinas de la madre
+    cx, cy = (2 * vx[:, None] + [0, 0, 1, 1]).ravel(), (2 * vy[:, None] + [0, 1, 0, 1]).ravel()
+    for nivel in range(2, niveles + 1):
+        lado = 1 << nivel
+        x, y = hoja_xy[:, 0] >> (niveles - nivel), hoja_xy[:, 1] >> (niveles - nivel)
+        celdas, celda = np.unique(_clave_celda(x, y), return_inverse=True)
+        masa = np.bincount(celda).astype(float)
+        centro = np.column_stack([np.bincount(celda, weights=pos[:, 0]),
+                                  np.bincount(celda, weights=pos[:, 1])]) / masa[:, None]
+        # (n, 36) candidatas por nodo: se quedan las no vecinas, dentro de la grilla y ocupadas
+        ox, oy = (x & ~1)[:, None] + cx, (y & ~1)[:, None] + cy
+        valida = (((np.abs(ox - x[:, None]) > 1) | (np.abs(oy - y[:, None]) > 1))
+                  & (ox >= 0) & (ox < lado) & (oy >= 0) & (oy < lado))
+        i, k = np.nonzero(valida)
+        c, ocupada = _buscar_celdas(celdas, _clave_celda(ox[i, k], oy[i, k]))
+        i, c = i[ocupada], c[ocupada]
+        delta = pos[i] - centro[c]
+        d2 = np.einsum('ij,ij->i', delta, delta) + 1.0
+        _acumular(fuerza, i, delta * (masa[c] / (d2 * np.sqrt(d2)))[:, None])
+
+    # Hoja: pares exactos con las celdas vecinas (incluida la propia), sin bucles por nodo
+    lado = 1 << niveles
+    x, y = hoja_xy[:, 0], hoja_xy[:, 1]
+    celdas, celda = np.unique(_clave_celda(x, y), return_inverse=True)
+    orden = np.argsort(celda, kind='stable')
+    tam_celda = np.bincount(celda)
+    inicio = np.cumsum(tam_celda) - tam_celda
+    ox, oy = x[:, None] + vx, y[:, None] + vy
+    i, k = np.nonzero((ox >= 0) & (ox < lado) & (oy >= 0) & (oy < lado))
+    c, ocupada = _buscar_celdas(celdas, _clave_celda(ox[i, k], oy[i, k]))
+    i, c = i[ocupada], c[ocupada]
+    repeticiones = tam_celda[c]
+    desplaz = np.arange(repeticiones.sum()) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+    j = orden[np.repeat(inicio[c], repeticiones) + desplaz]
+    i = np.repeat(i, repeticiones)
+    distintos = i != j
+    i, j = i[distintos], j[distintos]
+    delta = pos[i] - pos[j]
+    d2 = np.einsum('ij,ij->i', delta, delta) + 1.0
+    _acumular(fuerza, i, delta / (d2 * np.sqrt(d2))[:, None])
+    return G_rep * fuerza
+
+
+def _clave_celda(x, y):
+    return (x << 32) | y
+
+
+def _buscar_celdas(celdas, claves):
+    """(índice en `celdas`, encontrada) de cada clave; `celdas` ordenadas."""
+    indice = np.minimum(np.searchsorted(celdas, claves), len(celdas) - 1)
+    return indice, celdas[indice] == claves
+
+
+def _acumular(fuerza, i, aporte):
+    """`fuerza[i] += aporte` con índices repetidos (bincount es mucho más rápido que `np.add.at`)."""
+    n = len(fuerza)
+    fuerza[:, 0] += np.bincount(i, weights=aporte[:, 0], minlength=n)
+    fuerza[:, 1] += np.bincount(i, weights=aporte[:, 1], minlength=n)
+
+
+def calcular_layout(n, origen, destino, grav=-4000, spring=350, central=0.1, iteraciones=ITERACIONES,
+                    posiciones=None, fijos=None, barnes_hut=None, semilla=0):
+    """
+    Posiciones (n x 2) para un grafo de `n` nodos con aristas `origen -> destino`
+    (índices locales 0..n-1).
+
+    `posiciones` da un punto de partida; los nodos marcados en `fijos` se
+    mueven con menos libertad (layout incremental). `barnes_hut=None` activa
+    la aproximación automáticamente sobre UMBRAL_BARNES_HUT nodos.
+    """
+    incremental = posiciones is not None
+    if not incremental:
+        radio = spring * np.sqrt(max(n, 1)) / 2
+        posiciones = np.random.default_rng(semilla).uniform(-radio, radio, size=(n, 2))
+    pos = np.array(posiciones, dtype=float)
+    if n <= 1:
+        return pos if incremental else np.zeros((n, 2))
+
+    if barnes_hut is None:
+        barnes_hut = n > UMBRAL_BARNES_HUT
+    repulsion = _repulsion_barnes_hut if barnes_hut else _repulsion_exacta
+    G_rep = abs(grav) * spring  # escala la repulsión para que el equilibrio quede cerca de spring
+    origen = np.asarray(origen, dtype=np.int64)
+    destino = np.asarray(destino, dtype=np.int64)
+    movilidad = np.ones(n) if fijos is None else np.where(fijos, 0.03, 1.0)
+
+    # Partiendo de un layout previo sólo hace falta un reacomodo suave
+    temperatura = spring * (0.3 if incremental else 1.0)
+    enfriamiento = (spring * 0.02 / temperatura) ** (1.0 / max(iteraciones, 1))
+    for _ in range(iteraciones):
+        fuerza = repulsion(pos, G_rep)
+
+        delta = pos[destino] - pos[origen]
+        d = np.sqrt(np.einsum('ij,ij->i', delta, delta)) + 1e-9
+        tiron = (delta / d[:, None]) * (d - spring)[:, None] * 0.5
+        np.add.at(fuerza, origen, tiron)
+        np.subtract.at(fuerza, destino, tiron)
+
+        fuerza -= central * pos * 0.05
+
+        # Paso limitado por la temperatura (enfriamiento tipo Fruchterman-Reingold)
+        norma = np.sqrt(np.einsum('ij,ij->i', fuerza, fuerza)) + 1e-9
+        paso = np.minimum(norma, temperatura) / norma
+        pos += fuerza * (paso * movilidad)[:, None]
+        temperatura *= enfriamiento
+
+    # Un layout nuevo se centra; uno incremental no, para que nada se desplace en pantalla
+    return pos if incremental else pos - pos.mean(axis=0)
+
+
+def _huella(posiciones):
+    h = hashlib.blake2b(digest_size=8)
+    for nombre in sorted(posiciones):
+        x, y = posiciones[nombre]
+        h.update(f"{nombre}\x1f{round(x)}\x1f{round(y)}\x1e".encode())
+    return h.hexdigest()
+
+
+class CacheLayout:
+    """
+    Posiciones por (clave del subgrafo, preset de física), con reutilización
+    incremental del layout más parecido ya calculado para el mismo preset.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_LAYOUTS):
+        self.capacidad = capacidad
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, G, params):
+        """
+        Devuelve (posiciones, huella): {nombre: (x, y)} y un hash corto de las
+        posiciones para usarlo en otras claves de caché.
+        """
+        preset = (params['grav'], params['spring'])
+        with self._lock:
+            if (clave, preset) in self._layouts:
+                self._layouts.move_to_end((clave, preset))
+                return self._layouts[(clave, preset)]
+            previas = [pos for (_, p), (pos, _) in reversed(self._layouts.items()) if p == preset]
+
+        nombres = list(G.nodes())
+        indice = {n: i for i, n in enumerate(nombres)}
+        origen = np.array([indice[u] for u, _ in G.edges()], dtype=np.int64)
+        destino = np.array([indice[v] for _, v in G.edges()], dtype=np.int64)
+        semilla = int(clave[:8], 16) if isinstance(clave, str) else 0
+
+        base = self._mejor_base(nombres, previas)
+        if base is None:
+            pos = calcular_layout(len(nombres), origen, destino, params['grav'], params['spring'], semilla=semilla)
+        else:
+            inicial, fijos = self._posiciones_iniciales(nombres, indice, origen, destino, base, params['spring'], semilla)
+            pos = calcular_layout(len(nombres), origen, destino, params['grav'], params['spring'],
+                                  iteraciones=ITERACIONES_INCREMENTAL, posiciones=inicial, fijos=fijos, semilla=semilla)
+
+        posiciones = {n: (float(x), float(y)) for n, (x, y) in zip(nombres, pos)}
+        resultado = (posiciones, _huella(posiciones))
+        with self._lock:
+            self._layouts[(clave, preset)] = resultado
+            while len(self._layouts) > self.capacidad:
+                self._layouts.popitem(last=False)
+        return resultado
+
+    @staticmethod
+    def _mejor_base(nombres, previas, minimo=0.5):
+        """Layout previo que comparte más nodos (al menos la mitad) con la selección."""
+        conjunto = set(nombres)
+        mejor, comunes_mejor = None, 0
+        for pos in previas[:16]:
+            comunes = len(conjunto.intersection(pos))
+            if comunes > comunes_mejor:
+                mejor, comunes_mejor = pos, comunes
+        if mejor is None or comunes_mejor < minimo * len(conjunto):
+            return None
+        return mejor
+
+    @staticmethod
+    def _posiciones_iniciales(nombres, indice, origen, destino, base, spring, semilla):
+        rng = np.random.default_rng(semilla)
+        n = len(nombres)
+        pos = np.zeros((n, 2))
+        fijos = np.array([nm in base for nm in nombres])
+        for nm in nombres:
+            if nm in base:
+                pos[indice[nm]] = base[nm]
+        # Los nodos nuevos parten junto a sus vecinos ya ubicados (o cerca del centro): una pasada
+        # por la lista de vecinos (CSR, en ambos sentidos) de cada nodo, sin recorrer todas las aristas
+        centro = pos[fijos].mean(axis=0) if fijos.any() else np.zeros(2)
+        nuevos = np.flatnonzero(~fijos)
+        extremo = np.concatenate([origen, destino])
+        vecino = np.concatenate([destino, origen])
+        ubicados = fijos[vecino]
+        V = sparse.csr_matrix((np.ones(int(ubicados.sum())), (extremo[ubicados], vecino[ubicados])), shape=(n, n))
+        V = V[nuevos]
+        cantidad = np.asarray(V.sum(axis=1)).ravel()
+        suma = V @ pos
+        ancla = np.where(cantidad[:, None] > 0, suma / np.maximum(cantidad, 1)[:, None], centro)
+        pos[nuevos] = ancla + rng.normal(scale=spring / 3, size=(len(nuevos), 2))
+        return pos, fijos
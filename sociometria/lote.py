@@ -0,0 +1,199 @@
+"""
+Modo por lotes: sociogramas e índices de todos los cursos y grupos
+guardados, sin servidor de Streamlit.
+
+Cada curso y cada grupo guardado es un trabajo independiente que se reparte
+en un pool de procesos. La matriz de rankings viaja una sola vez a cada
+proceso (en el inicializador) y cada trabajo escribe en su propia carpeta:
+
+    <salida>/cursos/<curso>/alumnos.csv, cursos.csv, comunidades.csv,
+                            cliques.csv, sociograma.html, sociograma.svg|png|pdf
+    <salida>/grupos/<grupo>/...
+    <salida>/resumen.csv        (una fila por trabajo)
+
+`exportar_zip` usa el mismo reparto para juntar en un .zip (en memoria) las
+imágenes de todos los cursos y grupos. Como se llama desde el servidor de
+Streamlit, que tiene hilos, los procesos se crean con "spawn" (un fork con
+hilos puede heredar un lock tomado y colgarse), y en serie el contexto se
+pasa a cada trabajo en vez de quedar en una global que otra exportación
+concurrente pisaría.
+"""
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from sociometria.analisis import analizar
+from sociometria.carga import CacheRespuestas, RUTA_RESPUESTAS
+from sociometria.matriz import CURSO_DESCONOCIDO, MatrizRanking
+from sociometria.nombres import RUTA_ALIAS, ResolvedorNombres
+from sociometria.seleccion import ids_curso, ids_nombres
+
+PARAMS_LAYOUT = {"grav": -4000, "spring": 350}
+FORMATOS = ("csv", "parquet")
+
+Trabajo = namedtuple("Trabajo", ["tipo", "nombre", "ids"])
+
+# Estado de cada proceso del pool (lo fija `_inicializar`; sólo se usa en los hijos)
+_CONTEXTO = {}
+
+
+def nombre_archivo(texto):
+    """Nombre seguro para una carpeta: sin separadores ni caracteres raros."""
+    limpio = re.sub(r"[^\w\-. °]+", "_", texto, flags=re.UNICODE).strip(" ._")
+    return limpio or "_"
+
+
+def trabajos_de(matriz, grupos):
+    """Un trabajo por curso con respuestas y otro por grupo guardado no vacío."""
+    trabajos = [Trabajo("cursos", c, sorted(ids_curso(matriz, c)))
+                for c in dict.fromkeys(matriz.cursos) if c != CURSO_DESCONOCIDO]
+    for nombre, alumnos in grupos.items():
+        ids = sorted(ids_nombres(matriz, alumnos))
+        if ids:
+            trabajos.append(Trabajo("grupos", nombre, ids))
+    return trabajos
+
+
+def _contexto(matriz, salida=None, max_ranking=10, formatos=(), con_html=False, imagenes=()):
+    return dict(matriz=matriz, salida=salida, max_ranking=max_ranking,
+                formatos=formatos, con_html=con_html, imagenes=imagenes)
+
+
+def _inicializar(*contexto):
+    _CONTEXTO.clear()
+    _CONTEXTO.update(_contexto(*contexto))
+
+
+def _escribir_tabla(df, ruta_base, formatos):
+    if "csv" in formatos:
+        df.to_csv(ruta_base + ".csv", index=False)
+    if "parquet" in formatos:
+        df.to_parquet(ruta_base + ".parquet", index=False)
+
+
+def _elementos(ctx, ids):
+    """(nodos, aristas) con posiciones calculadas en el servidor, o None si no hay nodos."""
+    from sociometria.estilo import elementos_red
+    from sociometria.grafo import ConstructorGrafos
+    from sociometria.layout import CacheLayout
+    from sociometria.render import clave_grafo
+
+    matriz = ctx["matriz"]
+    constructor = ctx.get("constructor")
+    if constructor is None:
+        constructor = ctx["constructor"] = ConstructorGrafos(matriz)
+    G, sub = constructor.vista({matriz.nombres[i] for i in ids}, ctx["max_ranking"])
+    if len(G.nodes()) == 0:
+        return None
+    in_degrees = {matriz.nombres[i]: int(v) for i, v in zip(sub.ids, sub.votos)}
+    posiciones, _ = CacheLayout(capacidad=1).obtener(clave_grafo(G), G, PARAMS_LAYOUT)
+    return elementos_red(G, in_degrees, posiciones)
+
+
+def _figuras(elementos, con_html, imagenes):
+    """{nombre de archivo: bytes} del sociograma en HTML y/o los formatos de imagen."""
+    from sociometria.estilo import red_pyvis
+    from sociometria.exportar import exportar
+    from sociometria.render import html_en_memoria
+
+    nodos, aristas = elementos
+    figuras = {}
+    if con_html:
+        figuras["sociograma.html"] = html_en_memoria(red_pyvis(nodos, aristas, height="900px")).encode("utf-8")
+    for formato in imagenes:
+        figuras[f"sociograma.{formato}"] = exportar(nodos, aristas, formato)
+    return figuras
+
+
+def procesar_trabajo(trabajo, ctx=None):
+    """
+    Calcula y escribe un trabajo; devuelve su fila para el resumen. Sin `ctx`
+    usa el del proceso del pool.
+    """
+    ctx = _CONTEXTO if ctx is None else ctx
+    matriz, max_ranking, formatos = ctx["matriz"], ctx["max_ranking"], ctx["formatos"]
+    carpeta = os.path.join(ctx["salida"], trabajo.tipo, nombre_archivo(trabajo.nombre))
+    os.makedirs(carpeta, exist_ok=True)
+
+    analisis = analizar(matriz, trabajo.ids, max_ranking)
+    _escribir_tabla(analisis.alumnos, os.path.join(carpeta, "alumnos"), formatos)
+    _escribir_tabla(analisis.cursos, os.path.join(carpeta, "cursos"), formatos)
+    _escribir_tabla(analisis.comunidades, os.path.join(carpeta, "comunidades"), formatos)
+    cliques = pd.DataFrame({"Tamaño": [len(c) for c in analisis.cliques],
+                            "Alumnos": [", ".join(c) for c in analisis.cliques]})
+    _escribir_tabla(cliques, os.path.join(carpeta, "cliques"), formatos)
+
+    if ctx["con_html"] or ctx["imagenes"]:
+        elementos = _elementos(ctx, trabajo.ids)
+        if elementos is not None:
+            for archivo, contenido in _figuras(elementos, ctx["con_html"], ctx["imagenes"]).items():
+                with open(os.path.join(carpeta, archivo), "wb") as f:
+                    f.write(contenido)
+    return {"Tipo": trabajo.tipo[:-1], "Nombre": trabajo.nombre, "Carpeta": carpeta, **analisis.resumen}
+
+
+def _repartir(trabajos, funcion, contexto, max_workers):
+    """
+    `map(funcion, trabajos)` en un pool de procesos "spawn" (o en serie si no
+    se puede, pasándole a `funcion` el contexto armado acá).
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(trabajos), 1))
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_inicializar, initargs=contexto) as pool:
+                return list(pool.map(funcion, trabajos))
+        except (OSError, RuntimeError):
+            pass  # Sin procesos disponibles (p. ej. sandbox): se hace en serie
+    ctx = _contexto(*contexto)
+    return [funcion(t, ctx) for t in trabajos]
+
+
+def _imagenes_trabajo(trabajo, ctx=None):
+    ctx = _CONTEXTO if ctx is None else ctx
+    elementos = _elementos(ctx, trabajo.ids)
+    if elementos is None:
+        return trabajo, {}
+    return trabajo, _figuras(elementos, False, ctx["imagenes"])
+
+
+def exportar_zip(matriz, trabajos, max_ranking=10, imagenes=("svg",), max_workers=None):
+    """Bytes de un .zip con `<tipo>/<nombre>.<formato>` para cada trabajo, generados en paralelo."""
+    resultados = _repartir(trabajos, _imagenes_trabajo, (matriz, None, max_ranking, (), False, tuple(imagenes)),
+                           max_workers)
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as archivo:
+        for trabajo, figuras in resultados:
+            for nombre, contenido in figuras.items():
+                extension = nombre.rsplit(".", 1)[1]
+                archivo.writestr(f"{trabajo.tipo}/{nombre_archivo(trabajo.nombre)}.{extension}", contenido)
+    return salida.getvalue()
+
+
+def ejecutar_lote(salida, raiz=RUTA_RESPUESTAS, grupos=None, max_ranking=10, formatos=("csv",),
+                  con_html=True, max_workers=None, imagenes=(), ruta_alias=RUTA_ALIAS):
+    """
+    Carga `raiz`, procesa todos los cursos y los `grupos` ({nombre: [alumnos]})
+    y devuelve (resumen, errores_de_carga). Con `max_workers=1` corre en el
+    proceso actual. Los nombres elegidos se resuelven con la tabla de alias
+    `ruta_alias` (None: sin tabla, sólo tildes y parecidos), que sólo se lee.
+    """
+    # Sin snapshot: una exportación sólo lee, no deja .cache/ en el directorio de trabajo
+    cache = CacheRespuestas(raiz, ruta_snapshot=None)
+    cache.refrescar()
+    matriz = MatrizRanking.desde_datos(cache.datos, ResolvedorNombres(ruta_alias, solo_lectura=True).alias(cache.datos))
+    trabajos = trabajos_de(matriz, grupos or {})
+    os.makedirs(salida, exist_ok=True)
+    contexto = (matriz, salida, max_ranking, tuple(formatos), con_html, tuple(imagenes))
+    filas = _repartir(trabajos, procesar_trabajo, contexto, max_workers)
+
+    resumen = pd.DataFrame(filas)
+    if not resumen.empty:
+        resumen.to_csv(os.path.join(salida, "resumen.csv"), index=False)
+    return resumen, cache.errores
@@ -0,0 +1,159 @@
+"""
+Núcleo con IDs enteros: cada alumno recibe un ID y los rankings se guardan
+en una matriz dispersa CSR de int8 (fila = quien elige, columna = elegido).
+
+Con esto la detección de mutuas es `A & A.T`, los "Votos" son la suma por
+columnas y el umbral de `max_ranking` es una comparación vectorizada sobre
+`data`, sin recorrer diccionarios indexados por nombre.
+"""
+import itertools
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+from sociometria.carga import RANK_INVALIDO
+
+CURSO_DESCONOCIDO = "Desconocido"
+
+# Cada matriz construida recibe un número distinto en el proceso (ver `MatrizRanking.firma`)
+_FIRMAS = itertools.count(1)
+
+SubgrafoRanking = namedtuple("SubgrafoRanking", ["ids", "origen", "destino", "rango", "mutua", "votos", "n_mutuas"])
+SubgrafoRanking.__doc__ = """
+Aristas de un subgrafo ya filtrado. `ids` son los nodos (IDs globales);
+`origen`, `destino`, `rango` y `mutua` son arreglos alineados, uno por
+arista; `votos` está alineado con `ids`; `n_mutuas` cuenta pares.
+"""
+
+
+def resolver_conexiones(conexiones, alias=None):
+    """
+    {elegido: rango} con los nombres pasados por `alias`; si dos variantes
+    caen en el mismo alumno, queda el mejor rango.
+    """
+    if not alias:
+        return conexiones
+    resueltas = {}
+    for dest, rank in conexiones.items():
+        dest = alias.get(dest, dest)
+        if dest not in resueltas or rank < resueltas[dest]:
+            resueltas[dest] = rank
+    return resueltas
+
+
+class MatrizRanking:
+    """
+    Rankings de todo el dataset indexados por ID entero.
+
+    Los nombres que aparecen elegidos pero no respondieron la encuesta
+    también reciben ID (con curso "Desconocido"), para no perder aristas.
+    """
+
+    def __init__(self, nombres, cursos, rangos):
+        self.nombres = list(nombres)
+        self.cursos = list(cursos)
+        self.indice = {n: i for i, n in enumerate(self.nombres)}
+        self.rangos = rangos.tocsr()
+        self.n = len(self.nombres)
+        self._adyacencias = {}
+        self._entrantes = {}
+        self._mutuas = {}
+        # Con la misma versión de datos, otra tabla de alias da otra matriz (otros IDs):
+        # las cachés de derivados se indexan por esta firma, no sólo por la versión
+        self.firma = next(_FIRMAS)
+
+    @classmethod
+    def desde_datos(cls, datos, alias=None):
+        """
+        `alias` ({nombre elegido: alumno}, ver `sociometria.nombres`) junta las
+        variantes de un mismo alumno en un solo ID; si alguien eligió dos
+        variantes, queda el mejor rango.
+        """
+        nombres = list(datos)
+        cursos = [info['curso'] for info in datos.values()]
+        indice = {n: i for i, n in enumerate(nombres)}
+
+        indptr = [0]
+        columnas = []
+        valores = []
+        for info in datos.values():
+            for dest, rank in resolver_conexiones(info['conexiones'], alias).items():
+                j = indice.get(dest)
+                if j is None:
+                    j = indice[dest] = len(nombres)
+                    nombres.append(dest)
+                    cursos.append(CURSO_DESCONOCIDO)
+                columnas.append(j)
+                valores.append(rank if -128 <= rank <= 127 else RANK_INVALIDO)
+            indptr.append(len(columnas))
+
+        # Las filas de quienes sólo aparecen como elegidos quedan vacías
+        indptr.extend([indptr[-1]] * (len(nombres) - len(datos)))
+        n = len(nombres)
+        rangos = sparse.csr_matrix(
+            (np.asarray(valores, dtype=np.int8), np.asarray(columnas, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(n, n),
+        )
+        return cls(nombres, cursos, rangos)
+
+    # --- Consultas vectorizadas ---
+    def adyacencia(self, max_ranking):
+        """Matriz booleana de elecciones con rango <= max_ranking (cacheada por umbral)."""
+        A = self._adyacencias.get(max_ranking)
+        if A is None:
+            R = self.rangos
+            # Se arma a mano desde data/indices para no perder los rangos 0 explícitos
+            # (con copias de indices/indptr: eliminate_zeros los modifica in situ)
+            A = sparse.csr_matrix((R.data <= max_ranking, R.indices.copy(), R.indptr.copy()), shape=R.shape)
+            A.eliminate_zeros()
+            self._adyacencias[max_ranking] = A
+        return A
+
+    def entrantes(self, max_ranking):
+        """Transpuesta de `adyacencia` en CSR: fila i = quienes eligen a i."""
+        T = self._entrantes.get(max_ranking)
+        if T is None:
+            T = self.adyacencia(max_ranking).T.tocsr()
+            self._entrantes[max_ranking] = T
+        return T
+
+    def mutuas(self, max_ranking):
+        """Matriz simétrica booleana de relaciones mutuas: `A & A.T`."""
+        M = self._mutuas.get(max_ranking)
+        if M is None:
+            A = self.adyacencia(max_ranking)
+            M = A.multiply(A.T).tocsr().astype(bool)
+            self._mutuas[max_ranking] = M
+        return M
+
+    def votos(self, max_ranking):
+        """Elecciones recibidas por cada alumno en todo el dataset."""
+        return np.asarray(self.adyacencia(max_ranking).sum(axis=0)).ravel()
+
+    def ids_de(self, nombres):
+        """IDs (ordenados) de los nombres conocidos; los desconocidos se ignoran."""
+        return np.array(sorted(self.indice[n] for n in nombres if n in self.indice), dtype=np.int64)
+
+    def subgrafo(self, ids, max_ranking):
+        """Aristas entre `ids` con rango <= max_ranking, con mutuas y votos."""
+        ids = np.asarray(ids, dtype=np.int64)
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[ids] = True
+
+        R = self.rangos[ids]
+        filas = np.repeat(ids, np.diff(R.indptr))
+        columnas = R.indices
+        rangos = R.data
+        mantener = mascara[columnas] & (rangos <= max_ranking)
+        origen, destino, rango = filas[mantener], columnas[mantener], rangos[mantener]
+
+        # Una arista es mutua si la inversa también existe en la adyacencia umbralizada
+        A = self.adyacencia(max_ranking)
+        mutua = np.asarray(A[destino, origen]).ravel().astype(bool) if len(origen) else np.zeros(0, dtype=bool)
+
+        votos_globales = np.bincount(destino, minlength=self.n)
+        votos = votos_globales[ids]
+        diagonal = int(np.count_nonzero(mutua & (origen == destino)))
+        n_mutuas = (int(np.count_nonzero(mutua)) - diagonal) // 2 + diagonal
+        return SubgrafoRanking(ids, origen, destino, rango.astype(np.int16), mutua, votos, n_mutuas)
@@ -0,0 +1,267 @@
+"""
+Resolución de los nombres elegidos a alumnos que respondieron.
+
+`normalizar_nombre` sólo saca paréntesis y pasa a mayúsculas, así que
+"PÍA BEAS" y "PIA BEAS", o un apellido mal escrito, terminan como un nodo
+fantasma en "Desconocido" y rompen las mutuas. Antes de armar la matriz, cada
+nombre elegido que no es un alumno se busca, en este orden:
+
+1. en la tabla de alias confirmados o rechazados a mano (`alias_nombres.csv`);
+2. sin tildes ni signos (`plegar`), si eso da un único alumno;
+3. en lo ya resuelto antes (la misma tabla, filas "automatico");
+4. por parecido: trigramas por palabra y coeficiente de Dice, sólo si el mejor
+   candidato supera `UMBRAL_SIMILITUD` y le saca `MARGEN_AMBIGUEDAD` al
+   segundo.
+
+Para no comparar todos contra todos, el índice de trigramas es una matriz
+dispersa alumnos × trigramas: el producto con las consultas recorre sólo las
+listas de los trigramas que cada nombre contiene (bloqueo por trigrama), así
+que sólo se puntúan los alumnos que comparten alguno, con el conteo exacto de
+trigramas en común para el Dice. Se procesa en bloques de consultas para
+acotar la memoria.
+
+Lo que se resuelve por parecido se agrega a la tabla como "automatico" para
+revisarlo: cambiar `estado` a "confirmado" (con el nombre corregido si hace
+falta) o a "rechazado" manda sobre todo lo demás.
+"""
+import csv
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+from sociometria.carga import normalizar_nombre
+
+RUTA_ALIAS = "alias_nombres.csv"
+UMBRAL_SIMILITUD = 0.8
+MARGEN_AMBIGUEDAD = 0.05
+CONSULTAS_POR_BLOQUE = 256
+
+ESTADOS = ("automatico", "confirmado", "rechazado")
+COLUMNAS_ALIAS = ["alias", "nombre", "similitud", "estado"]
+
+Alias = namedtuple("Alias", ["nombre", "similitud", "estado"])
+
+
+def plegar(nombre):
+    """Nombre normalizado sin tildes ni signos: "PÍA  BEAS-" -> "PIA BEAS"."""
+    texto = unicodedata.normalize("NFKD", normalizar_nombre(nombre))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", texto.upper()).split())
+
+
+def trigramas(plegado):
+    """Trigramas de cada palabra con relleno; no dependen del orden de las palabras."""
+    grams = set()
+    for palabra in plegado.split():
+        p = f"  {palabra} "
+        grams.update(p[k:k + 3] for k in range(len(p) - 2))
+    return grams
+
+
+class IndiceNombres:
+    """Índice de los alumnos por nombre plegado y por trigramas."""
+
+    def __init__(self, nombres):
+        self.nombres = list(nombres)
+        self.plegados = [plegar(n) for n in self.nombres]
+        exactos = {}
+        for nombre, plegado in zip(self.nombres, self.plegados):
+            # Dos alumnos con el mismo nombre plegado: ese nombre no se resuelve solo
+            exactos[plegado] = nombre if plegado not in exactos else None
+        self.exactos = exactos
+
+        self.vocabulario = {}
+        self.matriz = self._matriz_trigramas(self.plegados, crecer=True)
+        self.tamanos = np.diff(self.matriz.indptr)
+        self._traspuesta = self.matriz.T.tocsr()
+
+    def _matriz_trigramas(self, plegados, crecer=False):
+        """CSR binaria textos × trigramas; los trigramas desconocidos se descartan salvo con `crecer`."""
+        indptr, columnas = [0], []
+        for plegado in plegados:
+            for g in trigramas(plegado):
+                k = self.vocabulario.get(g)
+                if k is None and crecer:
+                    k = self.vocabulario[g] = len(self.vocabulario)
+                if k is not None:
+                    columnas.append(k)
+            indptr.append(len(columnas))
+        datos = np.ones(len(columnas), dtype=np.float32)
+        return sparse.csr_matrix((datos, np.asarray(columnas, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+                                 shape=(len(plegados), max(len(self.vocabulario), 1)))
+
+    def parecidos(self, plegados):
+        """
+        Mejor alumno para cada texto plegado: lista alineada de
+        (nombre, similitud, similitud del segundo) o None si no comparte
+        ningún trigrama con nadie.
+        """
+        resultado = [None] * len(plegados)
+        if not plegados or not self.nombres:
+            return resultado
+        consultas = self._matriz_trigramas(plegados)
+        # El tamaño de la consulta cuenta también los trigramas que el índice no conoce
+        tamanos_q = np.array([len(trigramas(p)) for p in plegados])
+        for desde in range(0, len(plegados), CONSULTAS_POR_BLOQUE):
+            # Trigramas compartidos con cada alumno que tenga al menos uno en común
+            compartidos = (consultas[desde:desde + CONSULTAS_POR_BLOQUE] @ self._traspuesta).tocsr()
+            conteos = np.diff(compartidos.indptr)
+            filas = np.flatnonzero(conteos)
+            if not len(filas): continue
+            dice = 2 * compartidos.data / (np.repeat(tamanos_q[desde:desde + len(conteos)], conteos)
+                                           + self.tamanos[compartidos.indices])
+            # Por fila (las de CSR son contiguas): el mejor y, sacándolo, el segundo
+            inicios = compartidos.indptr[filas]
+            mejor = np.maximum.reduceat(dice, inicios)
+            empates = np.flatnonzero(dice == np.repeat(mejor, conteos[filas]))
+            fila_empate = np.repeat(np.arange(len(conteos)), conteos)[empates]
+            primero = empates[np.r_[True, fila_empate[1:] != fila_empate[:-1]]]
+            dice[primero] = -1.0
+            segundo = np.maximum(np.maximum.reduceat(dice, inicios), 0.0)
+            for q, c, d1, d2 in zip(filas, compartidos.indices[primero], mejor, segundo):
+                resultado[desde + q] = (self.nombres[c], float(d1), float(d2))
+        return resultado
+
+
+class TablaAlias:
+    """
+    `alias_nombres.csv` (alias, nombre, similitud, estado), pensada para
+    revisarse a mano. Se relee sola si cambió en disco.
+    """
+
+    def __init__(self, ruta=RUTA_ALIAS):
+        self.ruta = ruta
+        self._firma = None
+        self._filas = {}
+        self._lock = threading.Lock()
+
+    def leer(self):
+        """{alias: Alias}; las filas con estado desconocido se ignoran."""
+        with self._lock:
+            try:
+                info = os.stat(self.ruta)
+                firma = (info.st_mtime_ns, info.st_size)
+            except OSError:
+                firma = None
+            if firma != self._firma:
+                self._filas = self._cargar() if firma else {}
+                self._firma = firma
+            return self._filas
+
+    def _cargar(self):
+        filas = {}
+        try:
+            with open(self.ruta, newline="", encoding="utf-8") as f:
+                for fila in csv.DictReader(f):
+                    alias = normalizar_nombre(fila.get("alias") or "")
+                    estado = (fila.get("estado") or "").strip().lower()
+                    if not fila.get("alias") or estado not in ESTADOS: continue
+                    try:
+                        similitud = float(fila.get("similitud") or 1.0)
+                    except ValueError:
+                        similitud = 1.0
+                    filas[alias] = Alias(normalizar_nombre(fila.get("nombre") or ""), similitud, estado)
+        except (OSError, csv.Error):
+            pass
+        return filas
+
+    def agregar(self, nuevos):
+        """Agrega filas {alias: Alias} sin tocar las existentes (escritura atómica)."""
+        if not nuevos or not self.ruta: return
+        filas = dict(self.leer())
+        for alias, fila in nuevos.items():
+            filas.setdefault(alias, fila)
+        tmp = f"{self.ruta}.{os.getpid()}.tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(COLUMNAS_ALIAS)
+            for alias in sorted(filas):
+                nombre, similitud, estado = filas[alias]
+                escritor.writerow([alias, nombre, f"{similitud:.3f}", estado])
+        os.replace(tmp, self.ruta)
+
+
+class ResolvedorNombres:
+    """
+    Resuelve los nombres elegidos de un dataset a alumnos que respondieron.
+
+    El índice se arma una vez por conjunto de alumnos y lo resuelto por
+    parecido se recuerda entre recargas (en memoria y en la tabla de alias);
+    lo que no se pudo resolver se vuelve a intentar cuando llegan alumnos
+    nuevos. Con `solo_lectura` la tabla se consulta pero no se escribe: lo
+    que sale por parecido queda sólo en memoria.
+    """
+
+    def __init__(self, ruta_alias=RUTA_ALIAS, solo_lectura=False):
+        self.tabla = TablaAlias(ruta_alias) if ruta_alias else None
+        self.solo_lectura = solo_lectura
+        self._indice = None
+        self._alumnos = None
+        self._sin_resolver = set()
+        self._parecidos = {}
+        self._lock = threading.Lock()
+
+    def indice(self, alumnos):
+        alumnos = tuple(alumnos)
+        if self._alumnos != alumnos:
+            self._indice = IndiceNombres(alumnos)
+            self._alumnos = alumnos
+            self._sin_resolver = set()
+        return self._indice
+
+    def resolver(self, datos):
+        """
+        ({alias: alumno}, [sin resolver]) para los nombres elegidos en `datos`
+        que no son alumnos. Los rechazados en la tabla quedan sin resolver.
+        """
+        with self._lock:
+            alumnos = set(datos)
+            elegidos = {dest for info in datos.values() for dest in info['conexiones']}
+            pendientes = sorted(elegidos - alumnos)
+            if not pendientes:
+                return {}, []
+            indice = self.indice(datos)
+            tabla = self.tabla.leer() if self.tabla else {}
+
+            alias, por_buscar = {}, []
+            for nombre in pendientes:
+                fila = tabla.get(nombre)
+                if fila is not None and fila.estado != "automatico":
+                    if fila.estado == "confirmado" and fila.nombre in alumnos:
+                        alias[nombre] = fila.nombre
+                    continue
+                previo = fila if fila is not None else self._parecidos.get(nombre)
+                exacto = indice.exactos.get(plegar(nombre))
+                if exacto is not None:
+                    alias[nombre] = exacto
+                elif previo is not None and previo.nombre in alumnos:
+                    alias[nombre] = previo.nombre
+                elif nombre not in self._sin_resolver:
+                    por_buscar.append(nombre)
+
+            nuevos = {}
+            for nombre, mejor in zip(por_buscar, indice.parecidos([plegar(n) for n in por_buscar])):
+                if mejor is not None and mejor[1] >= UMBRAL_SIMILITUD and mejor[1] - mejor[2] >= MARGEN_AMBIGUEDAD:
+                    alias[nombre] = mejor[0]
+                    nuevos[nombre] = self._parecidos[nombre] = Alias(mejor[0], mejor[1], "automatico")
+                else:
+                    self._sin_resolver.add(nombre)
+            if nuevos and self.tabla and not self.solo_lectura:
+                try:
+                    self.tabla.agregar(nuevos)
+                except OSError:
+                    pass
+            return alias, [n for n in pendientes if n not in alias]
+
+    def alias(self, datos):
+        return self.resolver(datos)[0]
+
+    def revisadas(self):
+        """Las filas confirmadas o rechazadas a mano, para invalidar cachés cuando se editan."""
+        if not self.tabla: return ()
+        return tuple(sorted((a, f.nombre, f.estado) for a, f in self.tabla.leer().items() if f.estado != "automatico"))
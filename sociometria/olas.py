@@ -0,0 +1,359 @@
+"""
+Almacén de olas de la encuesta (una por semestre) en Parquet.
+
+Cada ola es una tabla columnar de (alumno, curso, elegido, rango): una fila
+por elección, con los nombres elegidos ya pasados por los alias de
+`sociometria.nombres`; quien respondió sin elegir a nadie queda con
+`elegido` nulo. Se guardan como un dataset particionado:
+
+    olas/_catalogo.json                 nombre, carpeta y fecha de cada ola
+    olas/ola=<nombre>/datos.parquet
+
+así que `pd.read_parquet("olas")` lee todas juntas con la columna `ola`.
+Importar `respuestas/` es una ola nueva; las escrituras son atómicas.
+
+`comparar` junta dos olas en un mismo índice de nombres y resuelve todo con
+matrices dispersas: mutuas nuevas y perdidas salen de `M_despues - M_antes`
+(con `M = A ∘ Aᵀ`), los votos de la suma por columnas y el movimiento hacia
+el aislamiento de comparar el nivel de integración de cada alumno
+(Aislado < Ignorado < Sin mutuas < Integrado, como en `analisis`). Las
+comparaciones quedan en un LRU por (olas, umbral) y `cambios_en` recorta
+una a los alumnos de la vista para dibujarla encima del grafo.
+
+Leer y escribir Parquet necesita `pyarrow`.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from sociometria.carga import RANK_INVALIDO, RUTA_RESPUESTAS, CacheRespuestas
+from sociometria.matriz import CURSO_DESCONOCIDO, resolver_conexiones
+from sociometria.nombres import RUTA_ALIAS, ResolvedorNombres
+
+RUTA_OLAS = "olas"
+CATALOGO = "_catalogo.json"
+CAPACIDAD_COMPARACIONES = 8
+
+NIVELES = ("Aislado", "Ignorado", "Sin mutuas", "Integrado")
+
+Ola = namedtuple("Ola", ["nombre", "carpeta", "importada", "alumnos", "elecciones"])
+
+ComparacionOlas = namedtuple("ComparacionOlas", ["antes", "despues", "alumnos", "mutuas_nuevas", "mutuas_perdidas",
+                                                 "resumen"])
+ComparacionOlas.__doc__ = """
+Cambios de la ola `antes` a la ola `despues`.
+
+`alumnos`: una fila por alumno que aparece en alguna de las dos (respondió,
+votos, mutuas y nivel en cada una, "Cambio votos" y "Hacia aislamiento").
+`mutuas_nuevas` / `mutuas_perdidas`: pares (alumno_a, alumno_b), con
+`respondieron_ambas` si los dos contestaron en las dos olas (si no, el
+cambio puede ser sólo que alguien no respondió).
+"""
+
+CambiosVista = namedtuple("CambiosVista", ["mutuas_nuevas", "mutuas_perdidas", "alumnos"])
+
+
+def tabla_ola(datos, alias=None):
+    """DataFrame (alumno, curso, elegido, rango) de un dataset de `CacheRespuestas`."""
+    alumnos, cursos, elegidos, rangos = [], [], [], []
+    for nombre, info in datos.items():
+        conexiones = resolver_conexiones(info['conexiones'], alias)
+        if not conexiones:
+            alumnos.append(nombre)
+            cursos.append(info['curso'])
+            elegidos.append(None)
+            rangos.append(None)
+            continue
+        alumnos.extend([nombre] * len(conexiones))
+        cursos.extend([info['curso']] * len(conexiones))
+        elegidos.extend(conexiones)
+        rangos.extend(conexiones.values())
+    return pd.DataFrame({
+        "alumno": pd.Categorical(alumnos),
+        "curso": pd.Categorical(cursos),
+        "elegido": pd.Categorical(elegidos),
+        # Como en la matriz: lo que no entra en int8 cuenta como rango inválido
+        "rango": pd.array([r if r is None or -128 <= r <= 127 else RANK_INVALIDO for r in rangos], dtype="Int8"),
+    })
+
+
+def _codigos(serie, nombres):
+    """Posición en `nombres` de cada valor de una columna categórica (-1 si es nulo)."""
+    # El -1 del final atiende a los nulos (código -1), también si no hay ninguna categoría
+    posiciones = np.append(nombres.get_indexer(serie.cat.categories), -1)
+    return posiciones[serie.cat.codes.to_numpy()]
+
+
+def _estado_ola(tabla, nombres, max_ranking):
+    """(A, respondio, curso) de una ola sobre el índice común `nombres`."""
+    n = len(nombres)
+    origen = _codigos(tabla["alumno"], nombres)
+    destino = _codigos(tabla["elegido"], nombres)
+    rango = tabla["rango"].to_numpy(dtype=np.float64, na_value=np.inf)
+    valida = (destino >= 0) & (rango <= max_ranking)
+    A = sparse.csr_matrix((np.ones(int(valida.sum()), dtype=bool), (origen[valida], destino[valida])), shape=(n, n))
+    respondio = np.zeros(n, dtype=bool)
+    respondio[origen] = True
+    curso = np.full(n, None, dtype=object)
+    curso[origen] = tabla["curso"].to_numpy(dtype=object)
+    return A, respondio, curso
+
+
+def _nivel(votos, elecciones, mutuas):
+    # 0 Aislado, 1 Ignorado, 2 Sin mutuas, 3 Integrado (índices de NIVELES)
+    return np.where(votos == 0, np.where(elecciones == 0, 0, 1), np.where(mutuas == 0, 2, 3))
+
+
+def comparar_tablas(tabla_antes, tabla_despues, max_ranking=10, antes="antes", despues="despues"):
+    """`ComparacionOlas` entre dos tablas de `tabla_ola`."""
+    columnas = [tabla_antes["alumno"], tabla_antes["elegido"], tabla_despues["alumno"], tabla_despues["elegido"]]
+    nombres = pd.Index(pd.unique(np.concatenate([c.cat.categories.to_numpy(dtype=object) for c in columnas])))
+    A0, resp0, curso0 = _estado_ola(tabla_antes, nombres, max_ranking)
+    A1, resp1, curso1 = _estado_ola(tabla_despues, nombres, max_ranking)
+    M0 = A0.multiply(A0.T).astype(np.int8)
+    M1 = A1.multiply(A1.T).astype(np.int8)
+
+    # +1: mutua nueva, -1: perdida; cada par una vez (triángulo superior)
+    D = sparse.triu(M1 - M0, k=1).tocoo()
+    ambas = resp0 & resp1
+
+    def pares(signo):
+        filtro = D.data == signo
+        a, b = D.row[filtro], D.col[filtro]
+        return pd.DataFrame({"alumno_a": nombres[a], "alumno_b": nombres[b],
+                             "respondieron_ambas": ambas[a] & ambas[b]})
+
+    votos0, votos1 = (np.asarray(A.sum(axis=0)).ravel() for A in (A0, A1))
+    elecciones0, elecciones1 = (np.asarray(A.sum(axis=1)).ravel() for A in (A0, A1))
+    mutuas0, mutuas1 = (np.asarray(M.sum(axis=1)).ravel() for M in (M0, M1))
+    nivel0 = _nivel(votos0, elecciones0, mutuas0)
+    nivel1 = _nivel(votos1, elecciones1, mutuas1)
+    curso = np.where(curso1 != None, curso1, np.where(curso0 != None, curso0, CURSO_DESCONOCIDO))  # noqa: E711
+
+    alumnos = pd.DataFrame({
+        "Alumno": nombres,
+        "Curso": curso,
+        "Respondió antes": resp0,
+        "Respondió después": resp1,
+        "Votos antes": votos0,
+        "Votos después": votos1,
+        "Cambio votos": votos1.astype(np.int64) - votos0,
+        "Mutuas antes": mutuas0,
+        "Mutuas después": mutuas1,
+        "Nivel antes": pd.Categorical.from_codes(nivel0, NIVELES, ordered=True),
+        "Nivel después": pd.Categorical.from_codes(nivel1, NIVELES, ordered=True),
+        # Sólo entre quienes contestaron las dos veces: no responder no es aislarse
+        "Hacia aislamiento": ambas & (nivel1 < nivel0),
+    })
+    nuevas, perdidas = pares(1), pares(-1)
+    resumen = {
+        "Mutuas nuevas": len(nuevas),
+        "Mutuas perdidas": len(perdidas),
+        "Hacia aislamiento": int(alumnos["Hacia aislamiento"].sum()),
+        "Saliendo del aislamiento": int((ambas & (nivel1 > nivel0)).sum()),
+        "Respondieron ambas": int(ambas.sum()),
+    }
+    return ComparacionOlas(antes, despues, alumnos, nuevas, perdidas, resumen)
+
+
+def cambios_en(comparacion, nombres):
+    """
+    `CambiosVista` con lo de una comparación que toca a `nombres`: pares
+    [(a, b)] de mutuas nuevas y perdidas entre ellos y {alumno: (cambio de
+    votos, hacia aislamiento)}.
+    """
+    nombres = pd.Index(list(nombres))
+
+    def pares(df):
+        dentro = df["alumno_a"].isin(nombres) & df["alumno_b"].isin(nombres)
+        return list(zip(df["alumno_a"][dentro], df["alumno_b"][dentro]))
+
+    filas = comparacion.alumnos[comparacion.alumnos["Alumno"].isin(nombres)]
+    alumnos = {a: (int(d), bool(h)) for a, d, h in zip(filas["Alumno"], filas["Cambio votos"], filas["Hacia aislamiento"])
+               if d or h}
+    return CambiosVista(pares(comparacion.mutuas_nuevas), pares(comparacion.mutuas_perdidas), alumnos)
+
+
+def _requiere_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("El almacén de olas necesita pyarrow instalado (pip install pyarrow)") from e
+
+
+class AlmacenOlas:
+    """
+    Olas guardadas en `ruta` (ver el docstring del módulo).
+
+    Las tablas leídas se recuerdan en memoria mientras no cambie su archivo,
+    y las comparaciones en un LRU.
+    """
+
+    def __init__(self, ruta=RUTA_OLAS, capacidad=CAPACIDAD_COMPARACIONES):
+        self.ruta = ruta
+        self.capacidad = capacidad
+        self._tablas = {}
+        self._comparaciones = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Catálogo ---
+    def _ruta_catalogo(self):
+        return os.path.join(self.ruta, CATALOGO)
+
+    def olas(self):
+        """Las olas en el orden en que se importaron."""
+        try:
+            with open(self._ruta_catalogo(), encoding="utf-8") as f:
+                return [Ola(**o) for o in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            return []
+
+    def _escribir_catalogo(self, olas):
+        tmp = f"{self._ruta_catalogo()}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([o._asdict() for o in olas], f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._ruta_catalogo())
+
+    def _ola(self, nombre):
+        for ola in self.olas():
+            if ola.nombre == nombre:
+                return ola
+        raise KeyError(f"no hay una ola llamada {nombre!r}")
+
+    # --- Escritura ---
+    def guardar(self, nombre, datos, alias=None, reemplazar=False):
+        """Guarda `datos` (ver `CacheRespuestas`) como la ola `nombre`. Devuelve su `Ola`."""
+        from sociometria.lote import nombre_archivo
+
+        _requiere_pyarrow()
+        nombre = nombre.strip()
+        if not nombre:
+            raise ValueError("la ola necesita un nombre")
+        with self._lock:
+            olas = self.olas()
+            if any(o.nombre == nombre for o in olas) and not reemplazar:
+                raise ValueError(f"ya existe una ola llamada {nombre!r}")
+            tabla = tabla_ola(datos, alias)
+            carpeta = f"ola={nombre_archivo(nombre)}"
+            os.makedirs(os.path.join(self.ruta, carpeta), exist_ok=True)
+            destino = os.path.join(self.ruta, carpeta, "datos.parquet")
+            tmp = os.path.join(self.ruta, carpeta, f".datos.{os.getpid()}.tmp")
+            tabla.to_parquet(tmp, index=False)
+            os.replace(tmp, destino)
+            ola = Ola(nombre, carpeta, time.strftime("%Y-%m-%d %H:%M"), len(datos), int(tabla["elegido"].notna().sum()))
+            self._escribir_catalogo([o for o in olas if o.nombre != nombre] + [ola])
+            self._comparaciones.clear()
+            return ola
+
+    def importar(self, nombre, raiz=RUTA_RESPUESTAS, ruta_alias=RUTA_ALIAS, reemplazar=False):
+        """
+        Lee `raiz` (una subcarpeta por curso) y lo guarda como ola nueva. La
+        tabla de alias `ruta_alias` sólo se lee.
+        """
+        cache = CacheRespuestas(raiz, ruta_snapshot=None)
+        cache.refrescar()
+        alias = ResolvedorNombres(ruta_alias, solo_lectura=True).alias(cache.datos)
+        return self.guardar(nombre, cache.datos, alias, reemplazar), cache.errores
+
+    def eliminar(self, nombre):
+        import shutil
+
+        with self._lock:
+            olas = self.olas()
+            ola = next((o for o in olas if o.nombre == nombre), None)
+            if ola is None: return
+            self._escribir_catalogo([o for o in olas if o.nombre != nombre])
+            shutil.rmtree(os.path.join(self.ruta, ola.carpeta), ignore_errors=True)
+            self._comparaciones.clear()
+
+    # --- Lectura y comparación ---
+    def leer(self, nombre):
+        """DataFrame (alumno, curso, elegido, rango) de una ola."""
+        return self._leer(nombre)[1]
+
+    def _leer(self, nombre):
+        """(firma, tabla): la firma es el mtime del archivo y cambia si la ola se reemplaza."""
+        _requiere_pyarrow()
+        ruta = os.path.join(self.ruta, self._ola(nombre).carpeta, "datos.parquet")
+        firma = os.stat(ruta).st_mtime_ns
+        with self._lock:
+            previa = self._tablas.get(ruta)
+            if previa is not None and previa[0] == firma:
+                return previa
+        tabla = pd.read_parquet(ruta)
+        for columna in ("alumno", "curso", "elegido"):
+            tabla[columna] = tabla[columna].astype("category")
+        with self._lock:
+            self._tablas[ruta] = (firma, tabla)
+        return firma, tabla
+
+    def comparar(self, antes, despues, max_ranking=10):
+        """`ComparacionOlas` de la ola `antes` a la ola `despues` (cacheada)."""
+        (firma_antes, tabla_antes), (firma_despues, tabla_despues) = self._leer(antes), self._leer(despues)
+        # Por la firma de los archivos: `id()` de una tabla ya liberada puede reaparecer en otra
+        clave = (antes, despues, max_ranking, firma_antes, firma_despues)
+        with self._lock:
+            if clave in self._comparaciones:
+                self._comparaciones.move_to_end(clave)
+                return self._comparaciones[clave]
+        resultado = comparar_tablas(tabla_antes, tabla_despues, max_ranking, antes, despues)
+        with self._lock:
+            self._comparaciones[clave] = resultado
+            while len(self._comparaciones) > self.capacidad:
+                self._comparaciones.popitem(last=False)
+        return resultado
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m sociometria.olas", description="Olas de la encuesta en Parquet.")
+    parser.add_argument("--almacen", default=RUTA_OLAS, help="carpeta del almacén de olas")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p_importar = sub.add_parser("importar", help="guardar respuestas/ como una ola nueva")
+    p_importar.add_argument("nombre")
+    p_importar.add_argument("--respuestas", default=RUTA_RESPUESTAS)
+    p_importar.add_argument("--alias", default=RUTA_ALIAS, help="tabla de alias de nombres (CSV)")
+    p_importar.add_argument("--reemplazar", action="store_true", help="pisar una ola con el mismo nombre")
+    sub.add_parser("listar", help="mostrar las olas guardadas")
+    p_comparar = sub.add_parser("comparar", help="cambios entre dos olas")
+    p_comparar.add_argument("antes")
+    p_comparar.add_argument("despues")
+    p_comparar.add_argument("--max-ranking", type=int, default=10)
+    p_comparar.add_argument("--salida", help="carpeta donde escribir los CSV de la comparación")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenOlas(args.almacen)
+    try:
+        if args.orden == "importar":
+            ola, errores = almacen.importar(args.nombre, args.respuestas, args.alias, args.reemplazar)
+            for err in errores:
+                print(f"⚠️  {err.ruta}: {err.mensaje}")
+            print(f"Ola '{ola.nombre}': {ola.alumnos} alumnos, {ola.elecciones} elecciones")
+        elif args.orden == "listar":
+            for ola in almacen.olas():
+                print(f"{ola.nombre}\t{ola.importada}\t{ola.alumnos} alumnos\t{ola.elecciones} elecciones")
+        else:
+            comparacion = almacen.comparar(args.antes, args.despues, args.max_ranking)
+            for clave, valor in comparacion.resumen.items():
+                print(f"{clave}: {valor}")
+            if args.salida:
+                os.makedirs(args.salida, exist_ok=True)
+                comparacion.alumnos.to_csv(os.path.join(args.salida, "alumnos.csv"), index=False)
+                comparacion.mutuas_nuevas.to_csv(os.path.join(args.salida, "mutuas_nuevas.csv"), index=False)
+                comparacion.mutuas_perdidas.to_csv(os.path.join(args.salida, "mutuas_perdidas.csv"), index=False)
+    except (ImportError, KeyError, ValueError) as e:
+        parser.error(str(e.args[0] if e.args else e))
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
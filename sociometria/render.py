@@ -0,0 +1,64 @@
+"""
+Generación del HTML de pyvis en memoria y caché de renders.
+
+`html_en_memoria` reemplaza el viaje de ida y vuelta por un archivo temporal
+(`save_graph` + lectura), que además dejaba un .html huérfano en /tmp por
+cada rerun. `CacheHTML` es un LRU acotado por bytes: una vista idéntica
+(mismo grafo, mismo preset de física, mismo estilo) se sirve sin volver a
+llamar a pyvis.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+MAX_BYTES_CACHE = 64 * 1024 * 1024
+
+
+def html_en_memoria(net):
+    """HTML completo de una `pyvis.network.Network`, sin tocar el disco."""
+    return net.generate_html(notebook=False)
+
+
+def clave_grafo(G, *extras):
+    """
+    Huella del contenido de un grafo (nodos con su grupo, aristas con rango y
+    si son mutuas) más cualquier parámetro extra que cambie el render, como
+    el preset de física o la versión del estilo.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for n, d in sorted(G.nodes(data=True), key=lambda x: x[0]):
+        h.update(f"N{n}\x1f{d.get('group')}\x1e".encode())
+    for u, v, d in sorted(G.edges(data=True), key=lambda x: (x[0], x[1])):
+        h.update(f"E{u}\x1f{v}\x1f{d.get('weight')}\x1f{d.get('mutua')}\x1e".encode())
+    h.update(repr(extras).encode())
+    return h.hexdigest()
+
+
+class CacheHTML:
+    """LRU de HTML renderizado acotado por el total de bytes almacenados."""
+
+    def __init__(self, max_bytes=MAX_BYTES_CACHE):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, generar):
+        """Devuelve el HTML de `clave`; si no está, lo crea con `generar()`."""
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                return self._entradas[clave][0]
+
+        html = generar()
+        tam = len(html.encode('utf-8'))
+        if tam > self.max_bytes:
+            return html  # No cabe: se sirve sin cachear
+        with self._lock:
+            if clave not in self._entradas:
+                self._entradas[clave] = (html, tam)
+                self.bytes += tam
+            while self.bytes > self.max_bytes:
+                _, (_, tam_viejo) = self._entradas.popitem(last=False)
+                self.bytes -= tam_viejo
+        return html
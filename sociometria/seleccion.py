@@ -0,0 +1,117 @@
+"""
+Selección de alumnos como conjunto compacto de IDs enteros (los de
+`MatrizRanking`) y operaciones masivas sobre ella: curso completo, grupo
+guardado, vecinos de un alumno y consulta por popularidad.
+
+Las consultas de red (`ids_ego`, `camino_mas_corto`) recorren directamente las
+matrices CSR por umbral que `MatrizRanking` guarda (`adyacencia`,
+`entrantes`, `mutuas`), sin armar el grafo de networkx: cada salto de la
+búsqueda en anchura es un corte de filas vectorizado.
+"""
+import numpy as np
+from scipy.sparse import csgraph
+
+from sociometria.matriz import CURSO_DESCONOCIDO
+
+
+def filas_selector(matriz):
+    """[[id, nombre, curso], ...] de quienes respondieron, ordenado por curso y nombre."""
+    filas = [[i, n, c] for i, (n, c) in enumerate(zip(matriz.nombres, matriz.cursos)) if c != CURSO_DESCONOCIDO]
+    orden_curso = {}
+    for _, _, c in filas:
+        orden_curso.setdefault(c, len(orden_curso))
+    filas.sort(key=lambda f: (orden_curso[f[2]], f[1]))
+    return filas
+
+
+def remapear_ids(ids, nombres_previos, matriz):
+    """Traduce IDs de una versión anterior del dataset a la actual (vía nombres)."""
+    if nombres_previos is matriz.nombres:
+        return set(ids)
+    return {matriz.indice[nombres_previos[i]] for i in ids if nombres_previos[i] in matriz.indice}
+
+
+def ids_curso(matriz, curso):
+    return {i for i, c in enumerate(matriz.cursos) if c == curso}
+
+
+def ids_nombres(matriz, nombres):
+    return {matriz.indice[n] for n in nombres if n in matriz.indice}
+
+
+def ids_vecinos(matriz, id_alumno, max_ranking, incluir_propio=True):
+    """Alumnos que `id_alumno` elige o que lo eligen, con rango <= max_ranking."""
+    A = matriz.adyacencia(max_ranking)
+    T = matriz.entrantes(max_ranking)
+    salientes = A.indices[A.indptr[id_alumno]:A.indptr[id_alumno + 1]]
+    entrantes = T.indices[T.indptr[id_alumno]:T.indptr[id_alumno + 1]]
+    vecinos = set(salientes.tolist()) | set(entrantes.tolist())
+    if incluir_propio:
+        vecinos.add(id_alumno)
+    return {i for i in vecinos if matriz.cursos[i] != CURSO_DESCONOCIDO}
+
+
+def ids_populares(matriz, min_votos, max_ranking):
+    """Alumnos que reciben al menos `min_votos` elecciones en todo el dataset."""
+    votos = matriz.votos(max_ranking)
+    return {int(i) for i in np.flatnonzero(votos >= min_votos) if matriz.cursos[i] != CURSO_DESCONOCIDO}
+
+
+DIRECCIONES = ("salientes", "entrantes", "ambas", "mutuas")
+
+
+def _adyacencias(matriz, direccion, max_ranking):
+    """Las matrices CSR a recorrer para una dirección: fila i = a quiénes se llega desde i."""
+    if direccion == "salientes":
+        return [matriz.adyacencia(max_ranking)]
+    if direccion == "entrantes":
+        return [matriz.entrantes(max_ranking)]
+    if direccion == "ambas":
+        return [matriz.adyacencia(max_ranking), matriz.entrantes(max_ranking)]
+    if direccion == "mutuas":
+        return [matriz.mutuas(max_ranking)]
+    raise ValueError(f"dirección desconocida: {direccion!r} (opciones: {', '.join(DIRECCIONES)})")
+
+
+def _respondieron(matriz):
+    return np.array([c != CURSO_DESCONOCIDO for c in matriz.cursos], dtype=bool)
+
+
+def ids_ego(matriz, id_alumno, saltos, max_ranking, direccion="ambas"):
+    """
+    Red ego: `id_alumno` y todos los alumnos a `saltos` o menos elecciones
+    de distancia en la `direccion` dada, con rango <= max_ranking.
+    """
+    matrices = _adyacencias(matriz, direccion, max_ranking)
+    validos = _respondieron(matriz)
+    visitados = np.zeros(matriz.n, dtype=bool)
+    visitados[id_alumno] = True
+    frontera = np.array([id_alumno], dtype=np.int64)
+    for _ in range(saltos):
+        if not len(frontera): break
+        alcanzados = np.concatenate([M[frontera].indices for M in matrices])
+        alcanzados = np.unique(alcanzados[validos[alcanzados] & ~visitados[alcanzados]])
+        visitados[alcanzados] = True
+        frontera = alcanzados
+    return {int(i) for i in np.flatnonzero(visitados)}
+
+
+def camino_mas_corto(matriz, origen, destino, max_ranking, direccion="salientes"):
+    """
+    Cadena más corta de elecciones de `origen` a `destino` (lista de IDs,
+    ambos incluidos) o None si no hay. Con "salientes", cada alumno de la
+    cadena elige al siguiente.
+    """
+    matrices = _adyacencias(matriz, direccion, max_ranking)
+    A = matrices[0] if len(matrices) == 1 else (matrices[0] + matrices[1]).tocsr()
+    validos = _respondieron(matriz)
+    if not validos.all():
+        # Quien no respondió no sirve de puente (p. ej. dos que eligen al mismo "Desconocido")
+        A = A.multiply(validos[:, None]).tocsr()
+    _, predecesores = csgraph.breadth_first_order(A, origen, directed=True, return_predecessors=True)
+    if origen != destino and predecesores[destino] < 0:
+        return None
+    camino = [destino]
+    while camino[-1] != origen:
+        camino.append(int(predecesores[camino[-1]]))
+    return camino[::-1]
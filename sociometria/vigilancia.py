@@ -0,0 +1,131 @@
+"""
+Vigilancia de `respuestas/` mientras la encuesta está abierta.
+
+Un hilo de fondo por proceso se entera de los archivos nuevos, modificados o
+borrados y se los pasa a `CacheRespuestas.refrescar_rutas`, que parsea sólo
+esos y publica una versión nueva del dataset compartido. Las sesiones no
+recorren las carpetas en cada rerun: comparan la versión que dibujaron con la
+actual (ver `vigilar_version` y `avisar_cambios` en
+`sociometria.componente.novedades`).
+
+Con `watchdog` instalado se usan los avisos del sistema operativo (inotify en
+Linux); sin él, o si el observador no puede arrancar, se recorre la carpeta
+cada `intervalo` segundos con `refrescar()`, que de todos modos sólo relee lo
+que cambió.
+"""
+import logging
+import os
+import threading
+
+INTERVALO_SONDEO_S = 2.0
+# Ventana para juntar los eventos de una ráfaga (un archivo se escribe en varios pasos)
+ESPERA_RAFAGA_S = 0.25
+
+_logger = logging.getLogger(__name__)
+
+
+class Vigilante:
+    """Mantiene al día una `CacheRespuestas` desde un hilo de fondo."""
+
+    def __init__(self, cache, intervalo=INTERVALO_SONDEO_S, usar_watchdog=True):
+        self.cache = cache
+        self.intervalo = intervalo
+        self.usar_watchdog = usar_watchdog
+        self.modo = None  # "eventos" o "sondeo" una vez iniciado
+        self._pendientes = set()
+        self._todo = False  # cambió una carpeta: hay que recorrer todo
+        self._lock = threading.Lock()
+        self._hay_eventos = threading.Event()
+        self._parar = threading.Event()
+        self._observador = None
+        self._hilo = None
+
+    # --- Ciclo de vida ---
+    def iniciar(self):
+        if self._hilo is not None:
+            return self
+        self.cache.refrescar()
+        if self.usar_watchdog and self._iniciar_observador():
+            self.modo = "eventos"
+            destino = self._procesar_eventos
+        else:
+            self.modo = "sondeo"
+            destino = self._sondear
+        self._hilo = threading.Thread(target=destino, name="vigilante-respuestas", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        self._hay_eventos.set()
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    # --- Con watchdog ---
+    def _iniciar_observador(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        vigilante = self
+
+        class _Manejador(FileSystemEventHandler):
+            def on_any_event(self, evento):
+                if evento.event_type in ("opened", "closed_no_write"):
+                    return
+                rutas = [evento.src_path, getattr(evento, "dest_path", "")]
+                vigilante._anotar([os.fsdecode(r) for r in rutas if r], evento.is_directory)
+
+        os.makedirs(self.cache.raiz, exist_ok=True)
+        try:
+            observador = Observer()
+            observador.schedule(_Manejador(), self.cache.raiz, recursive=True)
+            observador.start()
+        except OSError as e:
+            # p. ej. se agotó el límite de inotify: el sondeo sigue funcionando
+            _logger.warning("No se pudo vigilar %s (%s); se usa sondeo", self.cache.raiz, e)
+            return False
+        self._observador = observador
+        return True
+
+    def _anotar(self, rutas, es_carpeta):
+        with self._lock:
+            if es_carpeta:
+                self._todo = True
+            else:
+                self._pendientes.update(r for r in rutas if r.endswith('.json'))
+        self._hay_eventos.set()
+
+    def _procesar_eventos(self):
+        while not self._parar.is_set():
+            self._hay_eventos.wait()
+            if self._parar.wait(ESPERA_RAFAGA_S):
+                return
+            with self._lock:
+                self._hay_eventos.clear()
+                rutas, self._pendientes = self._pendientes, set()
+                todo, self._todo = self._todo, False
+            try:
+                if todo:
+                    self.cache.refrescar()
+                elif rutas:
+                    self.cache.refrescar_rutas(rutas)
+            except Exception:
+                _logger.exception("Error al incorporar respuestas nuevas")
+
+    # --- Sin watchdog ---
+    def _sondear(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.cache.refrescar()
+            except Exception:
+                _logger.exception("Error al incorporar respuestas nuevas")